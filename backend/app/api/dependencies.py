@@ -1,10 +1,3 @@
-from fastapi import Depends, HTTPException
-from sqlalchemy.orm import Session
-from ..db.session import SessionLocal
+from ..db.session import get_db
 
-async def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+__all__ = ["get_db"]
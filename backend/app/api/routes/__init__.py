@@ -1,2 +1,3 @@
 from .cafes import router as cafes_router
-from .reviews import router as reviews_router
\ No newline at end of file
+from .reviews import router as reviews_router
+from .export import router as export_router
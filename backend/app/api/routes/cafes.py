@@ -1,16 +1,44 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from typing import List, Optional
+import time
+from fastapi import APIRouter, Body, Depends, Header, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional
+from ...core.config import settings
+from ...core.etag import cache_headers, etag_matches
+from ...core.pagination import next_cursor
 from ...db.session import get_db
-from ...schemas.restaurant import RestaurantCreate, RestaurantResponse, RestaurantFilter
-from ...services.cafe_service import create_restaurant, get_restaurant, get_restaurants
+from ...schemas.restaurant import (
+    RestaurantBulkItemStatus,
+    RestaurantBulkResponse,
+    RestaurantCreate,
+    RestaurantFacetsResponse,
+    RestaurantFilter,
+    RestaurantNearbyResponse,
+    RestaurantResponse
+)
+from ...services.cafe_service import (
+    bulk_upsert_restaurants,
+    create_restaurant,
+    get_nearby_restaurants,
+    get_restaurant_facets,
+    DEFAULT_SORT,
+    RELEVANCE_SORT,
+    SEARCH_SORTS,
+    get_restaurant,
+    get_restaurant_version,
+    get_restaurants,
+    restaurant_etag,
+    restaurant_sort_key
+)
+from ...services.search_cache import search_cache
 
 router = APIRouter(prefix="/restaurants", tags=["restaurants"])
 
 @router.post("/", response_model=RestaurantResponse, status_code=201)
 async def create_new_restaurant(
     restaurant: RestaurantCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Создание нового ресторана"""
     try:
@@ -18,32 +46,203 @@ async def create_new_restaurant(
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+MAX_BULK_SIZE = 1000
+
+@router.post("/bulk", response_model=RestaurantBulkResponse)
+async def bulk_upsert(
+    items: List[Dict[str, Any]] = Body(..., max_length=MAX_BULK_SIZE),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Пакетная загрузка ресторанов (upsert по place_id)
+
+    Каждый элемент проверяется по схеме RestaurantCreate отдельно: невалидные
+    элементы и повторы place_id получают свой статус, остальные пишутся
+    одной транзакцией.
+    """
+    started = time.perf_counter()
+    statuses = []
+    valid = []
+    seen = set()
+    for index, raw in enumerate(items):
+        try:
+            item = RestaurantCreate.model_validate(raw)
+        except ValidationError as e:
+            statuses.append(RestaurantBulkItemStatus(
+                index=index,
+                place_id=raw.get("place_id"),
+                status="invalid",
+                error=str(e)
+            ))
+            continue
+        if item.place_id in seen:
+            statuses.append(RestaurantBulkItemStatus(
+                index=index,
+                place_id=item.place_id,
+                status="duplicate",
+                error="place_id repeated in batch"
+            ))
+            continue
+        seen.add(item.place_id)
+        valid.append((index, item))
+
+    try:
+        results = await bulk_upsert_restaurants(db, [item for _, item in valid])
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    for (index, item), (restaurant_id, status) in zip(valid, results):
+        statuses.append(RestaurantBulkItemStatus(
+            index=index,
+            place_id=item.place_id,
+            status=status,
+            id=restaurant_id
+        ))
+    statuses.sort(key=lambda status: status.index)
+
+    elapsed = time.perf_counter() - started
+    written = len(results)
+    return RestaurantBulkResponse(
+        items=statuses,
+        created=sum(1 for status in statuses if status.status == "created"),
+        updated=sum(1 for status in statuses if status.status == "updated"),
+        unchanged=sum(1 for status in statuses if status.status == "unchanged"),
+        failed=len(statuses) - written,
+        elapsed_ms=round(elapsed * 1000, 2),
+        rows_per_sec=round(written / elapsed, 1) if elapsed > 0 else 0.0
+    )
+
+@router.get("/cache/stats")
+async def get_search_cache_stats():
+    """Счетчики кэша поиска ресторанов"""
+    return search_cache.stats()
+
+@router.get("/facets", response_model=RestaurantFacetsResponse)
+async def get_search_facets(
+    q: Optional[str] = Query(None, max_length=200),
+    cuisine: Optional[str] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    max_price: Optional[int] = Query(None, ge=0, le=4),
+    min_reviews: Optional[int] = Query(None, ge=0),
+    min_user_rating: Optional[float] = Query(None, ge=0, le=5),
+    min_sentiment: Optional[float] = Query(None, ge=0, le=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """Счетчики по категориям, уровню цен и рейтингу для текущих фильтров поиска"""
+    filters = RestaurantFilter(
+        q=q,
+        cuisine=cuisine,
+        min_rating=min_rating,
+        max_price=max_price,
+        min_reviews=min_reviews,
+        min_user_rating=min_user_rating,
+        min_sentiment=min_sentiment
+    )
+    cache_key = search_cache.make_key(filters, 0, 0, None, "facets")
+    cached = search_cache.get(cache_key)
+    if cached is not None:
+        return cached["payload"]
+    facets = await get_restaurant_facets(db, filters)
+    search_cache.set(cache_key, filters, facets, None, "facets")
+    return facets
+
+@router.get("/nearby", response_model=List[RestaurantNearbyResponse])
+async def search_nearby_restaurants(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radius_m: float = Query(default=1000, gt=0, le=50000),
+    cuisine: Optional[str] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    max_price: Optional[int] = Query(None, ge=0, le=4),
+    limit: int = Query(default=20, ge=1, le=100),
+    db: AsyncSession = Depends(get_db)
+):
+    """Поиск ресторанов рядом с точкой, отсортированных по расстоянию"""
+    filters = RestaurantFilter(
+        cuisine=cuisine,
+        min_rating=min_rating,
+        max_price=max_price
+    )
+    nearby = await get_nearby_restaurants(db, lat, lng, radius_m, filters, limit)
+    return [
+        RestaurantNearbyResponse.model_validate(restaurant, from_attributes=True).model_copy(update={"distance_m": round(distance, 1)})
+        for restaurant, distance in nearby
+    ]
+
 @router.get("/{restaurant_id}", response_model=RestaurantResponse)
-async def get_restaurant_by_id(restaurant_id: int, db: Session = Depends(get_db)):
-    """Получение детальной информации о ресторане"""
+async def get_restaurant_by_id(
+    restaurant_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Получение детальной информации о ресторане
+
+    Поддерживает условный запрос: при совпадении If-None-Match возвращается 304.
+    """
+    if if_none_match:
+        version = await get_restaurant_version(db, restaurant_id)
+        if version:
+            etag = restaurant_etag("restaurant", restaurant_id, *version)
+            if etag_matches(if_none_match, etag):
+                return Response(status_code=304, headers=cache_headers(etag, settings.HTTP_CACHE_MAX_AGE))
+
     restaurant = await get_restaurant(db, restaurant_id)
     if not restaurant:
         raise HTTPException(status_code=404, detail="Restaurant not found")
+    etag = restaurant_etag("restaurant", restaurant.id, restaurant.updated_at, restaurant.latest_review_id)
+    response.headers.update(cache_headers(etag, settings.HTTP_CACHE_MAX_AGE))
     return restaurant
 
 @router.get("/", response_model=List[RestaurantResponse])
 async def search_restaurants(
+    q: Optional[str] = Query(None, max_length=200, description="Полнотекстовый поиск по названию, адресу и отзывам"),
     cuisine: Optional[str] = None,
     min_rating: Optional[float] = Query(None, ge=0, le=5),
     max_price: Optional[int] = Query(None, ge=0, le=4),
+    min_reviews: Optional[int] = Query(None, ge=0),
+    min_user_rating: Optional[float] = Query(None, ge=0, le=5),
+    min_sentiment: Optional[float] = Query(None, ge=0, le=1),
+    sort: Optional[str] = Query(default=None, pattern="^(" + "|".join(SEARCH_SORTS) + ")$"),
     skip: int = Query(default=0, ge=0),
     limit: int = Query(default=20, ge=1, le=100),
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(default=None, description="Курсор из заголовка X-Next-Cursor"),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Поиск ресторанов с фильтрацией"""
+    """
+    Поиск ресторанов с фильтрацией
+
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    С q по умолчанию сортирует по релевантности, иначе по рейтингу.
+    """
+    if sort is None:
+        sort = RELEVANCE_SORT if q else DEFAULT_SORT
     try:
         filters = RestaurantFilter(
+            q=q,
             cuisine=cuisine,
             min_rating=min_rating,
-            max_price=max_price
+            max_price=max_price,
+            min_reviews=min_reviews,
+            min_user_rating=min_user_rating,
+            min_sentiment=min_sentiment
         )
-        restaurants = await get_restaurants(db, filters, skip, limit)
-        return restaurants or []
+        cache_key = search_cache.make_key(filters, skip, limit, cursor, sort)
+        cached = search_cache.get(cache_key)
+        if cached is None:
+            restaurants = await get_restaurants(db, filters, skip, limit, cursor, sort)
+            payload = [
+                RestaurantResponse.model_validate(restaurant, from_attributes=True).model_dump(mode="json")
+                for restaurant in restaurants
+            ]
+            next_page = next_cursor(restaurants, limit, lambda restaurant: restaurant_sort_key(restaurant, sort))
+            search_cache.set(cache_key, filters, payload, next_page, sort)
+        else:
+            payload, next_page = cached["payload"], cached["next_cursor"]
+
+        headers = {"X-Next-Cursor": next_page} if next_page else None
+        return JSONResponse(content=payload, headers=headers)
     except ValueError as e:
         raise HTTPException(status_code=422, detail=str(e))
 
@@ -0,0 +1,77 @@
+from datetime import datetime
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from ...db.session import get_db
+from ...schemas.restaurant import RestaurantFilter
+from ...services.export_service import (
+    EXPORT_FORMATS,
+    build_restaurants_export_query,
+    build_reviews_export_query,
+    stream_export
+)
+
+router = APIRouter(prefix="/export", tags=["export"])
+
+FORMAT_PATTERN = "^(" + "|".join(EXPORT_FORMATS) + ")$"
+
+def export_response(db: AsyncSession, query, fmt: str, name: str) -> StreamingResponse:
+    return StreamingResponse(
+        stream_export(db, query, fmt),
+        media_type=EXPORT_FORMATS[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+    )
+
+@router.get("/restaurants")
+async def export_restaurants(
+    format: str = Query(default="ndjson", pattern=FORMAT_PATTERN),
+    updated_since: Optional[datetime] = Query(None, description="Только измененные начиная с момента (UTC)"),
+    q: Optional[str] = Query(None, max_length=200),
+    cuisine: Optional[str] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    max_price: Optional[int] = Query(None, ge=0, le=4),
+    min_reviews: Optional[int] = Query(None, ge=0),
+    min_user_rating: Optional[float] = Query(None, ge=0, le=5),
+    min_sentiment: Optional[float] = Query(None, ge=0, le=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """Потоковая выгрузка ресторанов (NDJSON или CSV) с фильтрами поиска"""
+    filters = RestaurantFilter(
+        q=q,
+        cuisine=cuisine,
+        min_rating=min_rating,
+        max_price=max_price,
+        min_reviews=min_reviews,
+        min_user_rating=min_user_rating,
+        min_sentiment=min_sentiment
+    )
+    query = build_restaurants_export_query(filters, updated_since)
+    return export_response(db, query, format, "restaurants")
+
+@router.get("/reviews")
+async def export_reviews(
+    format: str = Query(default="ndjson", pattern=FORMAT_PATTERN),
+    updated_since: Optional[datetime] = Query(None, description="Только измененные начиная с момента (UTC)"),
+    restaurant_id: Optional[int] = None,
+    q: Optional[str] = Query(None, max_length=200),
+    cuisine: Optional[str] = None,
+    min_rating: Optional[float] = Query(None, ge=0, le=5),
+    max_price: Optional[int] = Query(None, ge=0, le=4),
+    min_reviews: Optional[int] = Query(None, ge=0),
+    min_user_rating: Optional[float] = Query(None, ge=0, le=5),
+    min_sentiment: Optional[float] = Query(None, ge=0, le=1),
+    db: AsyncSession = Depends(get_db)
+):
+    """Потоковая выгрузка отзывов (NDJSON или CSV); фильтры поиска отбирают рестораны"""
+    filters = RestaurantFilter(
+        q=q,
+        cuisine=cuisine,
+        min_rating=min_rating,
+        max_price=max_price,
+        min_reviews=min_reviews,
+        min_user_rating=min_user_rating,
+        min_sentiment=min_sentiment
+    )
+    query = build_reviews_export_query(filters, updated_since, restaurant_id)
+    return export_response(db, query, format, "reviews")
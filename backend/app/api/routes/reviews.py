@@ -1,50 +1,94 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ...core.config import settings
+from ...core.etag import cache_headers, etag_matches
+from ...core.pagination import next_cursor
 from ...db.session import get_db
-from ...db.models import Restaurant, Review
+from ...db.models import Restaurant
 from ...schemas.review import ReviewCreate, ReviewResponse
-from ...services.review_service import analyze_sentiment
+from ...services.cafe_service import get_restaurant_version, restaurant_etag
+from ...services.review_service import get_reviews, review_sort_key, sentiment_batcher, sentiment_cache
+from ...services.review_service import create_review as save_review
+from ...services.search_cache import restaurant_state, search_cache
+from ...services.sentiment_queue import sentiment_queue
 
 router = APIRouter()
 
+@router.get("/sentiment/queue")
+async def get_sentiment_queue_status():
+    """Состояние очереди оценки тональности: глубина и пропускная способность"""
+    return await sentiment_queue.stats()
+
+@router.get("/sentiment/stats")
+async def get_sentiment_stats():
+    """Метрики оценки тональности: кэш, размеры пакетов и задержка"""
+    return {**sentiment_batcher.stats(), "cache": sentiment_cache.stats()}
+
 @router.post("/{restaurant_id}/reviews", response_model=ReviewResponse, status_code=201)
 async def create_review(
     restaurant_id: int,
     review: ReviewCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Создание нового отзыва с AI-анализом"""
     try:
-        restaurant = db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+        restaurant = await db.get(Restaurant, restaurant_id)
         if not restaurant:
             raise HTTPException(status_code=404, detail="Restaurant not found")
+        # Состояние до записи: страницы, где ресторан был, тоже устаревают
+        before = restaurant_state(restaurant)
 
-        db_review = Review(
-            restaurant_id=restaurant_id,
+        db_review = await save_review(
+            db,
+            restaurant_id,
             author=review.author,
             text=review.text,
-            rating=review.rating,
-            sentiment_score=await analyze_sentiment(review.text)
+            rating=review.rating
+        )
+        # Тональность оценивается фоновыми воркерами, ответ ее не ждет
+        sentiment_queue.notify()
+        await db.refresh(restaurant)
+        search_cache.invalidate_restaurant(
+            restaurant_id,
+            before,
+            restaurant_state(restaurant),
+            changed={"review_count", "avg_user_rating", "text"}
         )
-        
-        db.add(db_review)
-        db.commit()
-        db.refresh(db_review)
         return db_review
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/{restaurant_id}/reviews", response_model=List[ReviewResponse])
 async def get_restaurant_reviews(
     restaurant_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 10,
-    db: Session = Depends(get_db)
+    cursor: Optional[str] = Query(default=None, description="Курсор из заголовка X-Next-Cursor"),
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Получение отзывов о ресторане"""
-    reviews = db.query(Review).filter(
-        Review.restaurant_id == restaurant_id
-    ).offset(skip).limit(limit).all()
+    """
+    Получение отзывов о ресторане
+
+    Курсор следующей страницы возвращается в заголовке X-Next-Cursor.
+    При совпадении If-None-Match возвращается 304 без выборки отзывов.
+    """
+    version = await get_restaurant_version(db, restaurant_id)
+    headers = {}
+    if version:
+        headers = cache_headers(restaurant_etag("reviews", restaurant_id, *version), settings.HTTP_CACHE_MAX_AGE)
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+    try:
+        reviews = await get_reviews(db, restaurant_id, skip, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    next_page = next_cursor(reviews, limit, review_sort_key)
+    if next_page:
+        response.headers["X-Next-Cursor"] = next_page
+    response.headers.update(headers)
     return reviews
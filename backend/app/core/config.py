@@ -0,0 +1,98 @@
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+class Settings:
+    """Настройки приложения из переменных окружения"""
+
+    def __init__(self):
+        self.DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./goodfood.db")
+        self.DB_ECHO = os.getenv("DB_ECHO", "false").lower() == "true"
+
+        # Пул соединений
+        self.DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+        self.DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        self.DB_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+        # Профиль SQLite: "production" (WAL и прагмы) или "default" (настройки SQLite по умолчанию)
+        self.SQLITE_PROFILE = os.getenv("SQLITE_PROFILE", "production")
+        self.SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        self.SQLITE_CACHE_SIZE_KB = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+        self.SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+
+        # Обслуживание БД: ANALYZE и incremental vacuum, 0 - отключено
+        self.DB_MAINTENANCE_INTERVAL = int(os.getenv("DB_MAINTENANCE_INTERVAL", "3600"))
+        self.DB_VACUUM_PAGES = int(os.getenv("DB_VACUUM_PAGES", "1000"))
+
+        # Кэш страниц поиска ресторанов, TTL 0 - отключен
+        self.SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "60"))
+        self.SEARCH_CACHE_SIZE = int(os.getenv("SEARCH_CACHE_SIZE", "1024"))
+
+        # Cache-Control max-age для карточки ресторана и списка отзывов
+        self.HTTP_CACHE_MAX_AGE = int(os.getenv("HTTP_CACHE_MAX_AGE", "60"))
+
+        # Движок тональности: "openai", "local" (ml.models.sentiment) или "fallback" (openai, при сбое - local)
+        self.SENTIMENT_ENGINE = os.getenv("SENTIMENT_ENGINE", "openai")
+
+        # Анализ тональности: модель, дедлайн запроса (с ожиданием очереди) и лимит параллельных запросов
+        self.SENTIMENT_MODEL = os.getenv("SENTIMENT_MODEL", "gpt-3.5-turbo")
+        self.SENTIMENT_TIMEOUT = float(os.getenv("SENTIMENT_TIMEOUT", "5"))
+        self.SENTIMENT_CONCURRENCY = int(os.getenv("SENTIMENT_CONCURRENCY", "8"))
+        # Микро-батчинг: до SENTIMENT_BATCH_SIZE отзывов в одном запросе, ожидание не дольше SENTIMENT_BATCH_WAIT_MS
+        self.SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_BATCH_SIZE", "20"))
+        self.SENTIMENT_BATCH_WAIT_MS = float(os.getenv("SENTIMENT_BATCH_WAIT_MS", "50"))
+
+        # Фоновая очередь оценки тональности: воркеры (0 - не запускать), попытки, задержка повтора и аренда задания
+        self.SENTIMENT_WORKERS = int(os.getenv("SENTIMENT_WORKERS", "2"))
+        self.SENTIMENT_MAX_ATTEMPTS = int(os.getenv("SENTIMENT_MAX_ATTEMPTS", "5"))
+        self.SENTIMENT_RETRY_BACKOFF = float(os.getenv("SENTIMENT_RETRY_BACKOFF", "30"))
+        self.SENTIMENT_JOB_LEASE = float(os.getenv("SENTIMENT_JOB_LEASE", "120"))
+        self.SENTIMENT_QUEUE_POLL = float(os.getenv("SENTIMENT_QUEUE_POLL", "5"))
+
+        # Кэш оценок тональности: размер in-memory LRU перед таблицей sentiment_cache
+        self.SENTIMENT_CACHE_SIZE = int(os.getenv("SENTIMENT_CACHE_SIZE", "10000"))
+
+        # Выгрузка: строк на одну выборку серверного курсора (yield_per)
+        self.EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+        # Обновление деталей мест: запросов Place Details в сутки и минимальный интервал между обновлениями места
+        self.REFRESH_DAILY_BUDGET = int(os.getenv("REFRESH_DAILY_BUDGET", "1000"))
+        self.REFRESH_MIN_INTERVAL_HOURS = float(os.getenv("REFRESH_MIN_INTERVAL_HOURS", "24"))
+
+    @property
+    def async_database_url(self) -> str:
+        """URL базы данных с асинхронным драйвером (aiosqlite / asyncpg)"""
+        url = self.DATABASE_URL
+        if url.startswith("sqlite:"):
+            return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+        if url.startswith("postgresql:"):
+            return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+        if url.startswith("postgres:"):
+            return url.replace("postgres:", "postgresql+asyncpg:", 1)
+        return url
+
+    @property
+    def is_sqlite(self) -> bool:
+        return self.DATABASE_URL.startswith("sqlite")
+
+    @property
+    def sqlite_pragmas(self) -> dict:
+        """Прагмы, выполняемые на каждом новом соединении SQLite"""
+        if self.SQLITE_PROFILE != "production":
+            return {"busy_timeout": self.SQLITE_BUSY_TIMEOUT_MS}
+        return {
+            # Действует только для новой БД (или после VACUUM)
+            "auto_vacuum": "INCREMENTAL",
+            "journal_mode": "WAL",
+            "synchronous": "NORMAL",
+            "busy_timeout": self.SQLITE_BUSY_TIMEOUT_MS,
+            # Отрицательное значение - размер кэша в KiB, а не в страницах
+            "cache_size": -self.SQLITE_CACHE_SIZE_KB,
+            "mmap_size": self.SQLITE_MMAP_SIZE,
+            "temp_store": "MEMORY",
+        }
+
+
+settings = Settings()
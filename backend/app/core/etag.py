@@ -0,0 +1,27 @@
+import hashlib
+from typing import Optional
+
+# Меняется вместе с форматом ответов, чтобы старые ETag не совпадали
+ETAG_VERSION = "3"
+
+def make_etag(*parts) -> str:
+    """Сильный ETag из частей версии ресурса"""
+    raw = ":".join("" if part is None else str(part) for part in (ETAG_VERSION, *parts))
+    return '"' + hashlib.sha1(raw.encode()).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка заголовка If-None-Match (список ETag или *)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = {candidate.strip() for candidate in if_none_match.split(",")}
+    # If-None-Match использует слабое сравнение
+    return etag in candidates or f"W/{etag}" in candidates
+
+def cache_headers(etag: str, max_age: int) -> dict:
+    """Заголовки для кэшей браузера и CDN: ETag и Cache-Control"""
+    return {
+        "ETag": etag,
+        "Cache-Control": f"public, max-age={max_age}"
+    }
@@ -0,0 +1,113 @@
+import math
+from typing import List, Tuple
+
+EARTH_RADIUS_M = 6371008.8
+GEOHASH_PRECISION = 12
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash_encode(latitude: float, longitude: float, precision: int = GEOHASH_PRECISION) -> str:
+    """Кодирует координаты в geohash заданной длины"""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+    while len(chars) < precision:
+        rng, value = (lng_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+    return "".join(chars)
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """Размер ячейки geohash в градусах: (широта, долгота)"""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+def haversine_m(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Расстояние между двумя точками в метрах"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(latitude: float, longitude: float, radius_m: float) -> Tuple[float, float, float, float]:
+    """
+    Ограничивающий прямоугольник круга: (min_lat, max_lat, min_lng, max_lng)
+
+    Считается на той же сфере, что и haversine_m, поэтому все точки круга
+    попадают в прямоугольник, в том числе лежащие на его границе.
+    """
+    angle = min(radius_m / EARTH_RADIUS_M, math.pi)
+    dlat = math.degrees(angle)
+    cos_lat = math.cos(math.radians(latitude))
+    if math.sin(angle) >= cos_lat:
+        # Круг содержит полюс или доходит до него
+        dlng = 180.0
+    else:
+        dlng = math.degrees(math.asin(math.sin(angle) / cos_lat))
+    return (
+        max(latitude - dlat, -90.0),
+        min(latitude + dlat, 90.0),
+        longitude - dlng,
+        longitude + dlng
+    )
+
+def covering_geohashes(latitude: float, longitude: float, radius_m: float) -> List[str]:
+    """
+    Префиксы geohash, ячейки которых покрывают круг поиска
+
+    Выбирается самая длинная точность, при которой ячейка не меньше радиуса,
+    тогда круг покрывают не более 3x3 ячеек, найденных по 9 точкам сетки.
+    Если не подходит даже точность 1 (круг у полюса или шире ячейки по
+    долготе), возвращаются все ячейки точности 1 в полосе широт круга.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_m)
+    dlat = (max_lat - min_lat) / 2
+    dlng = (max_lng - min_lng) / 2
+
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lng = geohash_cell_size(precision)
+        if cell_lat >= dlat and cell_lng >= dlng:
+            break
+    else:
+        return latitude_band_geohashes(min_lat, max_lat)
+
+    prefixes = set()
+    for i in range(3):
+        for j in range(3):
+            lat = min_lat + dlat * i
+            lng = (min_lng + dlng * j + 180.0) % 360.0 - 180.0
+            prefixes.add(geohash_encode(lat, lng, precision))
+    return sorted(prefixes)
+
+def latitude_band_geohashes(min_lat: float, max_lat: float) -> List[str]:
+    """Все ячейки geohash точности 1, пересекающие полосу широт [min_lat, max_lat]"""
+    cell_lat, cell_lng = geohash_cell_size(1)
+    prefixes = []
+    for row in range(round(180.0 / cell_lat)):
+        south = -90.0 + row * cell_lat
+        if south > max_lat or south + cell_lat < min_lat:
+            continue
+        for column in range(round(360.0 / cell_lng)):
+            west = -180.0 + column * cell_lng
+            prefixes.append(geohash_encode(south + cell_lat / 2, west + cell_lng / 2, 1))
+    return sorted(prefixes)
+
+def geohash_range(prefix: str) -> Tuple[str, str]:
+    """Диапазон [start, end) значений geohash с данным префиксом для индексного поиска"""
+    # '{' следует за 'z' - последним символом алфавита geohash
+    return prefix, prefix + "{"
@@ -0,0 +1,34 @@
+import base64
+import json
+from typing import Any, List, Optional
+
+def encode_cursor(values: List[Any]) -> str:
+    """Кодирует значения ключа сортировки последней строки в непрозрачный курсор"""
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    """
+    Декодирует курсор, созданный encode_cursor
+
+    Args:
+        cursor: строка курсора из запроса
+        size: ожидаемое количество значений ключа
+
+    Raises:
+        ValueError: если курсор поврежден
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("Invalid cursor")
+    return values
+
+def next_cursor(items: list, limit: int, key) -> Optional[str]:
+    """Курсор следующей страницы или None, если страница неполная"""
+    if not items or len(items) < limit:
+        return None
+    return encode_cursor(key(items[-1]))
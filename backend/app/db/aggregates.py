@@ -0,0 +1,108 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import Update, bindparam, case, func, select, update
+from sqlalchemy.engine import Engine
+from .models import Restaurant, Review
+
+AGGREGATE_FIELDS = ("review_count", "review_rating_sum", "sentiment_count", "sentiment_sum", "last_review_at")
+
+def add_review_to_aggregates(
+    restaurant_id: int,
+    rating: float,
+    sentiment_score: Optional[float],
+    created_at: datetime
+) -> Update:
+    """
+    UPDATE, добавляющий отзыв в агрегаты ресторана
+
+    Выражения считаются в самой БД, поэтому параллельные отзывы не теряются.
+    """
+    values = {
+        Restaurant.review_count: Restaurant.review_count + 1,
+        Restaurant.review_rating_sum: Restaurant.review_rating_sum + rating,
+        Restaurant.last_review_at: case(
+            (Restaurant.last_review_at.is_(None), created_at),
+            (Restaurant.last_review_at < created_at, created_at),
+            else_=Restaurant.last_review_at
+        )
+    }
+    if sentiment_score is not None:
+        values[Restaurant.sentiment_count] = Restaurant.sentiment_count + 1
+        values[Restaurant.sentiment_sum] = Restaurant.sentiment_sum + sentiment_score
+    return (
+        update(Restaurant)
+        .where(Restaurant.id == restaurant_id)
+        .values(values)
+        .execution_options(synchronize_session=False)
+    )
+
+def add_sentiment_to_aggregates(restaurant_id: int, sentiment_score: float) -> Update:
+    """UPDATE, добавляющий тональность уже учтенного отзыва"""
+    return (
+        update(Restaurant)
+        .where(Restaurant.id == restaurant_id)
+        .values({
+            Restaurant.sentiment_count: Restaurant.sentiment_count + 1,
+            Restaurant.sentiment_sum: Restaurant.sentiment_sum + sentiment_score
+        })
+        .execution_options(synchronize_session=False)
+    )
+
+def rebuild_review_aggregates(bind: Engine) -> int:
+    """
+    Пересчитывает агрегаты отзывов по таблице reviews
+
+    Обновляются только разошедшиеся строки, чтобы не менять updated_at
+    (и ETag) остальных ресторанов.
+
+    Returns:
+        Количество исправленных ресторанов
+    """
+    totals = (
+        select(
+            Review.restaurant_id.label("restaurant_id"),
+            func.count(Review.id).label("review_count"),
+            func.coalesce(func.sum(Review.rating), 0.0).label("review_rating_sum"),
+            func.count(Review.sentiment_score).label("sentiment_count"),
+            func.coalesce(func.sum(Review.sentiment_score), 0.0).label("sentiment_sum"),
+            func.max(Review.created_at).label("last_review_at")
+        )
+        .group_by(Review.restaurant_id)
+        .subquery()
+    )
+    query = (
+        select(
+            Restaurant.id,
+            *(getattr(Restaurant, field) for field in AGGREGATE_FIELDS),
+            *(getattr(totals.c, field) for field in AGGREGATE_FIELDS)
+        )
+        .outerjoin(totals, totals.c.restaurant_id == Restaurant.id)
+    )
+
+    with bind.begin() as conn:
+        drifted = []
+        for row in conn.execute(query):
+            restaurant_id = row[0]
+            current = row[1:1 + len(AGGREGATE_FIELDS)]
+            actual = row[1 + len(AGGREGATE_FIELDS):]
+            if actual[0] is None:
+                actual = (0, 0.0, 0, 0.0, None)
+            if _differs(current, actual):
+                drifted.append({"b_id": restaurant_id, **dict(zip(AGGREGATE_FIELDS, actual))})
+
+        if drifted:
+            conn.execute(
+                update(Restaurant.__table__)
+                .where(Restaurant.__table__.c.id == bindparam("b_id")),
+                drifted
+            )
+    return len(drifted)
+
+def _differs(current: tuple, actual: tuple) -> bool:
+    for current_value, actual_value in zip(current, actual):
+        if isinstance(actual_value, float) and current_value is not None:
+            if abs(current_value - actual_value) > 1e-9:
+                return True
+        elif current_value != actual_value:
+            return True
+    return False
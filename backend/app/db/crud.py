@@ -26,9 +26,12 @@ def get_restaurants(
 
 def create_restaurant(db: Session, restaurant: schemas.RestaurantCreate):
     """Создание нового ресторана"""
-    db_restaurant = models.Restaurant(**restaurant.model_dump(exclude={'location'}))
+    db_restaurant = models.Restaurant(**restaurant.model_dump(exclude={'location', 'categories'}))
     if restaurant.location:
         db_restaurant.location = models.Location(**restaurant.location.model_dump())
+    for name in dict.fromkeys(restaurant.categories or []):
+        category = db.query(models.Category).filter(models.Category.name == name).first()
+        db_restaurant.categories.append(category or models.Category(name=name))
     
     db.add(db_restaurant)
     db.commit()
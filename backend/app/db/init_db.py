@@ -1,5 +1,49 @@
-from .models import Base
+from sqlalchemy import bindparam, inspect, select, update
+from sqlalchemy.schema import CreateColumn
+from ..core.geo import geohash_encode
+from .models import Base, Location
 from .session import engine
 
+def add_missing_columns(bind=engine):
+    """Добавляет в существующие таблицы новые колонки моделей (nullable или с server_default)"""
+    inspector = inspect(bind)
+    existing_tables = set(inspector.get_table_names())
+    with bind.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    continue
+                ddl = CreateColumn(column).compile(dialect=bind.dialect)
+                conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN {ddl}")
+
+def backfill_geohashes(bind=engine):
+    """Заполняет geohash для локаций, сохраненных до появления колонки"""
+    with bind.begin() as conn:
+        rows = conn.execute(
+            select(Location.id, Location.latitude, Location.longitude)
+            .filter(Location.geohash.is_(None))
+        ).all()
+        if rows:
+            conn.execute(
+                update(Location.__table__)
+                .where(Location.__table__.c.id == bindparam("location_id"))
+                .values(geohash=bindparam("location_geohash")),
+                [
+                    {"location_id": location_id, "location_geohash": geohash_encode(latitude, longitude)}
+                    for location_id, latitude, longitude in rows
+                ]
+            )
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    add_missing_columns()
+    Base.metadata.create_all(bind=engine)
+    # create_all не добавляет новые индексы к уже существующим таблицам
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+    backfill_geohashes()
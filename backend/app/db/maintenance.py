@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from sqlalchemy.engine import Engine
+from ..core.config import settings
+from .models import FULLTEXT_TABLES
+
+logger = logging.getLogger(__name__)
+
+def run_maintenance(engine: Engine, vacuum_pages: int = None) -> None:
+    """
+    Обслуживание SQLite: обновление статистики планировщика, слияние
+    сегментов FTS5 и возврат свободных страниц без полной блокировки БД
+
+    Args:
+        engine: синхронный движок SQLAlchemy
+        vacuum_pages: сколько свободных страниц вернуть за один проход
+    """
+    if engine.dialect.name != "sqlite":
+        return
+    if vacuum_pages is None:
+        vacuum_pages = settings.DB_VACUUM_PAGES
+
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("ANALYZE")
+        existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for name in FULLTEXT_TABLES:
+            if name in existing:
+                # Ограниченное по объему слияние b-деревьев индекса после множества вставок
+                cursor.execute(f"INSERT INTO {name}({name}, rank) VALUES ('merge', 500)")
+        connection.commit()
+        # incremental_vacuum выполняется по шагам, fetchall доводит его до конца
+        cursor.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})")
+        cursor.fetchall()
+        cursor.execute("PRAGMA wal_checkpoint(PASSIVE)")
+        cursor.fetchall()
+        cursor.close()
+        connection.commit()
+    finally:
+        connection.close()
+
+async def maintenance_loop(engine: Engine, interval: float) -> None:
+    """Периодический запуск run_maintenance в отдельном потоке"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(run_maintenance, engine)
+            logger.info("Database maintenance completed")
+        except Exception as e:
+            logger.error(f"Database maintenance failed: {e}")
@@ -1,6 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Table, DateTime
-from sqlalchemy.orm import relationship, declarative_base, validates
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Table, Date, DateTime, Index, event, func, select, case, inspect
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import relationship, declarative_base, validates, column_property
 from datetime import datetime
+from ..core.geo import geohash_encode
 
 Base = declarative_base()
 
@@ -9,11 +11,26 @@ restaurant_categories = Table(
     'restaurant_categories',
     Base.metadata,
     Column('restaurant_id', Integer, ForeignKey('restaurants.id')),
-    Column('category_id', Integer, ForeignKey('categories.id'))
+    Column('category_id', Integer, ForeignKey('categories.id')),
+    # Индексы в обе стороны: поиск по кухне и загрузка категорий ресторана
+    Index('ix_restaurant_categories_restaurant_category', 'restaurant_id', 'category_id'),
+    Index('ix_restaurant_categories_category_restaurant', 'category_id', 'restaurant_id')
 )
 
 class Restaurant(Base):
     __tablename__ = 'restaurants'
+    __table_args__ = (
+        # Фильтры поиска: min_rating и/или max_price
+        Index('ix_restaurants_rating_price_level', 'rating', 'price_level'),
+        Index('ix_restaurants_price_level_rating', 'price_level', 'rating'),
+        # Порядок выдачи и курсор пагинации: (rating DESC, id DESC)
+        Index('ix_restaurants_rating_id', 'rating', 'id'),
+        Index('ix_restaurants_review_count_id', 'review_count', 'id'),
+        # Инкрементальная выгрузка: updated_since
+        Index('ix_restaurants_updated_at', 'updated_at'),
+        # Расход дневной квоты обновления деталей
+        Index('ix_restaurants_refreshed_at', 'refreshed_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     place_id = Column(String, unique=True, nullable=False)
@@ -24,6 +41,19 @@ class Restaurant(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Агрегаты отзывов, обновляются в транзакции создания отзыва
+    review_count = Column(Integer, nullable=False, default=0, server_default="0")
+    review_rating_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    sentiment_count = Column(Integer, nullable=False, default=0, server_default="0")
+    sentiment_sum = Column(Float, nullable=False, default=0.0, server_default="0")
+    last_review_at = Column(DateTime)
+
+    # Обновление деталей из Google: время последнего запроса и статистика изменений
+    # (экспоненциальные средние доли изменившихся ответов и |изменения рейтинга|)
+    refreshed_at = Column(DateTime)
+    change_rate = Column(Float, nullable=False, default=0.5, server_default="0.5")
+    rating_volatility = Column(Float, nullable=False, default=0.0, server_default="0")
+
     # Relationships
     location = relationship(
         "Location", 
@@ -37,6 +67,24 @@ class Restaurant(Base):
         secondary=restaurant_categories,
         back_populates="restaurants"
     )
+    @hybrid_property
+    def avg_user_rating(self):
+        """Средняя оценка посетителей"""
+        return self.review_rating_sum / self.review_count if self.review_count else None
+
+    @avg_user_rating.expression
+    def avg_user_rating(cls):
+        return case((cls.review_count > 0, cls.review_rating_sum / cls.review_count), else_=None)
+
+    @hybrid_property
+    def avg_sentiment(self):
+        """Средняя тональность оцененных отзывов"""
+        return self.sentiment_sum / self.sentiment_count if self.sentiment_count else None
+
+    @avg_sentiment.expression
+    def avg_sentiment(cls):
+        return case((cls.sentiment_count > 0, cls.sentiment_sum / cls.sentiment_count), else_=None)
+
     @validates('rating')
     def validate_rating(self, key, rating):
         if rating is not None and (rating < 0 or rating > 5):
@@ -53,9 +101,11 @@ class Location(Base):
     __tablename__ = 'locations'
     
     id = Column(Integer, primary_key=True)
-    restaurant_id = Column(Integer, ForeignKey('restaurants.id'))
+    restaurant_id = Column(Integer, ForeignKey('restaurants.id'), index=True)
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
+    # Пространственный индекс: поиск ближайших по префиксам geohash
+    geohash = Column(String(12), index=True)
     
     restaurant = relationship("Restaurant", back_populates="location")
     @validates('latitude')
@@ -70,8 +120,24 @@ class Location(Base):
             raise ValueError("Longitude must be between -180 and 180")
         return longitude
 
+@event.listens_for(Location, "before_insert")
+@event.listens_for(Location, "before_update")
+def set_location_geohash(mapper, connection, target):
+    """Пересчитывает geohash при сохранении координат"""
+    if target.latitude is not None and target.longitude is not None:
+        target.geohash = geohash_encode(target.latitude, target.longitude)
+
+# Статус оценки тональности отзыва
+SENTIMENT_DONE = "done"
+SENTIMENT_PENDING = "pending"  # ждет оценки в очереди sentiment_jobs
+SENTIMENT_FAILED = "failed"  # попытки оценки исчерпаны
+
 class Review(Base):
     __tablename__ = 'reviews'
+    __table_args__ = (
+        Index('ix_reviews_restaurant_id_created_at', 'restaurant_id', 'created_at'),
+        Index('ix_reviews_updated_at', 'updated_at'),
+    )
     
     id = Column(Integer, primary_key=True)
     restaurant_id = Column(Integer, ForeignKey('restaurants.id'))
@@ -79,10 +145,58 @@ class Review(Base):
     rating = Column(Float)
     text = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Меняется и при позднем заполнении sentiment_score; NULL у старых строк
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     sentiment_score = Column(Float)  # Для AI-анализа
+    sentiment_status = Column(String(16), index=True)
     
     restaurant = relationship("Restaurant", back_populates="reviews")
 
+# ID последнего отзыва - часть версии ресторана для ETag, загружается по запросу
+Restaurant.latest_review_id = column_property(
+    select(func.max(Review.id))
+    .where(Review.restaurant_id == Restaurant.id)
+    .correlate_except(Review)
+    .scalar_subquery(),
+    deferred=True
+)
+
+class SentimentJob(Base):
+    """Задание очереди оценки тональности; удаляется после оценки или последней попытки"""
+    __tablename__ = 'sentiment_jobs'
+    __table_args__ = (
+        Index('ix_sentiment_jobs_run_at', 'run_at'),
+    )
+
+    id = Column(Integer, primary_key=True)
+    review_id = Column(Integer, ForeignKey('reviews.id'), unique=True, nullable=False)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Когда задание можно взять: время повтора или окончание аренды воркером
+    run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class SentimentCacheEntry(Base):
+    """Оценка тональности по хэшу нормализованного текста, модели и версии промпта"""
+    __tablename__ = 'sentiment_cache'
+    __table_args__ = (
+        Index('ix_sentiment_cache_model_prompt_version', 'model', 'prompt_version'),
+    )
+
+    key = Column(String(64), primary_key=True)
+    score = Column(Float, nullable=False)
+    model = Column(String, nullable=False)
+    prompt_version = Column(String(16), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ApiUsage(Base):
+    """Число запросов к внешнему API за сутки (UTC) для соблюдения дневной квоты"""
+    __tablename__ = 'api_usage'
+
+    day = Column(Date, primary_key=True)
+    endpoint = Column(String, primary_key=True)
+    calls = Column(Integer, nullable=False, default=0, server_default="0")
+
 class Category(Base):
     __tablename__ = 'categories'
     
@@ -93,4 +207,83 @@ class Category(Base):
         "Restaurant", 
         secondary=restaurant_categories,
         back_populates="categories"
-    )
\ No newline at end of file
+    )
+# Полнотекстовый индекс SQLite FTS5 по названию, адресу и тексту отзывов.
+# Таблицы с внешним содержимым (content=...) не дублируют текст, а триггеры
+# синхронизируют индекс при любой записи, в том числе через bulk upsert.
+FULLTEXT_TABLES = {
+    "restaurants_fts": """
+        CREATE VIRTUAL TABLE IF NOT EXISTS restaurants_fts USING fts5(
+            name, address,
+            content='restaurants', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """,
+    "reviews_fts": """
+        CREATE VIRTUAL TABLE IF NOT EXISTS reviews_fts USING fts5(
+            text,
+            content='reviews', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+    """,
+}
+
+# Триггеры на UPDATE срабатывают только для индексируемых колонок: обновление
+# агрегатов отзывов не переиндексирует ресторан
+FULLTEXT_TRIGGERS = [
+    """
+    CREATE TRIGGER IF NOT EXISTS restaurants_fts_ai AFTER INSERT ON restaurants BEGIN
+        INSERT INTO restaurants_fts(rowid, name, address) VALUES (new.id, new.name, new.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS restaurants_fts_ad AFTER DELETE ON restaurants BEGIN
+        INSERT INTO restaurants_fts(restaurants_fts, rowid, name, address)
+        VALUES ('delete', old.id, old.name, old.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS restaurants_fts_au AFTER UPDATE OF name, address ON restaurants BEGIN
+        INSERT INTO restaurants_fts(restaurants_fts, rowid, name, address)
+        VALUES ('delete', old.id, old.name, old.address);
+        INSERT INTO restaurants_fts(rowid, name, address) VALUES (new.id, new.name, new.address);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_ai AFTER INSERT ON reviews BEGIN
+        INSERT INTO reviews_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_ad AFTER DELETE ON reviews BEGIN
+        INSERT INTO reviews_fts(reviews_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reviews_fts_au AFTER UPDATE OF text ON reviews BEGIN
+        INSERT INTO reviews_fts(reviews_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO reviews_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+]
+
+@event.listens_for(Base.metadata, "after_create")
+def create_fulltext_index(target, connection, **kw):
+    """Создает индекс FTS5 и триггеры; новый индекс заполняется из существующих строк"""
+    if connection.dialect.name != "sqlite":
+        return
+    existing = set(inspect(connection).get_table_names())
+    for name, ddl in FULLTEXT_TABLES.items():
+        connection.exec_driver_sql(ddl)
+        if name not in existing:
+            connection.exec_driver_sql(f"INSERT INTO {name}({name}) VALUES ('rebuild')")
+    for ddl in FULLTEXT_TRIGGERS:
+        connection.exec_driver_sql(ddl)
+
+@event.listens_for(Base.metadata, "before_drop")
+def drop_fulltext_index(target, connection, **kw):
+    """Удаляет индекс FTS5 вместе с таблицами (триггеры удаляются с таблицами)"""
+    if connection.dialect.name != "sqlite":
+        return
+    for name in FULLTEXT_TABLES:
+        connection.exec_driver_sql(f"DROP TABLE IF EXISTS {name}")
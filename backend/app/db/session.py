@@ -1,22 +1,66 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from ..core.config import settings
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./goodfood.db"
+SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
+ASYNC_DATABASE_URL = settings.async_database_url
 
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
-)
+def _engine_kwargs(url: str) -> dict:
+    """Параметры движка: connect_args и размер пула в зависимости от БД"""
+    kwargs = {"echo": settings.DB_ECHO}
+    if url.startswith("sqlite"):
+        kwargs["connect_args"] = {
+            "check_same_thread": False,
+            "timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+        }
+        # In-memory БД живет в единственном соединении, пул не настраиваем
+        if ":memory:" in url or "mode=memory" in url:
+            return kwargs
+    kwargs.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_pre_ping=not url.startswith("sqlite")
+    )
+    return kwargs
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Применяет прагмы профиля SQLite к новому соединению"""
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in settings.sqlite_pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+    finally:
+        cursor.close()
+
+def configure_sqlite(sync_engine: Engine) -> None:
+    """Подключает прагмы профиля к движку (для async - к async_engine.sync_engine)"""
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", _set_sqlite_pragmas)
+
+# Синхронный движок: создание таблиц, скрипты и миграции
+engine = create_engine(SQLALCHEMY_DATABASE_URL, **_engine_kwargs(SQLALCHEMY_DATABASE_URL))
+configure_sqlite(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Асинхронный движок для обработчиков API
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_engine_kwargs(ASYNC_DATABASE_URL))
+configure_sqlite(async_engine.sync_engine)
+
+AsyncSessionLocal = async_sessionmaker(
+    async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False
+)
+
 # Создаем таблицы при запуске
 from .models import Base
 Base.metadata.create_all(bind=engine)
 
 async def get_db():
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
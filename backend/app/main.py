@@ -1,18 +1,38 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from .api.routes.reviews import router as reviews_router
 from .api.routes.cafes import router as cafes_router
+from .api.routes.export import router as export_router
+from .core.config import settings
 from .db.init_db import init_db
+from .db.maintenance import maintenance_loop
+from .db.session import engine
+from .services.review_service import sentiment_cache
+from .services.sentiment_queue import sentiment_queue
+from ml.models.sentiment import shutdown_pool
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Действия при запуске и остановке приложения"""
     # Инициализация при запуске
     init_db()
+    await sentiment_cache.purge_stale()
+    if settings.SENTIMENT_WORKERS > 0:
+        await sentiment_queue.enqueue_pending()
+        sentiment_queue.start()
+    maintenance_task = None
+    if settings.is_sqlite and settings.DB_MAINTENANCE_INTERVAL > 0:
+        maintenance_task = asyncio.create_task(
+            maintenance_loop(engine, settings.DB_MAINTENANCE_INTERVAL)
+        )
     yield
     # Очистка при остановке
-    pass
+    if maintenance_task:
+        maintenance_task.cancel()
+    await sentiment_queue.stop()
+    shutdown_pool()
 
 app = FastAPI(
     title="GoodFood API",
@@ -27,10 +47,12 @@ app.add_middleware(
     allow_origins=["*"],
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"]
 )
 
 app.include_router(reviews_router, prefix="/restaurants")
 # Подключаем роутеры без префикса, так как он уже указан в роутерах
 # app.include_router(reviews_router)
-app.include_router(cafes_router)
\ No newline at end of file
+app.include_router(cafes_router)
+app.include_router(export_router)
@@ -1,10 +1,27 @@
-from .restaurant import RestaurantBase, RestaurantCreate, RestaurantResponse, RestaurantFilter
+from .restaurant import (
+    RestaurantBase,
+    RestaurantCreate,
+    RestaurantIngest,
+    RestaurantResponse,
+    RestaurantNearbyResponse,
+    RestaurantBulkItemStatus,
+    RestaurantBulkResponse,
+    FacetCount,
+    RestaurantFacetsResponse,
+    RestaurantFilter
+)
 from .review import ReviewBase, ReviewCreate, ReviewResponse
 
 __all__ = [
     "RestaurantBase",
     "RestaurantCreate", 
+    "RestaurantIngest",
     "RestaurantResponse",
+    "RestaurantNearbyResponse",
+    "RestaurantBulkItemStatus",
+    "RestaurantBulkResponse",
+    "FacetCount",
+    "RestaurantFacetsResponse",
     "RestaurantFilter",
     "ReviewBase",
     "ReviewCreate",
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field, ConfigDict
-from typing import Optional, List
+from pydantic import BaseModel, Field, ConfigDict, field_validator
+from typing import Optional, List, Union
 from datetime import datetime
 
 class LocationBase(BaseModel):
@@ -19,6 +19,11 @@ class RestaurantCreate(RestaurantBase):
     address: str  # обязательное поле
     price_level: int = Field(..., ge=0, le=4)  # обязательное поле
     location: Optional[LocationBase] = None
+    categories: Optional[List[str]] = None  # названия категорий (кухонь)
+
+class RestaurantIngest(RestaurantCreate):
+    """Ресторан из выгрузки Google: price_level в местах часто отсутствует"""
+    price_level: Optional[int] = Field(None, ge=0, le=4)
 
 class RestaurantResponse(RestaurantBase):
     id: int
@@ -26,14 +31,60 @@ class RestaurantResponse(RestaurantBase):
     created_at: Optional[datetime] = None
     updated_at: Optional[datetime] = None
     location: Optional[LocationBase] = None
+    review_count: int = 0
+    avg_user_rating: Optional[float] = None
+    avg_sentiment: Optional[float] = None
+    last_review_at: Optional[datetime] = None
     model_config = ConfigDict(from_attributes=True)
 
+class RestaurantNearbyResponse(RestaurantResponse):
+    distance_m: Optional[float] = None
+
+class RestaurantBulkItemStatus(BaseModel):
+    index: int  # позиция в запросе
+    place_id: Optional[str] = None
+    status: str  # created / updated / unchanged / duplicate / invalid
+    id: Optional[int] = None
+    error: Optional[str] = None
+
+class RestaurantBulkResponse(BaseModel):
+    items: List[RestaurantBulkItemStatus]
+    created: int
+    updated: int
+    unchanged: int = 0
+    failed: int
+    elapsed_ms: float
+    rows_per_sec: float
+
+class FacetCount(BaseModel):
+    value: Union[int, float, str]
+    count: int
+
+class RestaurantFacetsResponse(BaseModel):
+    total: int
+    categories: List[FacetCount]
+    price_level: List[FacetCount]
+    rating: List[FacetCount]  # корзины [value, value + 0.5)
+    min_rating: List[FacetCount]  # сколько ресторанов с rating >= value
+
 class RestaurantFilter(BaseModel):
+    q: Optional[str] = Field(None, max_length=200)
     cuisine: Optional[str] = None
     min_rating: Optional[float] = Field(None, ge=0, le=5)
     max_price: Optional[int] = Field(None, ge=0, le=4)
+    min_reviews: Optional[int] = Field(None, ge=0)
+    min_user_rating: Optional[float] = Field(None, ge=0, le=5)
+    min_sentiment: Optional[float] = Field(None, ge=0, le=1)
     model_config = ConfigDict(from_attributes=True)
 
+    @field_validator("cuisine")
+    @classmethod
+    def normalize_cuisine(cls, value: Optional[str]) -> Optional[str]:
+        """Одна нормализация для запроса в БД и ключа кэша поиска"""
+        if value is None:
+            return None
+        return value.strip() or None
+
 class ReviewBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     # ... остальной код
\ No newline at end of file
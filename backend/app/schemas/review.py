@@ -16,4 +16,5 @@ class ReviewResponse(ReviewBase):
     restaurant_id: int
     created_at: datetime
     sentiment_score: Optional[float] = None
+    sentiment_status: Optional[str] = None
     model_config = ConfigDict(from_attributes=True)
\ No newline at end of file
@@ -1,68 +1,564 @@
+import heapq
+import re
+from datetime import datetime
 from fastapi import HTTPException
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from ..db.models import Restaurant, Category, Location
-from ..schemas.restaurant import RestaurantFilter
+from sqlalchemy import Integer, Select, String, Subquery, and_, cast, column, delete, false, func, literal, literal_column, or_, select, table, tuple_, union_all
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager, joinedload, selectinload, undefer
+from typing import Any, Dict, List, Optional, Tuple
+from ml.utils.text_preprocessing import remove_stopwords, tokenize
+from ..core.geo import bounding_box, covering_geohashes, geohash_encode, geohash_range, haversine_m
+from ..core.etag import make_etag
+from ..core.pagination import decode_cursor
+from ..db.models import Restaurant, Category, Location, Review, restaurant_categories
+from ..schemas.restaurant import RestaurantCreate, RestaurantFilter
+from .search_cache import search_cache
 
-async def get_restaurant(db: Session, restaurant_id: int) -> Optional[Restaurant]:
+async def get_restaurant(db: AsyncSession, restaurant_id: int) -> Optional[Restaurant]:
     """
     Получение ресторана по ID
-    
+
     Args:
-        db: SQLAlchemy сессия
+        db: асинхронная SQLAlchemy сессия
         restaurant_id: ID ресторана
-        
+
     Returns:
         Restaurant или None если не найден
     """
-    return db.query(Restaurant).filter(Restaurant.id == restaurant_id).first()
+    # Один ресторан: локация (one-to-one) приходит в том же запросе через JOIN
+    query = (
+        select(Restaurant)
+        .options(joinedload(Restaurant.location), undefer(Restaurant.latest_review_id))
+        .filter(Restaurant.id == restaurant_id)
+    )
+    result = await db.execute(query)
+    return result.scalars().first()
 
-async def get_restaurants(
-    db: Session,
-    filters: RestaurantFilter,
-    skip: int = 0,
-    limit: int = 20
-) -> List[Restaurant]:
-    """Получение списка ресторанов с фильтрацией"""
-    query = db.query(Restaurant)
-    
+async def get_restaurant_version(db: AsyncSession, restaurant_id: int) -> Optional[Tuple[datetime, Optional[int]]]:
+    """Версия ресторана для ETag: (updated_at, ID последнего отзыва) или None"""
+    result = await db.execute(
+        select(Restaurant.updated_at, Restaurant.latest_review_id)
+        .filter(Restaurant.id == restaurant_id)
+    )
+    return result.first()
+
+def restaurant_etag(kind: str, restaurant_id: int, updated_at: Optional[datetime], latest_review_id: Optional[int]) -> str:
+    """ETag представления ресторана (kind: restaurant или reviews)"""
+    return make_etag(kind, restaurant_id, updated_at.isoformat() if updated_at else None, latest_review_id)
+
+# Виртуальные таблицы FTS5 (см. FULLTEXT_TABLES в models); rowid - ID ресторана или отзыва
+restaurants_fts = table("restaurants_fts", column("rowid"))
+reviews_fts = table("reviews_fts", column("rowid"))
+
+# Веса BM25 колонок restaurants_fts (name, address)
+FULLTEXT_WEIGHTS = (10.0, 2.0)
+
+def fulltext_query(q: str) -> Optional[str]:
+    """
+    Запрос FTS5 из пользовательской строки
+
+    Слова выделяются токенизатором отзывов (ml.utils.text_preprocessing),
+    стоп-слова отбрасываются (если остались только они - ищутся они).
+    Слова экранируются кавычками (операторы FTS5 не интерпретируются) и
+    объединяются через OR: больше совпавших слов - выше BM25. Последнее слово
+    ищется по префиксу. None - слов нет.
+    """
+    words = tokenize(q)
+    words = list(remove_stopwords(words)) or words
+    if not words:
+        return None
+    return " OR ".join(f'"{word}"' for word in words) + "*"
+
+def fulltext_matches(q: str) -> Subquery:
+    """
+    Рестораны, совпавшие с q по названию, адресу или тексту отзыва
+
+    Колонки: restaurant_id и relevance (-BM25, больше - лучше). Релевантность
+    ресторана - сумма лучшего совпадения в его названии и адресе и лучшего
+    совпадения среди отзывов: слова запроса, найденные в разных местах
+    (название и отзыв), складываются.
+    """
+    match = fulltext_query(q)
+    by_restaurant = (
+        select(
+            restaurants_fts.c.rowid.label("restaurant_id"),
+            literal("restaurant").label("source"),
+            (-func.bm25(literal_column("restaurants_fts"), *FULLTEXT_WEIGHTS)).label("relevance")
+        )
+        .where(literal_column("restaurants_fts").match(match))
+    )
+    by_review = (
+        select(
+            Review.restaurant_id.label("restaurant_id"),
+            literal("review").label("source"),
+            (-func.bm25(literal_column("reviews_fts"))).label("relevance")
+        )
+        .select_from(reviews_fts)
+        .join(Review, Review.id == reviews_fts.c.rowid)
+        .where(literal_column("reviews_fts").match(match))
+    )
+    matches = union_all(by_restaurant, by_review).subquery()
+    best = (
+        select(matches.c.restaurant_id, func.max(matches.c.relevance).label("relevance"))
+        .group_by(matches.c.restaurant_id, matches.c.source)
+        .subquery()
+    )
+    return (
+        select(best.c.restaurant_id, func.sum(best.c.relevance).label("relevance"))
+        .group_by(best.c.restaurant_id)
+        .subquery("fulltext")
+    )
+
+def build_restaurants_query(filters: RestaurantFilter, matches: Optional[Subquery] = None) -> Select:
+    """
+    Запрос поиска ресторанов с фильтрами RestaurantFilter (без пагинации)
+
+    Args:
+        filters: фильтры поиска
+        matches: готовый fulltext_matches(filters.q), если нужна его колонка relevance
+    """
+    query = select(Restaurant)
+
+    if filters.q:
+        if fulltext_query(filters.q) is None:
+            return query.filter(false())
+        if matches is None:
+            matches = fulltext_matches(filters.q)
+        query = query.join(matches, matches.c.restaurant_id == Restaurant.id)
     if filters.min_rating is not None:
         query = query.filter(Restaurant.rating >= filters.min_rating)
     if filters.max_price is not None:
         query = query.filter(Restaurant.price_level <= filters.max_price)
     if filters.cuisine:
         query = query.join(Restaurant.categories).filter(Category.name == filters.cuisine)
-        
-    return query.offset(skip).limit(limit).all()
+    if filters.min_reviews is not None:
+        query = query.filter(Restaurant.review_count >= filters.min_reviews)
+    if filters.min_user_rating is not None:
+        query = query.filter(Restaurant.avg_user_rating >= filters.min_user_rating)
+    if filters.min_sentiment is not None:
+        query = query.filter(Restaurant.avg_sentiment >= filters.min_sentiment)
+
+    return query
+
+# Поля сортировки поиска; порядок выдачи и ключ курсора - (поле DESC, id DESC)
+RESTAURANT_SORTS = {
+    "rating": Restaurant.rating,
+    "review_count": Restaurant.review_count,
+    "avg_user_rating": Restaurant.avg_user_rating,
+    "avg_sentiment": Restaurant.avg_sentiment,
+}
+DEFAULT_SORT = "rating"
+# Сортировка по релевантности BM25, по умолчанию при полнотекстовом поиске q
+RELEVANCE_SORT = "relevance"
+SEARCH_SORTS = (*RESTAURANT_SORTS, RELEVANCE_SORT)
+
+def restaurant_order(sort: str = DEFAULT_SORT) -> tuple:
+    """ORDER BY для сортировки поиска"""
+    return (RESTAURANT_SORTS[sort].desc().nulls_last(), Restaurant.id.desc())
+
+RESTAURANT_ORDER = restaurant_order(DEFAULT_SORT)
+
+def restaurant_sort_key(restaurant: Restaurant, sort: str = DEFAULT_SORT) -> list:
+    """Значения ключа сортировки ресторана для курсора"""
+    return [getattr(restaurant, sort), restaurant.id]
+
+async def get_restaurants(
+    db: AsyncSession,
+    filters: RestaurantFilter,
+    skip: int = 0,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    sort: str = DEFAULT_SORT
+) -> List[Restaurant]:
+    """
+    Получение списка ресторанов с фильтрацией
+
+    Без курсора используется offset-пагинация (skip), с курсором - keyset-пагинация
+    по (sort, id), стоимость которой не зависит от глубины страницы. При
+    sort=relevance ресторанам проставляется атрибут relevance для курсора.
+
+    Raises:
+        ValueError: если курсор поврежден или сортировка неизвестна
+    """
+    matches = None
+    if sort == RELEVANCE_SORT:
+        if not filters.q:
+            raise ValueError("Sort by relevance requires q")
+        if fulltext_query(filters.q) is None:
+            return []
+        matches = fulltext_matches(filters.q)
+        sort_column = matches.c.relevance
+    elif sort in RESTAURANT_SORTS:
+        sort_column = RESTAURANT_SORTS[sort]
+    else:
+        raise ValueError(f"Unknown sort: {sort}")
+    order = (sort_column.desc().nulls_last(), Restaurant.id.desc())
+    # Список: локации всех строк страницы загружаются одним запросом IN (...)
+    query = build_restaurants_query(filters, matches).options(selectinload(Restaurant.location))
+    if matches is not None:
+        query = query.add_columns(sort_column)
+
+    async def fetch(page_query: Select) -> List[Restaurant]:
+        result = await db.execute(page_query)
+        if matches is None:
+            return list(result.scalars().all())
+        restaurants = []
+        for restaurant, relevance in result.all():
+            restaurant.relevance = relevance
+            restaurants.append(restaurant)
+        return restaurants
+
+    if cursor is None:
+        return await fetch(query.order_by(*order).offset(skip).limit(limit))
+
+    value, last_id = decode_cursor(cursor, 2)
+    if not isinstance(last_id, int) or not isinstance(value, (int, float, type(None))):
+        raise ValueError("Invalid cursor")
+    items = []
+    if value is not None:
+        items = await fetch(
+            query.filter(tuple_(sort_column, Restaurant.id) < (value, last_id))
+            .order_by(*order)
+            .limit(limit)
+        )
+        if len(items) == limit:
+            return items
+        # Рестораны без значения поля сортировки идут после всех остальных
+        unrated = query.filter(sort_column.is_(None))
+    else:
+        unrated = query.filter(sort_column.is_(None), Restaurant.id < last_id)
+
+    return items + await fetch(unrated.order_by(Restaurant.id.desc()).limit(limit - len(items)))
+
+# Ширина корзины фасета рейтинга
+RATING_BUCKET = 0.5
+
+async def get_restaurant_facets(db: AsyncSession, filters: RestaurantFilter) -> Dict[str, Any]:
+    """
+    Фасеты выдачи поиска: количество ресторанов по категориям, price_level и
+    корзинам рейтинга
 
-async def create_restaurant(db: Session, data: dict) -> Restaurant:
+    Все счетчики считаются одним запросом: отфильтрованные рестораны (CTE)
+    группируются по каждому фасету, результаты объединяются UNION ALL.
+    """
+    matching = (
+        build_restaurants_query(filters)
+        .with_only_columns(Restaurant.id, Restaurant.rating, Restaurant.price_level)
+        .cte("matching")
+    )
+    bucket = cast(matching.c.rating / RATING_BUCKET, Integer)
+    facets = union_all(
+        select(literal("total"), literal(None, String), func.count())
+        .select_from(matching),
+        select(literal("categories"), Category.name, func.count())
+        .select_from(matching)
+        .join(restaurant_categories, restaurant_categories.c.restaurant_id == matching.c.id)
+        .join(Category, Category.id == restaurant_categories.c.category_id)
+        .group_by(Category.name),
+        select(literal("price_level"), cast(matching.c.price_level, String), func.count())
+        .filter(matching.c.price_level.is_not(None))
+        .group_by(matching.c.price_level),
+        select(literal("rating"), cast(bucket, String), func.count())
+        .filter(matching.c.rating.is_not(None))
+        .group_by(bucket)
+    )
+    result = await db.execute(facets)
+
+    counts = {"total": 0, "categories": [], "price_level": [], "rating": []}
+    for facet, value, count in result:
+        if facet == "total":
+            counts["total"] = count
+        elif facet == "categories":
+            counts["categories"].append({"value": value, "count": count})
+        elif facet == "price_level":
+            counts["price_level"].append({"value": int(value), "count": count})
+        else:
+            counts["rating"].append({"value": int(value) * RATING_BUCKET, "count": count})
+
+    counts["categories"].sort(key=lambda item: (-item["count"], item["value"]))
+    counts["price_level"].sort(key=lambda item: item["value"])
+    counts["rating"].sort(key=lambda item: item["value"], reverse=True)
+    # Накопленные счетчики для фильтра min_rating
+    counts["min_rating"] = []
+    total = 0
+    for item in counts["rating"]:
+        total += item["count"]
+        counts["min_rating"].append({"value": item["value"], "count": total})
+    return counts
+
+def build_nearby_query(
+    latitude: float,
+    longitude: float,
+    radius_m: float,
+    filters: RestaurantFilter
+) -> Select:
+    """
+    Запрос кандидатов для поиска рядом с точкой
+
+    Кандидаты выбираются по индексу geohash (не более 9 диапазонов префиксов)
+    и ограничивающему прямоугольнику круга.
+    """
+    min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, radius_m)
+    cells = [
+        and_(Location.geohash >= start, Location.geohash < end)
+        for start, end in map(geohash_range, covering_geohashes(latitude, longitude, radius_m))
+    ]
+    query = (
+        build_restaurants_query(filters)
+        .join(Restaurant.location)
+        .options(contains_eager(Restaurant.location))
+        .filter(or_(*cells))
+        .filter(Location.latitude.between(min_lat, max_lat))
+    )
+    # Прямоугольник, пересекающий антимеридиан, отсекается только по geohash
+    if min_lng >= -180 and max_lng <= 180:
+        query = query.filter(Location.longitude.between(min_lng, max_lng))
+    return query
+
+async def get_nearby_restaurants(
+    db: AsyncSession,
+    latitude: float,
+    longitude: float,
+    radius_m: float,
+    filters: RestaurantFilter,
+    limit: int = 20
+) -> List[Tuple[Restaurant, float]]:
+    """
+    Поиск ресторанов в радиусе от точки, ближайшие первыми
+
+    Returns:
+        Список пар (ресторан, расстояние в метрах)
+    """
+    result = await db.execute(build_nearby_query(latitude, longitude, radius_m, filters))
+    candidates = (
+        (restaurant, haversine_m(latitude, longitude, restaurant.location.latitude, restaurant.location.longitude))
+        for restaurant in result.unique().scalars()
+    )
+    in_radius = [(restaurant, distance) for restaurant, distance in candidates if distance <= radius_m]
+    return heapq.nsmallest(limit, in_radius, key=lambda item: item[1])
+
+async def get_or_create_categories(db: AsyncSession, names: List[str]) -> List[Category]:
+    """Категории по названиям, недостающие создаются"""
+    names = list(dict.fromkeys(names))
+    if not names:
+        return []
+    result = await db.execute(select(Category).filter(Category.name.in_(names)))
+    existing = {category.name: category for category in result.scalars()}
+    for name in names:
+        if name not in existing:
+            existing[name] = Category(name=name)
+            db.add(existing[name])
+    return [existing[name] for name in names]
+
+async def create_restaurant(db: AsyncSession, data: dict) -> Restaurant:
     """Создание нового ресторана"""
     try:
         # Проверяем уникальность place_id
-        exists = db.query(Restaurant).filter(Restaurant.place_id == data['place_id']).first()
+        exists = await db.scalar(
+            select(Restaurant.id).filter(Restaurant.place_id == data['place_id'])
+        )
         if exists:
             raise HTTPException(status_code=400, detail="Restaurant already exists")
-            
-        # Извлекаем данные локации
+
+        # Извлекаем данные локации и категорий
         location_data = data.pop('location', None)
-        
-        # Создаем ресторан
-        db_restaurant = Restaurant(**data)
+        category_names = data.pop('categories', None) or []
+
+        # Создаем ресторан вместе с локацией и категориями одной транзакцией
+        db_restaurant = Restaurant(
+            **data,
+            location=Location(**location_data) if location_data else None,
+            categories=await get_or_create_categories(db, category_names)
+        )
         db.add(db_restaurant)
-        db.commit()
-        db.refresh(db_restaurant)
-        
-        # Добавляем локацию если есть
-        if location_data:
-            location = Location(
-                restaurant_id=db_restaurant.id,
-                **location_data
-            )
-            db.add(location)
-            db.commit()
-            db.refresh(db_restaurant)
-            
+        await db.commit()
+
+        search_cache.invalidate_restaurant(db_restaurant.id, {
+            "rating": db_restaurant.rating,
+            "price_level": db_restaurant.price_level,
+            "categories": category_names
+        })
         return db_restaurant
     except Exception as e:
-        db.rollback()
-        raise HTTPException(status_code=400, detail=str(e))
\ No newline at end of file
+        await db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _dialect_insert(db: AsyncSession):
+    """insert() диалекта БД с поддержкой ON CONFLICT"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+async def bulk_upsert_restaurants(
+    db: AsyncSession,
+    items: List[RestaurantCreate]
+) -> List[Tuple[int, str]]:
+    """
+    Пакетный upsert ресторанов по place_id одной транзакцией
+
+    Рестораны, локации и категории пишутся через INSERT ... ON CONFLICT и
+    executemany - число запросов не зависит от размера пакета. Переданные
+    location и categories заменяют сохраненные, None оставляет их без изменений
+    (как и rating/price_level=None у мест из выгрузок, см. RestaurantIngest).
+    Ресторан, у которого ничего не изменилось, не записывается: updated_at
+    (ETag) и кэш поиска остаются прежними.
+
+    Args:
+        db: асинхронная SQLAlchemy сессия
+        items: рестораны с уникальными place_id
+
+    Returns:
+        Список (id, status) в порядке items, status - created, updated или unchanged
+    """
+    if not items:
+        return []
+    insert = _dialect_insert(db)
+    place_ids = [item.place_id for item in items]
+    now = datetime.utcnow()
+
+    try:
+        result = await db.execute(
+            select(
+                Restaurant.place_id, Restaurant.id, Restaurant.name, Restaurant.address,
+                Restaurant.rating, Restaurant.price_level, Location.latitude, Location.longitude
+            )
+            .outerjoin(Location, Location.restaurant_id == Restaurant.id)
+            .filter(Restaurant.place_id.in_(place_ids))
+        )
+        # Прежние значения: для сравнения и инвалидации кэша поиска
+        existing = {row.place_id: {**row._asdict(), "categories": []} for row in result}
+        if existing:
+            result = await db.execute(
+                select(Restaurant.place_id, Category.name)
+                .join(Restaurant.categories)
+                .filter(Restaurant.place_id.in_(list(existing)))
+            )
+            for place_id, name in result.all():
+                existing[place_id]["categories"].append(name)
+
+        def merged(item: RestaurantCreate) -> Dict[str, Any]:
+            """Значения колонок после записи (None в rating/price_level не затирает сохраненное)"""
+            old = existing.get(item.place_id, {})
+            return {
+                "name": item.name,
+                "address": item.address,
+                "rating": item.rating if item.rating is not None else old.get("rating"),
+                "price_level": item.price_level if item.price_level is not None else old.get("price_level")
+            }
+
+        def is_changed(item: RestaurantCreate) -> bool:
+            old = existing.get(item.place_id)
+            if old is None:
+                return True
+            if any(old[field] != value for field, value in merged(item).items()):
+                return True
+            if item.location is not None and (
+                old["latitude"] != item.location.latitude or old["longitude"] != item.location.longitude
+            ):
+                return True
+            return item.categories is not None and set(item.categories) != set(old["categories"])
+
+        changed = [item for item in items if is_changed(item)]
+
+        # Рестораны
+        fields = ("name", "address", "rating", "price_level")
+        restaurants = Restaurant.__table__
+        stmt = insert(restaurants)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["place_id"],
+            set_={
+                "name": stmt.excluded.name,
+                "address": stmt.excluded.address,
+                "rating": func.coalesce(stmt.excluded.rating, restaurants.c.rating),
+                "price_level": func.coalesce(stmt.excluded.price_level, restaurants.c.price_level),
+                "updated_at": now
+            }
+        )
+        if changed:
+            await db.execute(stmt, [
+                {
+                    "place_id": item.place_id,
+                    **{field: getattr(item, field) for field in fields},
+                    "created_at": now,
+                    "updated_at": now
+                }
+                for item in changed
+            ])
+        ids = {place_id: old["id"] for place_id, old in existing.items()}
+        new_ids = [item.place_id for item in changed if item.place_id not in existing]
+        if new_ids:
+            result = await db.execute(
+                select(Restaurant.place_id, Restaurant.id).filter(Restaurant.place_id.in_(new_ids))
+            )
+            ids.update(result.all())
+
+        # Локации: заменяем целиком
+        with_location = [item for item in changed if item.location is not None]
+        if with_location:
+            await db.execute(
+                delete(Location).filter(Location.restaurant_id.in_([ids[item.place_id] for item in with_location]))
+            )
+            await db.execute(insert(Location.__table__), [
+                {
+                    "restaurant_id": ids[item.place_id],
+                    "latitude": item.location.latitude,
+                    "longitude": item.location.longitude,
+                    "geohash": geohash_encode(item.location.latitude, item.location.longitude)
+                }
+                for item in with_location
+            ])
+
+        # Категории: создаем недостающие и заменяем связи
+        with_categories = [item for item in changed if item.categories is not None]
+        names = list(dict.fromkeys(name for item in with_categories for name in item.categories))
+        if names:
+            await db.execute(
+                insert(Category.__table__).on_conflict_do_nothing(index_elements=["name"]),
+                [{"name": name} for name in names]
+            )
+        if with_categories:
+            result = await db.execute(select(Category.name, Category.id).filter(Category.name.in_(names)))
+            category_ids = dict(result.all())
+            await db.execute(
+                delete(restaurant_categories).filter(
+                    restaurant_categories.c.restaurant_id.in_([ids[item.place_id] for item in with_categories])
+                )
+            )
+            links = [
+                {"restaurant_id": ids[item.place_id], "category_id": category_ids[name]}
+                for item in with_categories
+                for name in dict.fromkeys(item.categories)
+            ]
+            if links:
+                await db.execute(insert(restaurant_categories), links)
+
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+
+    search_cache.invalidate_restaurants(
+        (
+            ids[item.place_id],
+            [
+                {
+                    **{field: merged(item)[field] for field in ("rating", "price_level")},
+                    "categories": item.categories
+                },
+                *([{
+                    field: existing[item.place_id][field] for field in ("rating", "price_level", "categories")
+                }] if item.place_id in existing else [])
+            ]
+        )
+        for item in changed
+    )
+    changed_ids = {item.place_id for item in changed}
+    return [
+        (
+            ids[item.place_id],
+            "unchanged" if item.place_id not in changed_ids
+            else "updated" if item.place_id in existing else "created"
+        )
+        for item in items
+    ]
@@ -0,0 +1,104 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Any, AsyncIterator, Optional
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..db.models import Restaurant, Location, Review
+from ..schemas.restaurant import RestaurantFilter
+from .cafe_service import build_restaurants_query
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+def build_restaurants_export_query(filters: RestaurantFilter, updated_since: Optional[datetime] = None) -> Select:
+    """Плоские строки ресторанов для выгрузки с фильтрами поиска, в порядке id"""
+    query = (
+        build_restaurants_query(filters)
+        .with_only_columns(
+            Restaurant.id,
+            Restaurant.place_id,
+            Restaurant.name,
+            Restaurant.address,
+            Restaurant.rating,
+            Restaurant.price_level,
+            Location.latitude,
+            Location.longitude,
+            Restaurant.review_count,
+            Restaurant.avg_user_rating.label("avg_user_rating"),
+            Restaurant.avg_sentiment.label("avg_sentiment"),
+            Restaurant.last_review_at,
+            Restaurant.created_at,
+            Restaurant.updated_at
+        )
+        .outerjoin(Location, Location.restaurant_id == Restaurant.id)
+    )
+    if updated_since is not None:
+        query = query.filter(Restaurant.updated_at >= updated_since)
+    return query.order_by(Restaurant.id)
+
+def build_reviews_export_query(
+    filters: RestaurantFilter,
+    updated_since: Optional[datetime] = None,
+    restaurant_id: Optional[int] = None
+) -> Select:
+    """Строки отзывов для выгрузки; фильтры поиска применяются к ресторанам отзывов"""
+    query = select(
+        Review.id,
+        Review.restaurant_id,
+        Review.author,
+        Review.rating,
+        Review.text,
+        Review.sentiment_score,
+        Review.created_at,
+        Review.updated_at
+    )
+    if restaurant_id is not None:
+        query = query.filter(Review.restaurant_id == restaurant_id)
+    if any(value is not None for value in filters.model_dump().values()):
+        restaurant_ids = build_restaurants_query(filters).with_only_columns(Restaurant.id)
+        query = query.filter(Review.restaurant_id.in_(restaurant_ids))
+    if updated_since is not None:
+        # У отзывов, сохраненных до появления updated_at, версия - created_at
+        query = query.filter(func.coalesce(Review.updated_at, Review.created_at) >= updated_since)
+    return query.order_by(Review.id)
+
+def _json_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+async def stream_export(db: AsyncSession, query: Select, fmt: str) -> AsyncIterator[str]:
+    """
+    Потоковая выгрузка результата запроса в NDJSON или CSV
+
+    Строки читаются серверным курсором пачками по EXPORT_BATCH_SIZE, каждая
+    пачка отдается одним фрагментом - память не зависит от размера таблицы.
+    """
+    result = await db.stream(query.execution_options(yield_per=settings.EXPORT_BATCH_SIZE))
+    columns = list(result.keys())
+    if fmt == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield buffer.getvalue()
+
+    async for rows in result.partitions():
+        if fmt == "csv":
+            buffer.seek(0)
+            buffer.truncate()
+            writer.writerows(
+                [_json_value(value) if value is not None else "" for value in row]
+                for row in rows
+            )
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps(
+                    {column: _json_value(value) for column, value in zip(columns, row)},
+                    ensure_ascii=False
+                ) + "\n"
+                for row in rows
+            )
@@ -0,0 +1,256 @@
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Tuple
+from pydantic import ValidationError
+from ..schemas.restaurant import RestaurantIngest
+from .cafe_service import bulk_upsert_restaurants
+
+NDJSON_EXTENSIONS = (".jsonl", ".ndjson")
+READ_CHUNK_SIZE = 64 * 1024
+# Типы Google, не описывающие заведение (остальные становятся категориями)
+GENERIC_PLACE_TYPES = {"restaurant", "food", "point_of_interest", "establishment", "store"}
+_WHITESPACE = " \t\r\n"
+
+# Ошибки разбора неполного или испорченного места: место пропускается
+PLACE_ERRORS = (ValidationError, KeyError, TypeError, AttributeError)
+
+def place_to_restaurant(place: Dict[str, Any]) -> RestaurantIngest:
+    """
+    Ресторан из места Google (результат Text/Nearby Search или Place Details)
+
+    price_level необязателен: в выгрузках его часто нет.
+
+    Raises:
+        ValidationError: если обязательных полей нет (place_id, name, адрес)
+        KeyError, TypeError, AttributeError: если место или geometry неполные
+    """
+    location = (place.get("geometry") or {}).get("location")
+    categories = [
+        place_type for place_type in place.get("types") or []
+        if place_type not in GENERIC_PLACE_TYPES
+    ]
+    return RestaurantIngest.model_validate({
+        "place_id": place.get("place_id"),
+        "name": place.get("name"),
+        "address": place.get("formatted_address") or place.get("vicinity"),
+        "rating": place.get("rating"),
+        "price_level": place.get("price_level"),
+        "location": {"latitude": location["lat"], "longitude": location["lng"]} if location else None,
+        "categories": categories or None
+    })
+
+class _Reader:
+    """Буфер текста файла, дочитываемый кусками"""
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        if self.eof:
+            return False
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        # Прочитанное отбрасываем, чтобы буфер не рос с размером файла
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self) -> str:
+        """Следующий значимый символ (без сдвига) или "" в конце файла"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, chars: str) -> str:
+        char = self.skip_whitespace()
+        if not char or char not in chars:
+            raise ValueError(f"Expected one of {chars!r}, got {char!r}")
+        self.pos += 1
+        return char
+
+    def value(self, decoder: json.JSONDecoder) -> Any:
+        """Следующее JSON-значение целиком (дочитывает файл, пока значение не закончится)"""
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # Число на границе куска могло быть прочитано не полностью
+            if end == len(self.buffer) and not isinstance(value, (dict, list, str)) and self.fill():
+                continue
+            self.pos = end
+            return value
+
+def _iter_array(reader: _Reader, decoder: json.JSONDecoder) -> Iterator[Any]:
+    reader.expect("[")
+    if reader.skip_whitespace() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value(decoder)
+        if reader.expect(",]") == "]":
+            return
+
+def iter_json_places(f) -> Iterator[Dict[str, Any]]:
+    """
+    Места из JSON-файла без загрузки файла целиком
+
+    Поддерживаются ответы Google (объект с массивом results или объектом
+    result) и массив мест. Элементы results разбираются по одному.
+    """
+    reader = _Reader(f)
+    decoder = json.JSONDecoder()
+    first = reader.skip_whitespace()
+    if first == "[":
+        yield from _iter_array(reader, decoder)
+        return
+    reader.expect("{")
+    if reader.skip_whitespace() == "}":
+        return
+    while True:
+        key = reader.value(decoder)
+        reader.expect(":")
+        if key == "results" and reader.skip_whitespace() == "[":
+            yield from _iter_array(reader, decoder)
+        else:
+            value = reader.value(decoder)
+            if key == "result" and isinstance(value, dict):
+                yield value
+        if reader.expect(",}") == "}":
+            return
+
+def iter_ndjson_places(f, offset: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """
+    Места из NDJSON-файла (открыт в бинарном режиме), начиная с offset
+
+    Yields:
+        (место, смещение конца строки у последнего места строки, иначе 0);
+        незавершенная последняя строка (файл еще дописывается) пропускается
+        до следующего запуска, вместо испорченной строки выдается None
+    """
+    f.seek(offset)
+    for line in f:
+        if not line.endswith(b"\n"):
+            return
+        offset += len(line)
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # Испорченная строка учитывается как пропущенное место
+            yield None, offset
+            continue
+        # Строка может содержать и целый ответ API
+        if not isinstance(record, dict):
+            places = [record]
+        elif "results" in record:
+            places = record.get("results") or []
+        else:
+            places = [record.get("result", record)]
+        for number, place in enumerate(places, 1):
+            yield place, offset if number == len(places) else 0
+
+def iter_file_places(path: str, offset: int = 0) -> Iterator[Tuple[Dict[str, Any], int]]:
+    """
+    Места файла data/raw с позицией, до которой файл обработан
+
+    NDJSON читается с offset построчно. Обычный JSON обрабатывается целиком
+    (его пишут один раз), позиция - размер файла после последнего места.
+    Позиция 0 - после места еще нельзя продолжать (остаток строки или файла).
+    """
+    if path.endswith(NDJSON_EXTENSIONS):
+        with open(path, "rb") as f:
+            yield from iter_ndjson_places(f, offset)
+        return
+    if offset:
+        return
+    size = os.path.getsize(path)
+    with open(path, encoding="utf-8") as f:
+        places = iter_json_places(f)
+        place = next(places, None)
+        while place is not None:
+            following = next(places, None)
+            yield place, size if following is None else 0
+            place = following
+
+async def ingest_places(
+    session_factory,
+    places: Iterator[Tuple[Dict[str, Any], int]],
+    batch_size: int = 500
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Пакетный upsert мест по place_id
+
+    Места без обязательных полей или с неполной структурой пропускаются
+    (skipped), остальной поток продолжается. В пакете place_id
+    уникальны: повтор заменяет ранее прочитанное место. После записи каждого
+    пакета выдается прогресс с offset - последней позицией источника, до
+    которой он полностью записан в БД (0 - такой позиции еще нет).
+
+    Yields:
+        {"offset", "records", "upserted", "skipped", "created", "updated", "unchanged"} по пакету
+    """
+    batch: Dict[str, RestaurantIngest] = {}
+    records = skipped = 0
+    offset = 0
+
+    async def flush() -> Dict[str, Any]:
+        nonlocal batch, records, skipped
+        results = []
+        if batch:
+            async with session_factory() as db:
+                results = await bulk_upsert_restaurants(db, list(batch.values()))
+        progress = {
+            "offset": offset,
+            "records": records,
+            "upserted": len(results),
+            "skipped": skipped,
+            "created": sum(1 for _, status in results if status == "created"),
+            "updated": sum(1 for _, status in results if status == "updated"),
+            "unchanged": sum(1 for _, status in results if status == "unchanged")
+        }
+        batch = {}
+        records = skipped = 0
+        return progress
+
+    for place, position in places:
+        records += 1
+        try:
+            item = place_to_restaurant(place)
+        except PLACE_ERRORS:
+            skipped += 1
+        else:
+            batch.pop(item.place_id, None)
+            batch[item.place_id] = item
+        if position:
+            offset = position
+        if len(batch) >= batch_size:
+            yield await flush()
+    if records:
+        yield await flush()
+
+async def ingest_file(
+    session_factory,
+    path: str,
+    offset: int = 0,
+    batch_size: int = 500
+) -> AsyncIterator[Dict[str, Any]]:
+    """ingest_places для файла data/raw с продолжением с offset; в прогрессе - elapsed_s"""
+    started = time.perf_counter()
+    async for progress in ingest_places(session_factory, iter_file_places(path, offset), batch_size):
+        progress["elapsed_s"] = time.perf_counter() - started
+        yield progress
@@ -0,0 +1,320 @@
+import heapq
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+from sqlalchemy import bindparam, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from ..core.config import settings
+from ..core.geo import geohash_encode
+from ..db.models import ApiUsage, Location, Restaurant, Review
+
+logger = logging.getLogger(__name__)
+
+# Поля Place Details, которые сравниваются с рестораном (меньше полей - дешевле запрос)
+REFRESH_FIELDS = ["place_id", "name", "formatted_address", "rating", "price_level", "geometry/location"]
+# Окно, за которое считается скорость отзывов
+REVIEW_VELOCITY_DAYS = 30
+# Приоритет: давность * (BASE_CHANGE + change_rate + веса волатильности и скорости отзывов);
+# BASE_CHANGE не дает стабильным местам не обновляться никогда
+BASE_CHANGE = 0.1
+VOLATILITY_WEIGHT = 2.0
+VELOCITY_WEIGHT = 1.0
+# Сглаживание экспоненциальных средних change_rate и rating_volatility
+CHANGE_ALPHA = 0.3
+COORDINATE_EPSILON = 1e-6
+# Статусы Place Details, означающие, что места больше нет; остальные ошибки
+# (OVER_QUERY_LIMIT, REQUEST_DENIED, UNKNOWN_ERROR) - сбой запроса
+MISSING_STATUSES = {"NOT_FOUND", "INVALID_REQUEST"}
+RESTAURANT_COLUMNS = ("name", "address", "rating", "price_level")
+
+FetchDetails = Callable[[Sequence[str]], Awaitable[Dict[str, Dict[str, Any]]]]
+
+def refresh_priority(
+    staleness_days: float,
+    change_rate: float,
+    rating_volatility: float,
+    reviews_per_day: float
+) -> float:
+    """Ожидаемая польза повторного запроса деталей места"""
+    return staleness_days * (
+        BASE_CHANGE + change_rate
+        + VOLATILITY_WEIGHT * rating_volatility
+        + VELOCITY_WEIGHT * reviews_per_day
+    )
+
+# Эндпоинт в счетчике api_usage
+USAGE_ENDPOINT = "place/details"
+
+async def remaining_budget(db: AsyncSession, budget: int, now: datetime) -> int:
+    """Остаток дневной квоты (UTC) по счетчику запросов Place Details"""
+    used = await db.scalar(
+        select(ApiUsage.calls).where(ApiUsage.day == now.date(), ApiUsage.endpoint == USAGE_ENDPOINT)
+    )
+    return max(0, budget - (used or 0))
+
+async def record_usage(db: AsyncSession, calls: int, now: datetime) -> None:
+    """Добавляет запросы к дневному счетчику"""
+    result = await db.execute(
+        update(ApiUsage)
+        .where(ApiUsage.day == now.date(), ApiUsage.endpoint == USAGE_ENDPOINT)
+        .values(calls=ApiUsage.calls + calls)
+    )
+    if result.rowcount == 0:
+        db.add(ApiUsage(day=now.date(), endpoint=USAGE_ENDPOINT, calls=calls))
+    await db.commit()
+
+async def select_refresh_candidates(
+    db: AsyncSession,
+    limit: int,
+    now: datetime,
+    min_interval: timedelta
+) -> List[Dict[str, Any]]:
+    """
+    Места с наибольшим приоритетом обновления
+
+    Давность считается от refreshed_at, для не обновлявшихся мест - от
+    created_at (updated_at меняет каждый отзыв, он не говорит о свежести
+    данных Google). Места, обновленные позже min_interval назад, не выбираются.
+    Рестораны читаются потоком, в памяти только heap из limit лучших.
+    """
+    if limit <= 0:
+        return []
+    recent = (
+        select(Review.restaurant_id, func.count(Review.id).label("recent_reviews"))
+        .where(Review.created_at >= now - timedelta(days=REVIEW_VELOCITY_DAYS))
+        .group_by(Review.restaurant_id)
+        .subquery()
+    )
+    last_seen = func.coalesce(Restaurant.refreshed_at, Restaurant.created_at)
+    query = (
+        select(
+            Restaurant.id,
+            Restaurant.place_id,
+            last_seen.label("last_seen"),
+            Restaurant.change_rate,
+            Restaurant.rating_volatility,
+            func.coalesce(recent.c.recent_reviews, 0).label("recent_reviews")
+        )
+        .outerjoin(recent, recent.c.restaurant_id == Restaurant.id)
+        .where((Restaurant.refreshed_at.is_(None)) | (Restaurant.refreshed_at < now - min_interval))
+    )
+
+    heap: List[tuple] = []
+    result = await db.stream(query.execution_options(yield_per=1000))
+    async for row in result:
+        last_seen_at = row.last_seen
+        if isinstance(last_seen_at, str):
+            last_seen_at = datetime.fromisoformat(last_seen_at)
+        staleness = (now - last_seen_at).total_seconds() / 86400 if last_seen_at else REVIEW_VELOCITY_DAYS
+        priority = refresh_priority(
+            max(staleness, 0.0),
+            row.change_rate,
+            row.rating_volatility,
+            row.recent_reviews / REVIEW_VELOCITY_DAYS
+        )
+        item = (priority, row.id, row.place_id)
+        if len(heap) < limit:
+            heapq.heappush(heap, item)
+        elif item > heap[0]:
+            heapq.heapreplace(heap, item)
+    return [
+        {"id": restaurant_id, "place_id": place_id, "priority": priority}
+        for priority, restaurant_id, place_id in sorted(heap, reverse=True)
+    ]
+
+def diff_place(current: Dict[str, Any], place: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Изменившиеся поля ресторана по ответу Place Details
+
+    Поле, которого нет в ответе или которое вне допустимого диапазона,
+    считается неизвестным и не сравнивается.
+    """
+    fetched = {
+        "name": place.get("name"),
+        "address": place.get("formatted_address"),
+        "rating": place.get("rating"),
+        "price_level": place.get("price_level"),
+    }
+    if fetched["rating"] is not None and not 0 <= fetched["rating"] <= 5:
+        fetched["rating"] = None
+    if fetched["price_level"] is not None and not 0 <= fetched["price_level"] <= 4:
+        fetched["price_level"] = None
+    changes = {
+        column: value for column, value in fetched.items()
+        if value is not None and value != current[column]
+    }
+
+    location = (place.get("geometry") or {}).get("location") or {}
+    latitude, longitude = location.get("lat"), location.get("lng")
+    if latitude is None or longitude is None:
+        return changes
+    if (
+        current["latitude"] is None
+        or abs(latitude - current["latitude"]) > COORDINATE_EPSILON
+        or abs(longitude - current["longitude"]) > COORDINATE_EPSILON
+    ):
+        changes["latitude"] = latitude
+        changes["longitude"] = longitude
+    return changes
+
+async def refresh_places(
+    session_factory,
+    fetch_details: FetchDetails,
+    budget: Optional[int] = None,
+    min_interval: Optional[timedelta] = None,
+    now: Optional[datetime] = None
+) -> Dict[str, int]:
+    """
+    Обновляет детали самых устаревших и изменчивых мест в пределах квоты
+
+    fetch_details получает place_id и возвращает {place_id: ответ Place Details}
+    (например, AsyncGoogleMapsAPI.get_places_details). Ответ сравнивается с
+    сохраненной строкой, записываются только изменившиеся колонки (одним
+    executemany на набор колонок); у неизменившихся мест обновляется только
+    статистика, updated_at (и ETag) сохраняется. Места без ответа или с
+    ошибкой запроса (например, OVER_QUERY_LIMIT после всех повторов) не
+    отмечаются обновленными и остаются в очереди на следующий запуск; квота
+    считается по запросам (api_usage), поэтому они ее тоже расходуют.
+
+    Кэш поиска не сбрасывается: он живет в памяти процесса API, а обновление
+    запускается отдельным процессом (scripts/refresh_places.py). Изменения
+    видны в поиске API после истечения SEARCH_CACHE_TTL.
+
+    Returns:
+        Счетчики: selected, fetched, changed, unchanged, missing, failed, columns_written
+    """
+    budget = settings.REFRESH_DAILY_BUDGET if budget is None else budget
+    if min_interval is None:
+        min_interval = timedelta(hours=settings.REFRESH_MIN_INTERVAL_HOURS)
+    now = now or datetime.utcnow()
+    stats = dict.fromkeys(
+        ("selected", "fetched", "changed", "unchanged", "missing", "failed", "columns_written"), 0
+    )
+
+    async with session_factory() as db:
+        limit = await remaining_budget(db, budget, now)
+        candidates = await select_refresh_candidates(db, limit, now, min_interval)
+        # Квота расходуется до запросов: и неудачный, и прерванный запрос оплачен
+        if candidates:
+            await record_usage(db, len(candidates), now)
+    stats["selected"] = len(candidates)
+    if not candidates:
+        return stats
+
+    details = await fetch_details([candidate["place_id"] for candidate in candidates])
+
+    restaurants = Restaurant.__table__
+    locations = Location.__table__
+    async with session_factory() as db:
+        result = await db.execute(
+            select(
+                restaurants.c.id,
+                *(restaurants.c[column] for column in RESTAURANT_COLUMNS),
+                restaurants.c.change_rate,
+                restaurants.c.rating_volatility,
+                locations.c.latitude,
+                locations.c.longitude
+            )
+            .outerjoin(locations, locations.c.restaurant_id == restaurants.c.id)
+            .where(restaurants.c.id.in_([candidate["id"] for candidate in candidates]))
+        )
+        rows = {row.id: row._asdict() for row in result}
+
+        # Обновления ресторанов по набору изменившихся колонок
+        groups: Dict[tuple, List[Dict[str, Any]]] = {}
+        location_updates = []
+        location_inserts = []
+        failures: Dict[str, int] = {}
+        for candidate in candidates:
+            current = rows.get(candidate["id"])
+            response = details.get(candidate["place_id"])
+            status = response.get("status") if response is not None else None
+            if current is None or (status != "OK" and status not in MISSING_STATUSES):
+                stats["failed"] += 1
+                reason = status or "NO_RESPONSE"
+                failures[reason] = failures.get(reason, 0) + 1
+                continue
+            stats["fetched"] += 1
+            if status != "OK":
+                # Место удалено: не запрашиваем его до следующего интервала
+                stats["missing"] += 1
+                groups.setdefault(((), False), []).append({
+                    "b_id": current["id"],
+                    "b_refreshed_at": now,
+                    "b_change_rate": current["change_rate"],
+                    "b_rating_volatility": current["rating_volatility"]
+                })
+                continue
+
+            changes = diff_place(current, response.get("result") or {})
+            columns = tuple(column for column in RESTAURANT_COLUMNS if column in changes)
+            rating_change = 0.0
+            if "rating" in changes and current["rating"] is not None:
+                rating_change = abs(changes["rating"] - current["rating"])
+            groups.setdefault((columns, bool(changes)), []).append({
+                "b_id": current["id"],
+                "b_refreshed_at": now,
+                "b_change_rate": current["change_rate"] * (1 - CHANGE_ALPHA) + CHANGE_ALPHA * bool(changes),
+                "b_rating_volatility": current["rating_volatility"] * (1 - CHANGE_ALPHA) + CHANGE_ALPHA * rating_change,
+                **{f"b_{column}": changes[column] for column in columns}
+            })
+            if "latitude" in changes:
+                location = {
+                    "b_restaurant_id": current["id"],
+                    "b_latitude": changes["latitude"],
+                    "b_longitude": changes["longitude"],
+                    "b_geohash": geohash_encode(changes["latitude"], changes["longitude"])
+                }
+                (location_inserts if current["latitude"] is None else location_updates).append(location)
+
+            if changes:
+                stats["changed"] += 1
+                stats["columns_written"] += len(columns) + ("latitude" in changes) * 2
+            else:
+                stats["unchanged"] += 1
+
+        try:
+            for (columns, changed), params in groups.items():
+                values = {
+                    "refreshed_at": bindparam("b_refreshed_at"),
+                    "change_rate": bindparam("b_change_rate"),
+                    "rating_volatility": bindparam("b_rating_volatility"),
+                    **{column: bindparam(f"b_{column}") for column in columns}
+                }
+                if not changed:
+                    # Без изменений данных updated_at (и ETag ресторана) не меняется
+                    values["updated_at"] = restaurants.c.updated_at
+                await db.execute(
+                    restaurants.update().where(restaurants.c.id == bindparam("b_id")).values(values),
+                    params
+                )
+            if location_updates:
+                await db.execute(
+                    locations.update()
+                    .where(locations.c.restaurant_id == bindparam("b_restaurant_id"))
+                    .values(
+                        latitude=bindparam("b_latitude"),
+                        longitude=bindparam("b_longitude"),
+                        geohash=bindparam("b_geohash")
+                    ),
+                    location_updates
+                )
+            if location_inserts:
+                await db.execute(locations.insert(), [
+                    {
+                        "restaurant_id": item["b_restaurant_id"],
+                        "latitude": item["b_latitude"],
+                        "longitude": item["b_longitude"],
+                        "geohash": item["b_geohash"]
+                    }
+                    for item in location_inserts
+                ])
+            await db.commit()
+        except Exception:
+            await db.rollback()
+            raise
+
+    if failures:
+        logger.warning(f"Place details requests failed, places stay queued: {failures}")
+    logger.info(f"Place details refresh: {stats}")
+    return stats
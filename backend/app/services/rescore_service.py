@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+from sqlalchemy import bindparam, delete, select
+from ml.models import sentiment as local_sentiment
+from ..core.config import settings
+from ..db.models import Restaurant, Review, SentimentJob, SENTIMENT_DONE, SENTIMENT_PENDING
+from . import review_service
+
+logger = logging.getLogger(__name__)
+
+RESCORE_ENGINES = ("openai", "local")
+
+def engine_signature(engine: str) -> Dict[str, Optional[str]]:
+    """Модель и версия промпта, которыми оцениваются отзывы (сохраняется в контрольной точке)"""
+    if engine == "local":
+        return {"engine": engine, "model": "lexicon", "prompt_version": None}
+    return {
+        "engine": engine,
+        "model": settings.SENTIMENT_MODEL,
+        "prompt_version": review_service.SENTIMENT_PROMPT_VERSION
+    }
+
+async def _score_remote_batch(texts: List[str]) -> List[Optional[float]]:
+    try:
+        return await review_service.score_sentiment_batch(texts)
+    except Exception as e:
+        logger.error(f"Sentiment batch failed: {e}")
+        return [None] * len(texts)
+
+async def score_texts(texts: Sequence[str], engine: str, workers: Optional[int] = None) -> List[Optional[float]]:
+    """
+    Оценка куска текстов выбранным движком
+
+    local - пакетом в пуле процессов (вне event loop). openai - пакетами по
+    SENTIMENT_BATCH_SIZE; одновременных запросов не больше SENTIMENT_CONCURRENCY
+    (общий семафор review_service), уже оцененные тексты берутся из sentiment_cache.
+
+    Returns:
+        Оценки в порядке текстов, None - текст не удалось оценить
+    """
+    if engine == "local":
+        return list(await asyncio.to_thread(local_sentiment.score_batch, texts, workers))
+
+    cache = review_service.sentiment_cache
+    scores: List[Optional[float]] = [await cache.get(text) for text in texts]
+    missing = [position for position, score in enumerate(scores) if score is None]
+    size = settings.SENTIMENT_BATCH_SIZE
+    batches = [missing[start:start + size] for start in range(0, len(missing), size)]
+    results = await asyncio.gather(*(
+        _score_remote_batch([texts[position] for position in batch]) for batch in batches
+    ))
+    for batch, batch_scores in zip(batches, results):
+        for position, score in zip(batch, batch_scores):
+            if score is not None:
+                scores[position] = score
+                await cache.set(texts[position], score)
+    return scores
+
+async def apply_scores(db, reviews: Sequence[Any], scores: Sequence[Optional[float]]) -> int:
+    """
+    Записывает новые оценки отзывов и поправки агрегатов ресторанов
+
+    Отзывы обновляются одним executemany, агрегаты - одним UPDATE на ресторан
+    с приращениями, посчитанными по старым оценкам. Задания очереди этих
+    отзывов удаляются, чтобы оценка не учлась в агрегатах второй раз.
+
+    Returns:
+        Количество обновленных отзывов
+    """
+    updates = []
+    deltas: Dict[int, List[float]] = {}
+    for review, score in zip(reviews, scores):
+        if score is None:
+            continue
+        updates.append({"b_id": review.id, "sentiment_score": score, "sentiment_status": SENTIMENT_DONE})
+        delta = deltas.setdefault(review.restaurant_id, [0, 0.0])
+        if review.sentiment_score is None:
+            delta[0] += 1
+            delta[1] += score
+        else:
+            delta[1] += score - review.sentiment_score
+    if not updates:
+        return 0
+
+    reviews_table = Review.__table__
+    restaurants_table = Restaurant.__table__
+    await db.execute(
+        reviews_table.update().where(reviews_table.c.id == bindparam("b_id")),
+        updates
+    )
+    await db.execute(
+        restaurants_table.update()
+        .where(restaurants_table.c.id == bindparam("b_id"))
+        .values(
+            sentiment_count=restaurants_table.c.sentiment_count + bindparam("b_added"),
+            sentiment_sum=restaurants_table.c.sentiment_sum + bindparam("b_delta")
+        ),
+        [
+            {"b_id": restaurant_id, "b_added": added, "b_delta": delta}
+            for restaurant_id, (added, delta) in deltas.items()
+        ]
+    )
+    await db.execute(
+        delete(SentimentJob).where(SentimentJob.review_id.in_([item["b_id"] for item in updates]))
+    )
+    return len(updates)
+
+async def rescore_reviews(
+    session_factory,
+    engine: str,
+    after_id: int = 0,
+    chunk_size: int = 1000,
+    workers: Optional[int] = None
+) -> AsyncIterator[Dict[str, int]]:
+    """
+    Переоценка тональности всех отзывов кусками по возрастанию id
+
+    Отзывы читаются keyset-пагинацией (id > последнего обработанного), оценки
+    куска записываются одной транзакцией. Pending-отзывы пропускаются:
+    их оценит очередь текущей моделью. После каждого куска выдается прогресс
+    с last_id - по нему можно продолжить прерванную переоценку. Повтор куска
+    безопасен: поправки агрегатов считаются от текущих оценок.
+
+    Yields:
+        {"last_id", "reviews", "scored", "failed"} по куску
+    """
+    if engine not in RESCORE_ENGINES:
+        raise ValueError(f"Unknown sentiment engine: {engine}")
+
+    last_id = after_id
+    while True:
+        async with session_factory() as db:
+            result = await db.execute(
+                select(Review.id, Review.restaurant_id, Review.text, Review.sentiment_score)
+                .where(Review.id > last_id)
+                .where(Review.sentiment_status.is_distinct_from(SENTIMENT_PENDING))
+                .order_by(Review.id)
+                .limit(chunk_size)
+            )
+            reviews = result.all()
+        if not reviews:
+            return
+
+        # Соединение не удерживается, пока кусок оценивается моделью
+        scores = await score_texts([review.text or "" for review in reviews], engine, workers)
+        async with session_factory() as db:
+            try:
+                scored = await apply_scores(db, reviews, scores)
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+        last_id = reviews[-1].id
+        yield {
+            "last_id": last_id,
+            "reviews": len(reviews),
+            "scored": scored,
+            "failed": len(reviews) - scored
+        }
@@ -1,17 +1,208 @@
-from openai import OpenAI
+import asyncio
+import json
+import logging
+from datetime import datetime
+from openai import AsyncOpenAI
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from ml.models import sentiment as local_sentiment
+from ..core.config import settings
+from ..core.pagination import decode_cursor
+from ..db.aggregates import add_review_to_aggregates
+from ..db.models import Review, SentimentJob, SENTIMENT_DONE, SENTIMENT_PENDING
+from .sentiment_batcher import SentimentBatcher
+from .sentiment_cache import SentimentCache
 
-client = OpenAI()
-from typing import Optional
+logger = logging.getLogger(__name__)
 
-async def analyze_sentiment(text: str) -> Optional[float]:
-    """Анализ тональности отзыва через OpenAI"""
+_client: Optional[AsyncOpenAI] = None
+# Ограничивает число одновременных запросов к OpenAI со всего процесса
+_semaphore = asyncio.Semaphore(settings.SENTIMENT_CONCURRENCY)
+
+def get_client() -> AsyncOpenAI:
+    """Асинхронный клиент OpenAI, создается при первом обращении"""
+    global _client
+    if _client is None:
+        # Повторы внутри дедлайна только удлиняют ожидание: отзыв оценивается позже
+        _client = AsyncOpenAI(timeout=settings.SENTIMENT_TIMEOUT, max_retries=0)
+    return _client
+
+# Меняется вместе с SENTIMENT_PROMPT: старые оценки в кэше перестают совпадать
+SENTIMENT_PROMPT_VERSION = "2"
+SENTIMENT_PROMPT = (
+    "Оцени тональность каждого отзыва по шкале от 0 до 1, где 0 - негативная, 1 - позитивная. "
+    "Отзывы переданы JSON-объектом {номер: текст}. Верни только JSON-объект {номер: оценка} "
+    "с теми же номерами."
+)
+
+def parse_batch_scores(content: str, size: int) -> List[Optional[float]]:
+    """
+    Оценки пакета из ответа модели
+
+    Некорректная или отсутствующая оценка элемента - None, остальные элементы
+    пакета при этом сохраняются.
+    """
+    try:
+        parsed = json.loads(content.strip().removeprefix("```json").strip("`\n "))
+    except ValueError:
+        parsed = None
+    if isinstance(parsed, (int, float)) and size == 1:
+        parsed = {"1": parsed}
+    if not isinstance(parsed, dict):
+        return [None] * size
+
+    scores = []
+    for number in range(1, size + 1):
+        value = parsed.get(str(number))
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and 0 <= value <= 1:
+            scores.append(float(value))
+        else:
+            scores.append(None)
+    return scores
+
+async def score_sentiment_batch(texts: List[str]) -> List[Optional[float]]:
+    """Оценка пакета отзывов одним запросом к OpenAI"""
+    async with _semaphore:
+        response = await get_client().chat.completions.create(
+            model=settings.SENTIMENT_MODEL,
+            messages=[
+                {"role": "system", "content": SENTIMENT_PROMPT},
+                {"role": "user", "content": json.dumps(
+                    {str(number): text for number, text in enumerate(texts, 1)},
+                    ensure_ascii=False
+                )}
+            ]
+        )
+    return parse_batch_scores(response.choices[0].message.content, len(texts))
+
+sentiment_batcher = SentimentBatcher(
+    score_sentiment_batch,
+    max_batch_size=settings.SENTIMENT_BATCH_SIZE,
+    max_wait_ms=settings.SENTIMENT_BATCH_WAIT_MS
+)
+
+sentiment_cache = SentimentCache(
+    settings.SENTIMENT_MODEL,
+    SENTIMENT_PROMPT_VERSION,
+    max_size=settings.SENTIMENT_CACHE_SIZE
+)
+
+async def _score_text(text: str) -> Optional[float]:
+    score = await sentiment_cache.get(text)
+    if score is not None:
+        return score
+    score = await sentiment_batcher.score(text)
+    if score is not None:
+        await sentiment_cache.set(text, score)
+    return score
+
+async def _analyze_remote(text: str, timeout: Optional[float]) -> Optional[float]:
     try:
-        response = client.chat.completions.create(model="gpt-3.5-turbo",
-        messages=[
-            {"role": "system", "content": "Оцени тональность отзыва по шкале от 0 до 1, где 0 - негативная, 1 - позитивная. Верни только число."},
-            {"role": "user", "content": text}
-        ])
-        return float(response.choices[0].message.content.strip())
+        return await asyncio.wait_for(
+            _score_text(text),
+            settings.SENTIMENT_TIMEOUT if timeout is None else timeout
+        )
+    except asyncio.TimeoutError:
+        logger.warning("Sentiment analysis timed out")
+        return None
     except Exception as e:
-        print(f"Error analyzing sentiment: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"Error analyzing sentiment: {e}")
+        return None
+
+async def analyze_sentiment(text: str, timeout: Optional[float] = None) -> Optional[float]:
+    """
+    Анализ тональности отзыва движком SENTIMENT_ENGINE
+
+    OpenAI не блокирует event loop. Уже оцененный текст берется из
+    sentiment_cache без запроса к модели. Отзывы, пришедшие одновременно,
+    оцениваются одним запросом (sentiment_batcher). Дедлайн (SENTIMENT_TIMEOUT)
+    включает ожидание пакета и свободного слота семафора, поэтому медленный
+    upstream не задерживает запрос дольше дедлайна. Движок local оценивает
+    локальной моделью, fallback - локальной моделью при сбое OpenAI.
+
+    Returns:
+        Оценка от 0 до 1 или None (таймаут или ошибка) - отзыв оценивается позже
+    """
+    if settings.SENTIMENT_ENGINE == "local":
+        return local_sentiment.score(text)
+    score = await _analyze_remote(text, timeout)
+    if score is None and settings.SENTIMENT_ENGINE == "fallback":
+        return local_sentiment.score(text)
+    return score
+
+async def analyze_sentiment_batch(texts: List[str]) -> List[Optional[float]]:
+    """Оценка пакета текстов; локальная модель оценивает пакет целиком вне event loop"""
+    if settings.SENTIMENT_ENGINE == "local":
+        return list(await asyncio.to_thread(local_sentiment.score_batch, texts))
+    return list(await asyncio.gather(*(analyze_sentiment(text) for text in texts)))
+
+async def create_review(
+    db: AsyncSession,
+    restaurant_id: int,
+    author: str,
+    text: str,
+    rating: float,
+    sentiment_score: Optional[float] = None
+) -> Review:
+    """
+    Сохранение отзыва и обновление агрегатов ресторана одной транзакцией
+
+    Отзыв без оценки тональности помечается как ожидающий (pending), и в той
+    же транзакции ставится задание в очередь sentiment_jobs.
+    """
+    try:
+        db_review = Review(
+            restaurant_id=restaurant_id,
+            author=author,
+            text=text,
+            rating=rating,
+            sentiment_score=sentiment_score,
+            sentiment_status=SENTIMENT_PENDING if sentiment_score is None else SENTIMENT_DONE,
+            created_at=datetime.utcnow()
+        )
+        db.add(db_review)
+        await db.flush()
+        if sentiment_score is None:
+            db.add(SentimentJob(review_id=db_review.id))
+        await db.execute(add_review_to_aggregates(restaurant_id, rating, sentiment_score, db_review.created_at))
+        await db.commit()
+        return db_review
+    except Exception:
+        await db.rollback()
+        raise
+
+# Порядок выдачи отзывов (сначала новые), он же ключ курсора: (created_at, id)
+REVIEW_ORDER = (Review.created_at.desc(), Review.id.desc())
+
+def review_sort_key(review: Review) -> list:
+    """Значения ключа сортировки отзыва для курсора"""
+    return [review.created_at.isoformat(), review.id]
+
+async def get_reviews(
+    db: AsyncSession,
+    restaurant_id: int,
+    skip: int = 0,
+    limit: int = 10,
+    cursor: Optional[str] = None
+) -> List[Review]:
+    """
+    Получение отзывов ресторана: offset-пагинация (skip) или keyset по курсору
+
+    Raises:
+        ValueError: если курсор поврежден
+    """
+    query = select(Review).filter(Review.restaurant_id == restaurant_id)
+
+    if cursor is None:
+        query = query.offset(skip)
+    else:
+        created_at, last_id = decode_cursor(cursor, 2)
+        if not isinstance(created_at, str) or not isinstance(last_id, int):
+            raise ValueError("Invalid cursor")
+        query = query.filter(
+            tuple_(Review.created_at, Review.id) < (datetime.fromisoformat(created_at), last_id)
+        )
+
+    result = await db.execute(query.order_by(*REVIEW_ORDER).limit(limit))
+    return list(result.scalars().all())
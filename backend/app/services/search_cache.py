@@ -0,0 +1,261 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+from ..core.config import settings
+from ..schemas.restaurant import RestaurantFilter
+
+class CacheBackend:
+    """
+    Хранилище записей кэша поиска
+
+    Запись - словарь с ключами filters, ids, payload, next_cursor. Для общего
+    кэша между воркерами (например, Redis) достаточно реализовать эти методы.
+    """
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        raise NotImplementedError
+
+    def clear(self) -> None:
+        raise NotImplementedError
+
+class MemoryBackend(CacheBackend):
+    """In-process LRU с TTL"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.evictions = 0
+        self._data: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any], ttl: float) -> None:
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_size:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def items(self) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        now = time.monotonic()
+        for key, (expires_at, value) in list(self._data.items()):
+            if expires_at >= now:
+                yield key, value
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+# Поле ресторана, от которого зависит каждый фильтр поиска
+FILTER_FIELDS = {
+    "q": "text",
+    "min_rating": "rating",
+    "max_price": "price_level",
+    "cuisine": "categories",
+    "min_reviews": "review_count",
+    "min_user_rating": "avg_user_rating",
+    "min_sentiment": "avg_sentiment",
+}
+
+def restaurant_state(restaurant, categories: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Состояние ресторана для инвалидации (categories None - неизвестны)"""
+    return {
+        "rating": restaurant.rating,
+        "price_level": restaurant.price_level,
+        "categories": categories,
+        "review_count": restaurant.review_count,
+        "avg_user_rating": restaurant.avg_user_rating,
+        "avg_sentiment": restaurant.avg_sentiment,
+    }
+
+def filter_matches(filters: Dict[str, Any], state: Dict[str, Any]) -> bool:
+    """
+    Попадает ли ресторан с данным состоянием под фильтры поиска
+
+    Отсутствующее в state поле (и categories=None) считается неизвестным
+    и не исключает совпадение. Текст (q) всегда считается неизвестным.
+    """
+    for name, field in FILTER_FIELDS.items():
+        bound = filters.get(name)
+        if bound is None or field not in state:
+            continue
+        value = state[field]
+        if name == "q":
+            continue
+        if name == "cuisine":
+            if value is not None and bound not in value:
+                return False
+        elif name == "max_price":
+            if value is None or value > bound:
+                return False
+        elif value is None or value < bound:
+            return False
+    return True
+
+# Поля ресторана, по которым считаются фасеты (запись с sort=facets)
+FACET_FIELDS = {"categories", "price_level", "rating"}
+
+def entry_fields(entry: Dict[str, Any]) -> set:
+    """Поля ресторана, от которых зависит страница: фильтры и сортировка (или фасеты)"""
+    fields = {
+        field for name, field in FILTER_FIELDS.items()
+        if entry["filters"].get(name) is not None
+    }
+    sort = entry.get("sort", "rating")
+    if sort == "facets":
+        fields.update(FACET_FIELDS)
+    else:
+        # Релевантность зависит от текста ресторана и отзывов
+        fields.add("text" if sort == "relevance" else sort)
+    return fields
+
+class SearchCache:
+    """Кэш страниц поиска ресторанов с точечной инвалидацией при записи"""
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    @staticmethod
+    def make_key(
+        filters: RestaurantFilter,
+        skip: int,
+        limit: int,
+        cursor: Optional[str],
+        sort: str = "rating"
+    ) -> str:
+        """Ключ из фильтров (нормализованных в RestaurantFilter) и параметров страницы"""
+        normalized = {
+            **filters.model_dump(),
+            "sort": sort,
+            "skip": 0 if cursor else skip,
+            "limit": limit,
+            "cursor": cursor
+        }
+        return "search:" + json.dumps(normalized, sort_keys=True, separators=(",", ":"))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(
+        self,
+        key: str,
+        filters: RestaurantFilter,
+        payload: Any,
+        next_cursor: Optional[str],
+        sort: str = "rating"
+    ) -> None:
+        """Сохраняет страницу поиска (список ресторанов) или фасеты (sort=facets)"""
+        if not self.enabled:
+            return
+        self.backend.set(key, {
+            "filters": filters.model_dump(),
+            "sort": sort,
+            "ids": [item["id"] for item in payload] if isinstance(payload, list) else [],
+            "payload": payload,
+            "next_cursor": next_cursor
+        }, self.ttl)
+
+    def invalidate_restaurant(
+        self,
+        restaurant_id: Optional[int],
+        *states: Dict[str, Any],
+        changed: Optional[set] = None
+    ) -> int:
+        """
+        Удаляет страницы, на которые могла повлиять запись ресторана
+
+        Затронута страница, которая содержит ресторан, или страница, фильтрам
+        которой он соответствует в одном из состояний (до и после записи),
+        если ее фильтры или сортировка зависят от измененных полей changed
+        (None - изменились любые поля).
+        """
+        return self.invalidate_restaurants([(restaurant_id, states)], changed)
+
+    def invalidate_restaurants(
+        self,
+        changes: Iterable[Tuple[Optional[int], Iterable[Dict[str, Any]]]],
+        changed: Optional[set] = None
+    ) -> int:
+        """Пакетная версия invalidate_restaurant: один проход по кэшу"""
+        if not self.enabled:
+            return 0
+        changes = [(restaurant_id, list(states)) for restaurant_id, states in changes]
+        if not changes:
+            return 0
+        ids = {restaurant_id for restaurant_id, _ in changes if restaurant_id is not None}
+        states = [state for _, restaurant_states in changes for state in restaurant_states]
+
+        stale = []
+        for key, entry in self.backend.items():
+            if ids.intersection(entry["ids"]):
+                stale.append(key)
+            elif changed is not None and not changed & entry_fields(entry):
+                continue
+            elif any(filter_matches(entry["filters"], state) for state in states):
+                stale.append(key)
+        for key in stale:
+            self.backend.delete(key)
+        self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Счетчики для подбора размера и TTL кэша"""
+        lookups = self.hits + self.misses
+        stats = {
+            "enabled": self.enabled,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+        if isinstance(self.backend, MemoryBackend):
+            stats.update(
+                size=len(self.backend),
+                max_size=self.backend.max_size,
+                evictions=self.backend.evictions
+            )
+        return stats
+
+search_cache = SearchCache(MemoryBackend(settings.SEARCH_CACHE_SIZE), settings.SEARCH_CACHE_TTL)
@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+ScoreBatch = Callable[[List[str]], Awaitable[List[Optional[float]]]]
+
+class SentimentBatcher:
+    """
+    Микро-батчинг запросов оценки тональности
+
+    Тексты копятся, пока их не наберется max_batch_size или не пройдет
+    max_wait_ms с первого из них, затем оцениваются одним вызовом score_batch.
+    Каждый вызывающий получает свою оценку; None - текст не оценен (ошибка
+    всего пакета или отсутствующая/некорректная оценка элемента).
+    """
+
+    def __init__(self, score_batch: ScoreBatch, max_batch_size: int, max_wait_ms: float, history: int = 1000):
+        self.score_batch = score_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self._pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+        # Метрики
+        self.batches = 0
+        self.items = 0
+        self.failed_items = 0
+        self.failed_batches = 0
+        self._latencies_ms: deque = deque(maxlen=history)
+        self._sizes: deque = deque(maxlen=history)
+
+    async def score(self, text: str) -> Optional[float]:
+        """Оценка одного текста в составе ближайшего пакета"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[:self.max_batch_size]
+            del self._pending[:self.max_batch_size]
+            # Отмененные (например, по дедлайну) вызовы в пакет не попадают
+            batch = [(text, future) for text, future in batch if not future.done()]
+            if batch:
+                task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future]]) -> None:
+        started = time.monotonic()
+        try:
+            scores = list(await self.score_batch([text for text, _ in batch]))
+        except Exception as e:
+            logger.error(f"Sentiment batch of {len(batch)} failed: {e}")
+            self.failed_batches += 1
+            scores = []
+        scores += [None] * (len(batch) - len(scores))
+
+        self.batches += 1
+        self.items += len(batch)
+        self.failed_items += sum(score is None for score in scores[:len(batch)])
+        self._sizes.append(len(batch))
+        self._latencies_ms.append((time.monotonic() - started) * 1000)
+
+        for (_, future), score in zip(batch, scores):
+            if not future.done():
+                future.set_result(score)
+
+    def stats(self) -> Dict[str, Any]:
+        """Размеры пакетов и задержка вызовов score_batch (по последним пакетам)"""
+        latencies = sorted(self._latencies_ms)
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "batches": self.batches,
+            "items": self.items,
+            "failed_items": self.failed_items,
+            "failed_batches": self.failed_batches,
+            "pending": len(self._pending),
+            "avg_batch_size": round(sum(self._sizes) / len(self._sizes), 2) if self._sizes else 0.0,
+            "latency_ms": {
+                "avg": round(sum(latencies) / len(latencies), 1) if latencies else 0.0,
+                "p95": round(latencies[int(0.95 * (len(latencies) - 1))], 1) if latencies else 0.0,
+                "max": round(latencies[-1], 1) if latencies else 0.0
+            }
+        }
@@ -0,0 +1,110 @@
+import hashlib
+import logging
+import re
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from sqlalchemy import delete, or_
+from ..db.models import SentimentCacheEntry
+from ..db.session import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+def normalize_text(text: str) -> str:
+    """Нормализация текста для ключа: Unicode NFKC и схлопнутые пробелы"""
+    return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+class SentimentCache:
+    """
+    Кэш оценок тональности с адресацией по содержимому
+
+    Ключ - SHA-256 от модели, версии промпта и нормализованного текста, поэтому
+    смена модели или промпта дает промахи без явной очистки. Перед таблицей
+    sentiment_cache стоит in-memory LRU.
+    """
+
+    def __init__(self, model: str, prompt_version: str, max_size: int, session_factory=AsyncSessionLocal):
+        self.model = model
+        self.prompt_version = prompt_version
+        self.max_size = max_size
+        self.session_factory = session_factory
+        self._memory: "OrderedDict[str, float]" = OrderedDict()
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def key(self, text: str) -> str:
+        raw = "\0".join((self.model, self.prompt_version, normalize_text(text)))
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _remember(self, key: str, score: float) -> None:
+        self._memory[key] = score
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_size:
+            self._memory.popitem(last=False)
+
+    async def get(self, text: str) -> Optional[float]:
+        """Оценка из кэша или None"""
+        key = self.key(text)
+        score = self._memory.get(key)
+        if score is not None:
+            self._memory.move_to_end(key)
+            self.memory_hits += 1
+            return score
+
+        try:
+            async with self.session_factory() as db:
+                entry = await db.get(SentimentCacheEntry, key)
+        except Exception as e:
+            logger.error(f"Sentiment cache lookup failed: {e}")
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.db_hits += 1
+        self._remember(key, entry.score)
+        return entry.score
+
+    async def set(self, text: str, score: float) -> None:
+        """Сохраняет оценку в оба уровня; ошибка записи в БД не прерывает запрос"""
+        key = self.key(text)
+        self._remember(key, score)
+        try:
+            async with self.session_factory() as db:
+                await db.merge(SentimentCacheEntry(
+                    key=key,
+                    score=score,
+                    model=self.model,
+                    prompt_version=self.prompt_version
+                ))
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Sentiment cache write failed: {e}")
+
+    async def purge_stale(self) -> int:
+        """Удаляет оценки других моделей и версий промпта"""
+        async with self.session_factory() as db:
+            result = await db.execute(
+                delete(SentimentCacheEntry).where(or_(
+                    SentimentCacheEntry.model != self.model,
+                    SentimentCacheEntry.prompt_version != self.prompt_version
+                ))
+            )
+            await db.commit()
+        return result.rowcount
+
+    def clear_memory(self) -> None:
+        self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "model": self.model,
+            "prompt_version": self.prompt_version,
+            "size": len(self._memory),
+            "max_size": self.max_size,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.memory_hits + self.db_hits) / lookups, 4) if lookups else 0.0
+        }
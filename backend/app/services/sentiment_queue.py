@@ -0,0 +1,240 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from sqlalchemy import delete, func, insert, select, update
+from ..core.config import settings
+from ..db.aggregates import add_sentiment_to_aggregates
+from ..db.models import Restaurant, Review, SentimentJob, SENTIMENT_DONE, SENTIMENT_FAILED, SENTIMENT_PENDING
+from ..db.session import AsyncSessionLocal
+from .review_service import analyze_sentiment_batch
+from .search_cache import restaurant_state, search_cache
+
+logger = logging.getLogger(__name__)
+
+# Предел задержки повтора
+MAX_RETRY_DELAY = 3600
+
+class SentimentQueue:
+    """
+    Очередь оценки тональности в таблице sentiment_jobs с пулом воркеров
+
+    Воркер атомарно берет пачку готовых заданий, продлевая их run_at на время
+    аренды (задание упавшего процесса снова станет доступно), оценивает тексты
+    через analyze_sentiment_batch и записывает результат. Неудачная попытка
+    откладывает задание с экспоненциальной задержкой, после max_attempts отзыв
+    помечается failed.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal, workers: int = 1, batch_size: int = 20):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = settings.SENTIMENT_MAX_ATTEMPTS
+        self.retry_backoff = settings.SENTIMENT_RETRY_BACKOFF
+        self.lease = settings.SENTIMENT_JOB_LEASE
+        self.poll_interval = settings.SENTIMENT_QUEUE_POLL
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        # Метрики
+        self.scored = 0
+        self.retried = 0
+        self.failed = 0
+        self._completed: deque = deque()
+
+    def start(self) -> None:
+        """Запускает воркеры в текущем event loop"""
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+    def notify(self) -> None:
+        """Будит воркеры после постановки задания (без воркеров - ничего не делает)"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self, number: int) -> None:
+        while True:
+            try:
+                processed = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Sentiment worker {number} failed: {e}")
+                processed = 0
+            if processed:
+                continue
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def enqueue_pending(self) -> int:
+        """Ставит в очередь pending-отзывы без задания (например, сохраненные до появления очереди)"""
+        async with self.session_factory() as db:
+            missing = (
+                select(Review.id)
+                .where(Review.sentiment_status == SENTIMENT_PENDING)
+                .where(~select(SentimentJob.id).where(SentimentJob.review_id == Review.id).exists())
+            )
+            result = await db.execute(insert(SentimentJob).from_select(["review_id"], missing))
+            await db.commit()
+        return result.rowcount
+
+    async def _claim(self) -> List[SentimentJob]:
+        now = datetime.utcnow()
+        due = (
+            select(SentimentJob.id)
+            .where(SentimentJob.run_at <= now)
+            .order_by(SentimentJob.run_at)
+            .limit(self.batch_size)
+            .scalar_subquery()
+        )
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(SentimentJob)
+                .where(SentimentJob.id.in_(due), SentimentJob.run_at <= now)
+                .values(run_at=now + timedelta(seconds=self.lease))
+                .returning(SentimentJob.id, SentimentJob.review_id, SentimentJob.attempts)
+                .execution_options(synchronize_session=False)
+            )
+            jobs = result.all()
+            await db.commit()
+        return jobs
+
+    def _retry_delay(self, attempts: int) -> float:
+        delay = min(self.retry_backoff * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+        return delay * random.uniform(0.5, 1.0)
+
+    async def run_once(self) -> int:
+        """
+        Обрабатывает одну пачку готовых заданий
+
+        Returns:
+            Количество взятых заданий
+        """
+        jobs = await self._claim()
+        if not jobs:
+            return 0
+
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Review.id, Review.text, Review.restaurant_id)
+                .where(Review.id.in_([job.review_id for job in jobs]))
+            )
+            reviews = {row.id: row for row in result}
+        # Одновременные запросы объединяются в один вызов модели (sentiment_batcher)
+        scores = iter(await analyze_sentiment_batch([
+            reviews[job.review_id].text or ""
+            for job in jobs if job.review_id in reviews
+        ]))
+
+        now = datetime.utcnow()
+        touched = set()
+        async with self.session_factory() as db:
+            # Состояние до записи: страницы, где ресторан был, тоже устаревают
+            result = await db.execute(
+                select(Restaurant).where(Restaurant.id.in_({review.restaurant_id for review in reviews.values()}))
+            )
+            before = {restaurant.id: restaurant_state(restaurant) for restaurant in result.scalars()}
+            try:
+                for job in jobs:
+                    review = reviews.get(job.review_id)
+                    score = next(scores) if review is not None else None
+                    attempts = job.attempts + 1
+                    if review is not None and score is not None:
+                        await db.execute(
+                            update(Review)
+                            .where(Review.id == review.id)
+                            .values(sentiment_score=score, sentiment_status=SENTIMENT_DONE)
+                            .execution_options(synchronize_session=False)
+                        )
+                        await db.execute(add_sentiment_to_aggregates(review.restaurant_id, score))
+                        await db.execute(delete(SentimentJob).where(SentimentJob.id == job.id))
+                        touched.add(review.restaurant_id)
+                        self.scored += 1
+                    elif review is None or attempts >= self.max_attempts:
+                        if review is not None:
+                            await db.execute(
+                                update(Review)
+                                .where(Review.id == review.id)
+                                .values(sentiment_status=SENTIMENT_FAILED)
+                                .execution_options(synchronize_session=False)
+                            )
+                            # Статус отзыва входит в список отзывов: меняем его ETag
+                            await db.execute(
+                                update(Restaurant)
+                                .where(Restaurant.id == review.restaurant_id)
+                                .values(updated_at=now)
+                                .execution_options(synchronize_session=False)
+                            )
+                        await db.execute(delete(SentimentJob).where(SentimentJob.id == job.id))
+                        self.failed += 1
+                    else:
+                        await db.execute(
+                            update(SentimentJob)
+                            .where(SentimentJob.id == job.id)
+                            .values(
+                                attempts=attempts,
+                                run_at=now + timedelta(seconds=self._retry_delay(attempts)),
+                                last_error="Sentiment unavailable"
+                            )
+                        )
+                        self.retried += 1
+                await db.commit()
+            except Exception:
+                await db.rollback()
+                raise
+
+            if touched:
+                result = await db.execute(select(Restaurant).where(Restaurant.id.in_(touched)))
+                search_cache.invalidate_restaurants(
+                    [
+                        (restaurant.id, [before[restaurant.id], restaurant_state(restaurant)])
+                        for restaurant in result.scalars()
+                    ],
+                    changed={"avg_sentiment"}
+                )
+
+        self._completed.append((time.monotonic(), len(jobs)))
+        return len(jobs)
+
+    async def stats(self) -> Dict[str, Any]:
+        """Глубина очереди и пропускная способность за последнюю минуту"""
+        async with self.session_factory() as db:
+            depth, due, oldest = (await db.execute(
+                select(
+                    func.count(SentimentJob.id),
+                    func.count(SentimentJob.id).filter(SentimentJob.run_at <= datetime.utcnow()),
+                    func.min(SentimentJob.created_at)
+                )
+            )).one()
+
+        window_start = time.monotonic() - 60
+        while self._completed and self._completed[0][0] < window_start:
+            self._completed.popleft()
+        return {
+            "workers": len(self._tasks),
+            "depth": depth,
+            "due": due,
+            "oldest_age_s": round((datetime.utcnow() - oldest).total_seconds(), 1) if oldest else None,
+            "scored": self.scored,
+            "retried": self.retried,
+            "failed": self.failed,
+            "jobs_per_minute": sum(count for _, count in self._completed)
+        }
+
+sentiment_queue = SentimentQueue(
+    workers=settings.SENTIMENT_WORKERS,
+    batch_size=settings.SENTIMENT_BATCH_SIZE
+)
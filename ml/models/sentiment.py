@@ -0,0 +1,173 @@
+"""
+Локальная модель тональности отзывов (русский и английский)
+
+Лексиконная модель: слова и основы слов с весами, отрицания и усилители.
+Не требует сети и внешних зависимостей, оценивает тысячи отзывов в секунду
+на одном ядре; большие пакеты распределяются по процессам.
+"""
+import math
+import multiprocessing
+import os
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence
+from ..utils.text_preprocessing import tokenize as _tokenize
+
+# Основы слов: совпадение по префиксу токена покрывает словоформы
+# ("вкусн" - вкусно, вкусный, вкусная; "love" - loved, lovely)
+POSITIVE = {
+    # Английский
+    "good": 1.0, "great": 1.5, "excellent": 2.0, "amazing": 2.0, "awesome": 2.0,
+    "delicious": 2.0, "tasty": 1.5, "yummy": 1.5, "friendly": 1.0, "love": 1.5,
+    "perfect": 2.0, "best": 1.5, "fantastic": 2.0, "wonderful": 2.0, "nice": 1.0,
+    "fresh": 1.0, "recommend": 1.5, "cozy": 1.0, "cosy": 1.0, "pleasant": 1.0,
+    "clean": 0.5, "attentive": 1.0, "superb": 2.0, "outstanding": 2.0, "enjoy": 1.0,
+    "gorgeous": 1.5, "helpful": 1.0, "generous": 1.0, "authentic": 0.5, "fast": 0.5,
+    "quick": 0.5, "impress": 1.0, "beautiful": 1.0, "lovely": 1.5, "worth": 0.5,
+    # Русский
+    "вкусн": 2.0, "отличн": 2.0, "прекрасн": 2.0, "замечательн": 2.0, "превосходн": 2.0,
+    "хорош": 1.0, "великолепн": 2.0, "уютн": 1.0, "вежлив": 1.0, "приветлив": 1.0,
+    "свеж": 1.0, "рекоменд": 1.5, "любим": 1.0, "понрав": 1.5, "восторг": 2.0,
+    "идеальн": 2.0, "лучш": 1.5, "быстр": 0.5, "чист": 0.5, "доброжелат": 1.0,
+    "внимательн": 1.0, "шикарн": 2.0, "обожа": 2.0, "класс": 1.0, "приятн": 1.0,
+    "советую": 1.5, "спасибо": 1.0, "благодар": 1.0, "сытн": 0.5, "душевн": 1.0,
+    "неплох": 1.0,
+}
+
+NEGATIVE = {
+    # Английский
+    "bad": 1.5, "terrible": 2.0, "awful": 2.0, "horrible": 2.0, "disgust": 2.0,
+    "rude": 1.5, "slow": 1.0, "dirty": 1.5, "cold": 0.5, "bland": 1.0,
+    "overpriced": 1.5, "worst": 2.0, "poor": 1.5, "disappoint": 1.5, "mediocre": 1.0,
+    "stale": 1.0, "soggy": 1.0, "burnt": 1.0, "noisy": 0.5, "expensive": 0.5,
+    "avoid": 2.0, "sick": 1.5, "greasy": 1.0, "tasteless": 1.5, "unfriendly": 1.5,
+    "hate": 2.0, "nasty": 2.0, "gross": 1.5, "inedible": 2.0, "waste": 1.5,
+    "undercooked": 1.5, "cockroach": 2.0, "ignored": 1.0,
+    # Русский
+    "ужасн": 2.0, "плох": 1.5, "отвратит": 2.0, "невкусн": 2.0, "грязн": 1.5,
+    "хам": 2.0, "груб": 1.5, "медленн": 1.0, "холодн": 0.5, "дорог": 0.5,
+    "худш": 2.0, "разочар": 1.5, "кошмар": 2.0, "мерзк": 2.0, "пересол": 1.0,
+    "недовар": 1.0, "подгор": 1.0, "таракан": 2.0, "отрав": 2.0, "долго": 0.5,
+    "несвеж": 1.5, "безвкусн": 1.5, "пресн": 1.0, "жестк": 0.5, "неприятн": 1.5,
+    "обман": 2.0, "никогда": 0.5, "испорч": 1.5, "жалк": 1.5,
+}
+
+LEXICON: Dict[str, float] = {**POSITIVE, **{stem: -weight for stem, weight in NEGATIVE.items()}}
+
+NEGATIONS = {"not", "no", "never", "nothing", "hardly", "не", "нет", "ни", "без", "нисколько"}
+INTENSIFIERS = {
+    "very": 1.5, "really": 1.3, "so": 1.3, "extremely": 1.8, "incredibly": 1.8, "absolutely": 1.5,
+    "очень": 1.5, "крайне": 1.8, "весьма": 1.3, "слишком": 1.3, "невероятно": 1.8, "самый": 1.3,
+}
+
+MIN_STEM = 3
+MAX_STEM = max(len(stem) for stem in LEXICON)
+# Отрицание действует на ближайшие слова после него
+NEGATION_SCOPE = 3
+# Нормализация суммы весов в (-1, 1): s / sqrt(s^2 + ALPHA)
+ALPHA = 2.0
+NEUTRAL = 0.5
+
+# Знаки конца фразы: на них заканчивается действие отрицания
+CLAUSE_BREAKS = set(".,!?;:")
+
+# Пакеты не меньше порога оцениваются в пуле процессов
+PROCESS_POOL_THRESHOLD = 20000
+
+def tokenize(text: str) -> List[str]:
+    """Слова и знаки конца фразы после общей нормализации (ml.utils.text_preprocessing)"""
+    return _tokenize(text, keep_punctuation=True)
+
+# Мемоизация весов токенов (словарь отзывов ограничен, а поиск основы - нет)
+_weight_cache: Dict[str, float] = {}
+WEIGHT_CACHE_SIZE = 200000
+
+def _token_weight(token: str) -> float:
+    """Вес токена по самой длинной основе-префиксу из LEXICON"""
+    weight = _weight_cache.get(token)
+    if weight is None:
+        weight = 0.0
+        for size in range(min(len(token), MAX_STEM), MIN_STEM - 1, -1):
+            stem_weight = LEXICON.get(token[:size])
+            if stem_weight is not None:
+                weight = stem_weight
+                break
+        if len(_weight_cache) < WEIGHT_CACHE_SIZE:
+            _weight_cache[token] = weight
+    return weight
+
+def score_tokens(tokens: Sequence[str]) -> float:
+    """Оценка от 0 (негатив) до 1 (позитив) по токенам; 0.5 - нейтрально"""
+    total = 0.0
+    negate_until = -1
+    boost = 1.0
+    for position, token in enumerate(tokens):
+        if token in CLAUSE_BREAKS:
+            negate_until = -1
+            boost = 1.0
+            continue
+        if token in NEGATIONS or token.endswith("n't"):
+            negate_until = position + NEGATION_SCOPE
+            continue
+        if token in INTENSIFIERS:
+            boost = INTENSIFIERS[token]
+            continue
+        weight = _token_weight(token)
+        if weight:
+            if position <= negate_until:
+                # "не плохо" слабее, чем "хорошо"
+                weight = -weight * 0.75
+                negate_until = -1
+            total += weight * boost
+        boost = 1.0
+    if not total:
+        return NEUTRAL
+    return NEUTRAL + NEUTRAL * total / math.sqrt(total * total + ALPHA)
+
+def score(text: Optional[str]) -> float:
+    """Оценка тональности одного текста"""
+    return score_tokens(tokenize(text)) if text else NEUTRAL
+
+def _score_chunk(texts: List[str]) -> array:
+    return array("d", map(score, texts))
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn: fork из процесса с циклом событий и потоками (приложение,
+        # asyncio.to_thread) может унаследовать захваченные блокировки
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def shutdown_pool() -> None:
+    """Останавливает пул процессов (при завершении приложения или скрипта)"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+def score_batch(texts: Iterable[str], workers: Optional[int] = None) -> array:
+    """
+    Оценка пакета текстов
+
+    Args:
+        texts: тексты отзывов (None и пустые - нейтральная оценка)
+        workers: число процессов для больших пакетов (по умолчанию - число CPU,
+            1 - всегда в текущем процессе)
+
+    Returns:
+        array('d') оценок от 0 до 1 в порядке текстов
+    """
+    texts = list(texts)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(texts) < PROCESS_POOL_THRESHOLD:
+        return _score_chunk(texts)
+
+    chunk_size = math.ceil(len(texts) / (workers * 4))
+    chunks = [texts[start:start + chunk_size] for start in range(0, len(texts), chunk_size)]
+    scores = array("d")
+    for chunk_scores in _get_pool(workers).map(_score_chunk, chunks):
+        scores.extend(chunk_scores)
+    return scores
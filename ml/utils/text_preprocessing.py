@@ -0,0 +1,145 @@
+"""
+Потоковая предобработка текстов отзывов
+
+Общая нормализация для ML-задач (тональность, поиск, дедупликация,
+ключевые слова): Unicode NFKC, нижний регистр, токенизация слов любого
+алфавита, стоп-слова и n-граммы. Все шаги - генераторы, регулярные выражения
+скомпилированы заранее, токены текста выделяются одним вызовом findall.
+"""
+import re
+import unicodedata
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+# Слова: буквы и цифры любого алфавита (crème, brûlée, ラーメン), внутренние
+# апостроф и дефис (don't, кое-где)
+_WORD = r"[^\W_]+(?:['\-][^\W_]+)*"
+WORD_RE = re.compile(_WORD)
+# Слова и знаки конца фразы (для моделей, учитывающих границы фраз)
+WORD_PUNCT_RE = re.compile(_WORD + r"|[.,!?;:]")
+_SPACE_RE = re.compile(r"\s+")
+# Замены после casefold: ё -> е и типографский апостроф (цепочка replace
+# на порядок быстрее str.translate для не-ASCII строк)
+_REPLACEMENTS = (("ё", "е"), ("’", "'"))
+
+STOPWORDS_RU = frozenset("""
+а без более бы был была были было быть в вам вас весь во вот все всего всех вы где
+да даже для до его ее ей если есть еще же за здесь и из или им их к как когда кто
+ли либо мне может мы на над надо наш не него нее нет ни них но ну о об однако он
+она они оно от очень по под при с со так также такой там те тем то того тоже той
+только том ты у уже хотя чего чей чем что чтобы чье чья эта эти это я
+""".split())
+
+STOPWORDS_EN = frozenset("""
+a about above after again against all am an and any are as at be because been before
+being below between both but by can did do does doing down during each few for from
+further had has have having he her here hers herself him himself his how i if in into
+is it its itself just me more most my myself no nor not now of off on once only or
+other our ours ourselves out over own same she should so some such than that the their
+theirs them themselves then there these they this those through to too under until up
+very was we were what when where which while who whom why will with you your yours
+""".split())
+
+STOPWORDS = STOPWORDS_RU | STOPWORDS_EN
+
+def fold(text: str) -> str:
+    """Unicode NFKC, casefold и ё -> е (без обработки пробелов - достаточно для токенизации)"""
+    if text.isascii():
+        return text.lower()
+    text = unicodedata.normalize("NFKC", text).casefold()
+    for old, new in _REPLACEMENTS:
+        text = text.replace(old, new)
+    return text
+
+def normalize(text: str) -> str:
+    """fold и схлопнутые пробелы"""
+    return _SPACE_RE.sub(" ", fold(text)).strip()
+
+def tokenize(text: str, keep_punctuation: bool = False, normalized: bool = False) -> List[str]:
+    """
+    Токены текста
+
+    Args:
+        text: исходный текст
+        keep_punctuation: оставить знаки конца фразы . , ! ? ; :
+        normalized: текст уже прошел normalize или fold
+    """
+    if not normalized:
+        text = fold(text)
+    return (WORD_PUNCT_RE if keep_punctuation else WORD_RE).findall(text)
+
+def remove_stopwords(tokens: Iterable[str], stopwords: frozenset = STOPWORDS) -> Iterator[str]:
+    return (token for token in tokens if token not in stopwords)
+
+def ngrams(tokens: Sequence[str], n: int, separator: str = " ") -> Iterator[str]:
+    """N-граммы подряд идущих токенов (сдвинутые срезы склеиваются на уровне C)"""
+    if n == 1:
+        return iter(tokens)
+    return map(separator.join, zip(*(tokens[offset:] for offset in range(n))))
+
+class TextPreprocessor:
+    """
+    Конвейер предобработки: normalize -> tokenize -> стоп-слова -> n-граммы
+
+    Args:
+        stopwords: удаляемые слова (None - не удалять)
+        ngram_range: (min_n, max_n) - какие n-граммы выдавать
+        keep_punctuation: оставлять знаки конца фразы (только для ngram_range (1, 1))
+        min_length: минимальная длина токена
+    """
+
+    def __init__(
+        self,
+        stopwords: Optional[frozenset] = STOPWORDS,
+        ngram_range: Tuple[int, int] = (1, 1),
+        keep_punctuation: bool = False,
+        min_length: int = 1
+    ):
+        min_n, max_n = ngram_range
+        if not 1 <= min_n <= max_n:
+            raise ValueError("Invalid ngram_range")
+        if keep_punctuation and max_n > 1:
+            raise ValueError("Punctuation tokens are only supported for unigrams")
+        self.stopwords = stopwords
+        self.ngram_range = ngram_range
+        self.keep_punctuation = keep_punctuation
+        self.min_length = min_length
+
+    def tokens(self, text: Optional[str]) -> List[str]:
+        """Токены текста после фильтров (без n-грамм)"""
+        if not text:
+            return []
+        tokens = tokenize(text, self.keep_punctuation)
+        if self.stopwords is None and self.min_length <= 1:
+            return tokens
+        stopwords = self.stopwords or frozenset()
+        return [
+            token for token in tokens
+            if token not in stopwords and len(token) >= self.min_length
+        ]
+
+    def process(self, text: Optional[str]) -> Iterator[str]:
+        """Признаки одного текста: токены и n-граммы из ngram_range"""
+        tokens = self.tokens(text)
+        min_n, max_n = self.ngram_range
+        for n in range(min_n, max_n + 1):
+            yield from ngrams(tokens, n)
+
+    def process_many(self, texts: Iterable[Optional[str]]) -> Iterator[List[str]]:
+        """Признаки каждого текста потока, по одному списку на текст"""
+        for text in texts:
+            yield list(self.process(text))
+
+    def process_chunks(self, texts: Iterable[Optional[str]], chunk_size: int = 1000) -> Iterator[List[List[str]]]:
+        """
+        Пакетный режим: поток читается кусками по chunk_size текстов
+
+        В памяти одновременно только один кусок, поэтому подходит для выгрузок
+        и файлов любого размера.
+        """
+        iterator = iter(texts)
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                return
+            yield [list(self.process(text)) for text in chunk]
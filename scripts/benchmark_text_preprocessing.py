@@ -0,0 +1,73 @@
+import argparse
+import os
+import random
+import sys
+import time
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ml.utils.text_preprocessing import TextPreprocessor, normalize, tokenize
+
+WORDS_RU = (
+    "очень вкусно паста пицца официант обслуживание долго ждали уютный зал цены "
+    "не понравилось отличный ресторан рекомендую грубый персонал свежий хлеб кофе "
+    "ужин семья вечер музыка громко чисто грязно дорого недорого порции большие"
+).split()
+WORDS_EN = (
+    "great food service slow friendly staff pizza pasta coffee price value cozy "
+    "place not good bad loved the and was were we our table waited dinner fresh"
+).split()
+PUNCTUATION = [".", ",", "!", "?", ""]
+
+def synthetic_corpus(size: int, seed: int = 42) -> list:
+    """Синтетические отзывы: смесь русских и английских фраз длиной 5-60 слов"""
+    rng = random.Random(seed)
+    reviews = []
+    for _ in range(size):
+        words = WORDS_RU if rng.random() < 0.6 else WORDS_EN
+        parts = []
+        for _ in range(rng.randint(5, 60)):
+            word = rng.choice(words)
+            parts.append(word.capitalize() if rng.random() < 0.1 else word)
+            parts.append(rng.choice(PUNCTUATION))
+            parts.append(" ")
+        reviews.append("".join(parts).strip())
+    return reviews
+
+def measure(name: str, corpus: list, run) -> None:
+    megabytes = sum(len(text.encode()) for text in corpus) / 1024 / 1024
+    started = time.perf_counter()
+    features = run(corpus)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<28} {megabytes / elapsed:8.1f} MB/s {len(corpus) / elapsed:12.0f} reviews/s {features:12d} features")
+
+def main():
+    """Бенчмарк предобработки текстов на синтетическом корпусе отзывов"""
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--reviews", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.reviews, args.seed)
+    unigrams = TextPreprocessor()
+    bigrams = TextPreprocessor(ngram_range=(1, 2))
+
+    measure("normalize", corpus, lambda texts: sum(len(normalize(text)) for text in texts))
+    measure("tokenize", corpus, lambda texts: sum(len(tokenize(text)) for text in texts))
+    measure("tokenize + punctuation", corpus, lambda texts: sum(len(tokenize(text, True)) for text in texts))
+    measure("pipeline stopwords", corpus, lambda texts: sum(map(len, unigrams.process_many(texts))))
+    measure("pipeline 1-2 grams", corpus, lambda texts: sum(map(len, bigrams.process_many(texts))))
+    measure(
+        f"chunked 1-2 grams ({args.chunk_size})",
+        corpus,
+        lambda texts: sum(
+            len(features)
+            for chunk in bigrams.process_chunks(iter(texts), args.chunk_size)
+            for features in chunk
+        )
+    )
+
+if __name__ == "__main__":
+    main()
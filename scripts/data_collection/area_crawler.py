@@ -0,0 +1,268 @@
+"""
+Полный обход города через Google Maps Text Search
+
+Text Search отдает не больше 60 мест на запрос (3 страницы по 20), поэтому
+область (viewport из geocode) делится на плитки. location/radius для Text
+Search - только приоритет, а не граница, поэтому из ответа берутся только
+места внутри плитки. Плитка делится на 4, если ответ уперся в лимит и почти
+весь лежит в круге поиска (круг насыщен). Если Google добирает ответ местами
+за пределами круга, совпадения в круге закончились - плитка не делится
+(padded_tiles в stats). Плитки, насыщенные на пределе max_depth/min_radius,
+учитываются как incomplete_tiles с предупреждением в логе. Места дедуплицируются по place_id; множество уже
+найденных place_id хранится в файле, поэтому повторный запуск не записывает
+дубликаты.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from dotenv import load_dotenv
+from backend.app.core.geo import haversine_m
+from scripts.data_collection.google_maps import (
+    AsyncGoogleMapsAPI, DEFAULT_CONCURRENCY, DEFAULT_QPS, MAX_PAGES, setup_logging
+)
+from scripts.data_collection.response_cache import OFFLINE_API_KEY, ResponseCache, cache_from_env
+
+logger = logging.getLogger(__name__)
+
+# Лимит мест одного текстового поиска
+RESULT_CAP = 20 * MAX_PAGES
+# Доля ответа с лимитом внутри круга поиска, при которой круг считается насыщенным
+SATURATION_RATIO = 0.9
+# Плитки меньше этого радиуса не дробятся (в них лимит - это плотная застройка)
+MIN_TILE_RADIUS = 100
+MAX_DEPTH = 8
+
+@dataclass(frozen=True)
+class Tile:
+    """Прямоугольник в градусах и глубина деления"""
+    south: float
+    west: float
+    north: float
+    east: float
+    depth: int = 0
+
+    @property
+    def center(self):
+        return (self.south + self.north) / 2, (self.west + self.east) / 2
+
+    @property
+    def radius(self) -> int:
+        """Радиус круга поиска, покрывающего плитку (до угла), в метрах"""
+        lat, lng = self.center
+        return math.ceil(haversine_m(lat, lng, self.north, self.east))
+
+    def contains(self, lat: float, lng: float) -> bool:
+        return self.south <= lat <= self.north and self.west <= lng <= self.east
+
+    def split(self) -> List["Tile"]:
+        lat, lng = self.center
+        depth = self.depth + 1
+        return [
+            Tile(self.south, self.west, lat, lng, depth),
+            Tile(self.south, lng, lat, self.east, depth),
+            Tile(lat, self.west, self.north, lng, depth),
+            Tile(lat, lng, self.north, self.east, depth),
+        ]
+
+def viewport_tile(geocode_result: Dict[str, Any]) -> Tile:
+    """Плитка по viewport первого результата geocode"""
+    results = geocode_result.get("results") or []
+    if geocode_result.get("status") != "OK" or not results:
+        raise ValueError(f"Geocoding failed: {geocode_result.get('status')}")
+    viewport = results[0]["geometry"]["viewport"]
+    return Tile(
+        viewport["southwest"]["lat"], viewport["southwest"]["lng"],
+        viewport["northeast"]["lat"], viewport["northeast"]["lng"]
+    )
+
+class SeenSet:
+    """Множество place_id в памяти с дозаписью в файл (по одному на строку)"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._ids: Set[str] = set()
+        if path and os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self._ids.update(line.strip() for line in f if line.strip())
+
+    def __contains__(self, place_id: str) -> bool:
+        return place_id in self._ids
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def add(self, place_ids: Iterable[str]) -> List[str]:
+        """
+        Добавляет place_id; возвращает новые (в порядке поступления)
+
+        Вызывается после записи мест: место с сохраненным place_id больше
+        не записывается, поэтому сбой до записи мест не должен его терять.
+        """
+        new = []
+        for place_id in place_ids:
+            if place_id not in self._ids:
+                self._ids.add(place_id)
+                new.append(place_id)
+        if new and self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.writelines(f"{place_id}\n" for place_id in new)
+        return new
+
+class AreaCrawler:
+    """
+    Обход области плитками с адаптивным делением
+
+    Плитки одного уровня обходятся параллельно (скорость ограничивает
+    лимитер клиента). Новые места дописываются в output (JSON Lines), затем
+    их place_id - в seen.
+    """
+
+    def __init__(
+        self,
+        api: AsyncGoogleMapsAPI,
+        query: str,
+        seen: SeenSet,
+        output_path: Optional[str] = None,
+        max_depth: int = MAX_DEPTH,
+        min_radius: int = MIN_TILE_RADIUS
+    ):
+        self.api = api
+        self.query = query
+        self.seen = seen
+        self.output_path = output_path
+        self.max_depth = max_depth
+        self.min_radius = min_radius
+        self.tiles = 0
+        self.splits = 0
+        self.incomplete = 0
+        self.padded = 0
+        self.found = 0
+
+    def _save(self, places: List[Dict[str, Any]]) -> None:
+        if not places or not self.output_path:
+            return
+        with open(self.output_path, "a", encoding="utf-8") as f:
+            for place in places:
+                f.write(json.dumps(place, ensure_ascii=False) + "\n")
+
+    @staticmethod
+    def _in_tile(tile: Tile, place: Dict[str, Any]) -> bool:
+        location = (place.get("geometry") or {}).get("location") or {}
+        if location.get("lat") is None or location.get("lng") is None:
+            return False
+        return tile.contains(location["lat"], location["lng"])
+
+    @staticmethod
+    def _distance(tile: Tile, place: Dict[str, Any]) -> float:
+        """Расстояние от центра плитки до места (без координат - бесконечность)"""
+        location = (place.get("geometry") or {}).get("location") or {}
+        if location.get("lat") is None or location.get("lng") is None:
+            return math.inf
+        return haversine_m(*tile.center, location["lat"], location["lng"])
+
+    async def crawl(self, tile: Tile) -> List[Dict[str, Any]]:
+        """
+        Обходит плитку и ее части
+
+        Returns:
+            Новые места (которых не было в seen)
+        """
+        lat, lng = tile.center
+        result = await self.api.search_all_pages(self.query, f"{lat},{lng}", tile.radius)
+        self.tiles += 1
+        places = result.get("results", [])
+        # Места вне плитки найдет плитка, в которой они лежат
+        inside = [place for place in places if place.get("place_id") and self._in_tile(tile, place)]
+        by_id = {place["place_id"]: place for place in inside}
+        new = [place for place_id, place in by_id.items() if place_id not in self.seen]
+        # Сначала места, потом place_id: сбой между записями не теряет места
+        self._save(new)
+        self.seen.add(by_id)
+        self.found += len(new)
+
+        capped = len(places) >= RESULT_CAP or result.get("next_page_token")
+        if not capped:
+            return new
+        in_circle = sum(1 for place in places if self._distance(tile, place) <= tile.radius)
+        if in_circle < len(places) * SATURATION_RATIO:
+            # Ответ добран местами вне круга: в круге (и плитке) совпадения закончились
+            self.padded += 1
+            logger.info(f"Tile {tile} hit the result cap with {in_circle} places in the search circle, not split")
+            return new
+        if tile.depth >= self.max_depth or tile.radius / 2 < self.min_radius:
+            self.incomplete += 1
+            logger.warning(f"Tile {tile} hit the result cap at minimum size, results may be incomplete")
+            return new
+
+        self.splits += 1
+        for part in await asyncio.gather(*(self.crawl(child) for child in tile.split())):
+            new.extend(part)
+        return new
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "tiles": self.tiles,
+            "splits": self.splits,
+            "incomplete_tiles": self.incomplete,
+            "padded_tiles": self.padded,
+            "api_requests": self.api.requests,
+            "places": self.found,
+            "seen": len(self.seen)
+        }
+
+async def crawl_city(
+    city: str,
+    query: str,
+    output_dir: str,
+    qps: float,
+    concurrency: int,
+    cache: Optional[ResponseCache] = None
+) -> Dict[str, Any]:
+    offline = cache is not None and cache.offline
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY") or (OFFLINE_API_KEY if offline else None)
+    if not api_key:
+        raise ValueError("GOOGLE_MAPS_API_KEY not found in .env")
+
+    slug = re.sub(r"\W+", "_", f"{city}_{query}".lower()).strip("_")
+    os.makedirs(output_dir, exist_ok=True)
+    seen = SeenSet(os.path.join(output_dir, f"{slug}_seen.txt"))
+    async with AsyncGoogleMapsAPI(api_key, qps=qps, max_concurrency=concurrency, cache=cache) as api:
+        tile = viewport_tile(await api.geocode(city))
+        crawler = AreaCrawler(api, query, seen, os.path.join(output_dir, f"{slug}_places.jsonl"))
+        await crawler.crawl(tile)
+        stats = crawler.stats()
+    if cache is not None:
+        stats["cache"] = cache.stats()
+    return stats
+
+def main():
+    """Обход города: все места по запросу в пределах viewport города"""
+    setup_logging()
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Crawl all places of a city")
+    parser.add_argument("city")
+    parser.add_argument("--query", default="restaurants")
+    parser.add_argument("--output-dir", default="data/raw")
+    parser.add_argument("--qps", type=float, default=DEFAULT_QPS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--offline", action="store_true", help="Serve responses only from the cache")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the response cache")
+    args = parser.parse_args()
+
+    cache = None if args.no_cache else cache_from_env(offline=args.offline or None)
+    stats = asyncio.run(crawl_city(args.city, args.query, args.output_dir, args.qps, args.concurrency, cache))
+    logger.info(f"Crawl finished: {stats}")
+
+if __name__ == "__main__":
+    main()
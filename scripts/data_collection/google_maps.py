@@ -1,40 +1,81 @@
+import asyncio
+import httpx
 import requests
 import json
-from typing import Dict, Any
+import time
+from typing import Callable, Dict, Any, Iterable, List, Optional
 import os
+import sys
 from time import sleep
 import logging
 from dotenv import load_dotenv
 
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from scripts.data_collection.response_cache import (
+    OFFLINE_API_KEY, TEXTSEARCH_ALL_PAGES, ResponseCache, cache_from_env
+)
+
 # Константы
 DEFAULT_TIMEOUT = 10
 DEFAULT_RADIUS = 5000
 MIN_DELAY = 0.1
 
-# Настройка логирования
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler('google_maps.log'),
-        logging.StreamHandler()
-    ]
-)
+# Асинхронный клиент: квота запросов в секунду и одновременные соединения
+DEFAULT_QPS = 10.0
+DEFAULT_CONCURRENCY = 10
+MAX_RETRIES = 5
+# Адаптивная скорость: при превышении квоты делится на BACKOFF_FACTOR
+# (не ниже MIN_QPS), каждый успешный запрос прибавляет RECOVERY_STEP от квоты
+BACKOFF_FACTOR = 0.5
+MIN_QPS = 0.5
+RECOVERY_STEP = 0.05
+# Постраничный поиск: не больше 3 страниц, next_page_token активируется через пару секунд
+MAX_PAGES = 3
+NEXT_PAGE_DELAY = 2.0
+NEXT_PAGE_ATTEMPTS = 3
+
 logger = logging.getLogger(__name__)
 
+def setup_logging():
+    """Настройка логирования (при запуске скрипта, а не при импорте модуля)"""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler('google_maps.log'),
+            logging.StreamHandler()
+        ]
+    )
+
 class GoogleMapsAPI:
     BASE_URL = "https://maps.googleapis.com/maps/api"
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, cache: Optional[ResponseCache] = None):
         if not api_key or not isinstance(api_key, str):
             raise ValueError("Invalid API key format")
         self.api_key = api_key
+        self.cache = cache
         self.last_request_time = 0
         logger.info("GoogleMapsAPI initialized")
 
+    def _cached(self, path: str, params: Dict[str, Any], fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        """Ответ из кэша (если задан) или fetch() с сохранением успешного ответа"""
+        if self.cache is None:
+            return fetch()
+        result = self.cache.get(path, params)
+        if result is None:
+            result = fetch()
+            self.cache.set(path, params, result)
+        return result
+
     def _rate_limit(self):
-        """Простой rate limiting"""
-        sleep(MIN_DELAY)
+        """Простой rate limiting: не чаще одного запроса в MIN_DELAY"""
+        elapsed = time.monotonic() - self.last_request_time
+        if elapsed < MIN_DELAY:
+            sleep(MIN_DELAY - elapsed)
+        self.last_request_time = time.monotonic()
         
     def search_places(self, query: str, location: str = None, radius: int = DEFAULT_RADIUS) -> Dict[str, Any]:
         """
@@ -50,8 +91,6 @@ class GoogleMapsAPI:
         """
         if radius <= 0:
             raise ValueError("Radius must be positive")
-            
-        self._rate_limit()
         
         params = {
             "query": query,
@@ -59,14 +98,17 @@ class GoogleMapsAPI:
         }
         if location:
             params.update({"location": location, "radius": radius})
-            
-        response = requests.get(
-            f"{self.BASE_URL}/place/textsearch/json",
-            params=params,
-            timeout=DEFAULT_TIMEOUT
-        )
-        
-        return self._process_response(response)
+
+        def fetch():
+            self._rate_limit()
+            response = requests.get(
+                f"{self.BASE_URL}/place/textsearch/json",
+                params=params,
+                timeout=DEFAULT_TIMEOUT
+            )
+            return self._process_response(response)
+
+        return self._cached("place/textsearch/json", params, fetch)
         
     def _process_response(self, response: requests.Response) -> Dict[str, Any]:
         """Process API response with error handling"""
@@ -90,9 +132,13 @@ class GoogleMapsAPI:
                 "key": self.api_key
             }
             
-            response = requests.get(endpoint, params=params)
-            response.raise_for_status()
-            result = response.json()
+
+            def fetch():
+                response = requests.get(endpoint, params=params)
+                response.raise_for_status()
+                return response.json()
+
+            result = self._cached("place/details/json", params, fetch)
             logger.info(f"Successfully retrieved details for place_id: {place_id}")
             return result
         except requests.exceptions.RequestException as e:
@@ -109,8 +155,11 @@ class GoogleMapsAPI:
                 "key": self.api_key
             }
             
-            response = requests.get(endpoint, params=params, timeout=DEFAULT_TIMEOUT)
-            result = response.json()
+            result = self._cached(
+                "geocode/json",
+                params,
+                lambda: requests.get(endpoint, params=params, timeout=DEFAULT_TIMEOUT).json()
+            )
             
             logger.info(f"Geocoding status: {result.get('status')}")
             return result
@@ -119,6 +168,267 @@ class GoogleMapsAPI:
             logger.error(f"Geocoding error: {str(e)}")
             raise
 
+class TokenBucket:
+    """
+    Асинхронный token bucket с адаптивной скоростью
+
+    Токены пополняются со скоростью rate в секунду, запас не больше capacity.
+    throttle() (ответ OVER_QUERY_LIMIT или HTTP 429) делит скорость на
+    BACKOFF_FACTOR и обнуляет запас, success() возвращает ее к квоте
+    max_rate линейно (AIMD).
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, min_rate: float = MIN_QPS):
+        if rate <= 0:
+            raise ValueError("Rate must be positive")
+        self.max_rate = rate
+        self.rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.capacity = capacity or max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.throttled = 0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        """Ждет токен; ожидающие обслуживаются по очереди"""
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+                self._refill()
+            self.tokens -= 1
+
+    def throttle(self):
+        self._refill()
+        self.rate = max(self.min_rate, self.rate * BACKOFF_FACTOR)
+        self.tokens = min(self.tokens, 0.0)
+        self.throttled += 1
+
+    def success(self):
+        if self.rate < self.max_rate:
+            self._refill()
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RECOVERY_STEP)
+
+class AsyncGoogleMapsAPI:
+    """
+    Асинхронный клиент Google Maps для сбора данных по городу
+
+    Один httpx.AsyncClient с keep-alive на все запросы, скорость ограничена
+    TokenBucket (квота qps), одновременных запросов не больше max_concurrency.
+    Ответы OVER_QUERY_LIMIT и HTTP 429 снижают скорость и повторяются
+    (не больше max_retries раз). С cache ответы берутся из дискового кэша,
+    не расходуя квоту.
+    """
+    BASE_URL = GoogleMapsAPI.BASE_URL
+
+    def __init__(
+        self,
+        api_key: str,
+        qps: float = DEFAULT_QPS,
+        max_concurrency: int = DEFAULT_CONCURRENCY,
+        max_retries: int = MAX_RETRIES,
+        client: Optional[httpx.AsyncClient] = None,
+        cache: Optional[ResponseCache] = None
+    ):
+        if not api_key or not isinstance(api_key, str):
+            raise ValueError("Invalid API key format")
+        self.api_key = api_key
+        self.max_retries = max_retries
+        self.limiter = TokenBucket(qps)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.client = client or httpx.AsyncClient(
+            timeout=DEFAULT_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=max_concurrency,
+                max_keepalive_connections=max_concurrency
+            )
+        )
+        self.cache = cache
+        self.requests = 0
+
+    async def __aenter__(self) -> "AsyncGoogleMapsAPI":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def _from_cache(self, path: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        return self.cache.get(path, params) if self.cache is not None else None
+
+    def _store(self, path: str, params: Dict[str, Any], result: Dict[str, Any]) -> None:
+        if self.cache is not None:
+            self.cache.set(path, params, result)
+
+    async def _get(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET через кэш ответов"""
+        result = self._from_cache(path, params)
+        if result is None:
+            result = await self._fetch(path, params)
+            self._store(path, params, result)
+        return result
+
+    async def _fetch(self, path: str, params: Dict[str, Any]) -> Dict[str, Any]:
+        """GET с ограничением скорости и повтором при превышении квоты"""
+        params = {**params, "key": self.api_key}
+        for attempt in range(self.max_retries + 1):
+            await self.limiter.acquire()
+            async with self._semaphore:
+                response = await self.client.get(f"{self.BASE_URL}/{path}", params=params)
+            self.requests += 1
+            retry = attempt < self.max_retries
+
+            if response.status_code == 429:
+                self.limiter.throttle()
+                if retry:
+                    logger.warning(f"HTTP 429 for {path}, rate lowered to {self.limiter.rate:.2f}/s")
+                    retry_after = response.headers.get("Retry-After", "")
+                    if retry_after.isdigit():
+                        await asyncio.sleep(int(retry_after))
+                    continue
+            response.raise_for_status()
+            result = response.json()
+
+            if result.get("status") == "OVER_QUERY_LIMIT":
+                self.limiter.throttle()
+                if retry:
+                    logger.warning(f"OVER_QUERY_LIMIT for {path}, rate lowered to {self.limiter.rate:.2f}/s")
+                    continue
+            else:
+                self.limiter.success()
+            if result.get("status") not in ("OK", "ZERO_RESULTS"):
+                logger.warning(f"API returned status: {result.get('status')}")
+            return result
+
+    async def search_places(self, query: str, location: str = None, radius: int = DEFAULT_RADIUS) -> Dict[str, Any]:
+        """Text Search (параметры как у GoogleMapsAPI.search_places)"""
+        if radius <= 0:
+            raise ValueError("Radius must be positive")
+        params = {"query": query}
+        if location:
+            params.update({"location": location, "radius": radius})
+        return await self._get("place/textsearch/json", params)
+
+    async def get_place_details(self, place_id: str, fields: Optional[List[str]] = None) -> Dict[str, Any]:
+        params = {"place_id": place_id}
+        if fields:
+            params["fields"] = ",".join(fields)
+        return await self._get("place/details/json", params)
+
+    async def search_all_pages(
+        self,
+        query: str,
+        location: str = None,
+        radius: int = DEFAULT_RADIUS,
+        max_pages: int = MAX_PAGES
+    ) -> Dict[str, Any]:
+        """
+        Text Search со всеми страницами (по next_page_token)
+
+        Токен следующей страницы становится действителен не сразу: перед
+        запросом ждем NEXT_PAGE_DELAY, ответ INVALID_REQUEST повторяем.
+        В кэше хранится весь постраничный результат одной записью (токены
+        истекают через несколько минут, по токену из кэша страницу не получить);
+        результат, оборванный ошибкой страницы, не кэшируется.
+
+        Returns:
+            Ответ первой страницы с results всех страниц, pages - число
+            страниц, next_page_token - если страницы остались после max_pages
+        """
+        if radius <= 0:
+            raise ValueError("Radius must be positive")
+        params = {"query": query, "max_pages": max_pages}
+        if location:
+            params.update({"location": location, "radius": radius})
+        cached = self._from_cache(TEXTSEARCH_ALL_PAGES, params)
+        if cached is not None:
+            return cached
+
+        result = await self._fetch("place/textsearch/json", {
+            name: value for name, value in params.items() if name != "max_pages"
+        })
+        results = list(result.get("results", []))
+        pages = 1
+        token = result.get("next_page_token")
+        complete = True
+        while token and pages < max_pages:
+            page = {"status": "INVALID_REQUEST"}
+            for _ in range(NEXT_PAGE_ATTEMPTS):
+                await asyncio.sleep(NEXT_PAGE_DELAY)
+                page = await self._fetch("place/textsearch/json", {"pagetoken": token})
+                if page.get("status") != "INVALID_REQUEST":
+                    break
+            if page.get("status") != "OK":
+                complete = False
+                break
+            results.extend(page.get("results", []))
+            pages += 1
+            token = page.get("next_page_token")
+        combined = {**result, "results": results, "pages": pages, "next_page_token": token}
+        if complete:
+            self._store(TEXTSEARCH_ALL_PAGES, params, combined)
+        return combined
+
+    async def geocode(self, address: str) -> Dict[str, Any]:
+        return await self._get("geocode/json", {"address": address})
+
+    async def get_places_details(
+        self,
+        place_ids: Iterable[str],
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Детали нескольких мест параллельно (в пределах квоты)
+
+        Returns:
+            {place_id: ответ Place Details}; место с ошибкой запроса пропускается
+        """
+        place_ids = list(dict.fromkeys(place_ids))
+        results = await asyncio.gather(
+            *(self.get_place_details(place_id, fields) for place_id in place_ids),
+            return_exceptions=True
+        )
+        details = {}
+        for place_id, result in zip(place_ids, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error getting place details for {place_id}: {result}")
+            else:
+                details[place_id] = result
+        return details
+
+    async def crawl(
+        self,
+        queries: Iterable[str],
+        location: str = None,
+        radius: int = DEFAULT_RADIUS,
+        fields: Optional[List[str]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Поиск по всем запросам и детали найденных мест, все параллельно
+
+        Returns:
+            {place_id: ответ Place Details} для уникальных мест
+        """
+        searches = await asyncio.gather(*(
+            self.search_places(query, location, radius) for query in queries
+        ))
+        place_ids = [
+            place["place_id"]
+            for search in searches
+            for place in search.get("results", [])
+            if place.get("place_id")
+        ]
+        logger.info(f"Found {len(set(place_ids))} unique places in {len(searches)} searches")
+        return await self.get_places_details(place_ids, fields)
+
 def validate_api_key(api_key: str) -> bool:
     """Расширенная проверка валидности API ключа"""
     try:
@@ -146,17 +456,20 @@ def validate_api_key(api_key: str) -> bool:
         return False
 
 def main():
+    setup_logging()
     try:
         load_dotenv()
-        api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+        cache = cache_from_env()
+        offline = cache is not None and cache.offline
+        api_key = os.getenv("GOOGLE_MAPS_API_KEY") or (OFFLINE_API_KEY if offline else None)
         
         if not api_key:
             raise ValueError("GOOGLE_MAPS_API_KEY not found in .env")
             
-        if not validate_api_key(api_key):
+        if not offline and not validate_api_key(api_key):
             raise ValueError("Invalid API key")
             
-        maps_api = GoogleMapsAPI(api_key)
+        maps_api = GoogleMapsAPI(api_key, cache=cache)
         results = maps_api.search_places("restaurants in London")
         
         if results.get("status") == "OK":
@@ -174,6 +487,9 @@ def main():
             logger.info("Geocoding results saved")
         else:
             logger.error(f"Geocoding failed: {result.get('status')}")
+
+        if cache is not None:
+            logger.info(f"Response cache: {cache.stats()}")
             
     except Exception as e:
         logger.error(f"Error: {str(e)}")
@@ -0,0 +1,157 @@
+"""
+Дисковый кэш ответов Google Maps API
+
+Ответы хранятся в SQLite по ключу из эндпоинта и нормализованных параметров
+(без API-ключа), у каждого эндпоинта свой срок жизни. В офлайн-режиме
+запросы обслуживаются только из кэша без учета срока жизни: повторный разбор
+и разработка не расходуют квоту.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, Optional
+
+DAY = 24 * 3600
+TEXTSEARCH_ALL_PAGES = "place/textsearch/json#all_pages"
+# Срок жизни ответа по эндпоинту, секунды; эндпоинты без записи не кэшируются
+CACHE_TTL = {
+    "place/textsearch/json": 1 * DAY,
+    # Text Search со всеми страницами одной записью: next_page_token из кэша
+    # к моменту повтора уже недействителен
+    TEXTSEARCH_ALL_PAGES: 1 * DAY,
+    "place/nearbysearch/json": 1 * DAY,
+    "place/details/json": 7 * DAY,
+    "geocode/json": 30 * DAY,
+}
+# Сохраняются только успешные ответы (ошибки и превышение квоты - нет)
+CACHEABLE_STATUSES = {"OK", "ZERO_RESULTS"}
+# Параметры, не влияющие на ответ
+IGNORED_PARAMS = {"key"}
+DEFAULT_CACHE_PATH = os.path.join("data", "cache", "google_maps.sqlite")
+# Ключ для офлайн-режима: запросы в сеть не выполняются, настоящий ключ не нужен
+OFFLINE_API_KEY = "offline"
+
+class CacheMiss(LookupError):
+    """Ответа нет в кэше, а запросы в сеть запрещены (офлайн-режим)"""
+
+class ResponseCache:
+    """
+    Кэш ответов в SQLite
+
+    Args:
+        path: файл БД (":memory:" - только в памяти)
+        ttl: сроки жизни по эндпоинтам
+        offline: отдавать только из кэша, включая просроченные ответы
+    """
+
+    def __init__(self, path: str = DEFAULT_CACHE_PATH, ttl: Optional[Dict[str, float]] = None, offline: bool = False):
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self.offline = offline
+        self.hits = 0
+        self.misses = 0
+        self._conn = sqlite3.connect(path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, endpoint TEXT NOT NULL, params TEXT NOT NULL, "
+            "body TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def normalize_params(params: Dict[str, Any]) -> str:
+        """Параметры без ключа API в каноническом виде (порядок и типы значений не важны)"""
+        return json.dumps(
+            {name: str(value) for name, value in params.items() if name not in IGNORED_PARAMS and value is not None},
+            sort_keys=True,
+            ensure_ascii=False
+        )
+
+    def key(self, endpoint: str, params: Dict[str, Any]) -> str:
+        return hashlib.sha256(f"{endpoint}?{self.normalize_params(params)}".encode()).hexdigest()
+
+    def cacheable(self, endpoint: str) -> bool:
+        return endpoint in self.ttl
+
+    def get(self, endpoint: str, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Ответ из кэша или None
+
+        Raises:
+            CacheMiss: в офлайн-режиме, если ответа нет
+        """
+        row = None
+        if self.cacheable(endpoint):
+            row = self._conn.execute(
+                "SELECT body, created_at FROM responses WHERE key = ?",
+                (self.key(endpoint, params),)
+            ).fetchone()
+        if row is not None and (self.offline or time.time() - row[1] <= self.ttl[endpoint]):
+            self.hits += 1
+            return json.loads(row[0])
+        self.misses += 1
+        if self.offline:
+            raise CacheMiss(f"{endpoint} {self.normalize_params(params)}")
+        return None
+
+    def set(self, endpoint: str, params: Dict[str, Any], result: Dict[str, Any]) -> None:
+        if not self.cacheable(endpoint) or result.get("status") not in CACHEABLE_STATUSES:
+            return
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, endpoint, params, body, created_at) VALUES (?, ?, ?, ?, ?)",
+            (
+                self.key(endpoint, params),
+                endpoint,
+                self.normalize_params(params),
+                json.dumps(result, ensure_ascii=False),
+                time.time()
+            )
+        )
+        self._conn.commit()
+
+    def purge_expired(self) -> int:
+        """Удаляет просроченные ответы"""
+        now = time.time()
+        removed = 0
+        for endpoint, ttl in self.ttl.items():
+            removed += self._conn.execute(
+                "DELETE FROM responses WHERE endpoint = ? AND created_at < ?",
+                (endpoint, now - ttl)
+            ).rowcount
+        self._conn.commit()
+        return removed
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        size = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "offline": self.offline,
+            "size": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+def cache_from_env(offline: Optional[bool] = None) -> Optional[ResponseCache]:
+    """
+    Кэш по переменным окружения
+
+    GOOGLE_MAPS_CACHE - путь к файлу (пустая строка - без кэша),
+    GOOGLE_MAPS_OFFLINE=1 - офлайн-режим (offline переопределяет).
+    """
+    path = os.getenv("GOOGLE_MAPS_CACHE", DEFAULT_CACHE_PATH)
+    if offline is None:
+        offline = os.getenv("GOOGLE_MAPS_OFFLINE") == "1"
+    if not path:
+        if offline:
+            raise ValueError("Offline mode requires GOOGLE_MAPS_CACHE")
+        return None
+    return ResponseCache(path, offline=offline)
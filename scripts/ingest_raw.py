@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.db.init_db import init_db
+from backend.app.db.session import AsyncSessionLocal
+from backend.app.services.ingest_service import NDJSON_EXTENSIONS, ingest_file
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_RAW_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "raw")
+STATE_FILE = ".ingest_state.json"
+RAW_EXTENSIONS = (".json",) + NDJSON_EXTENSIONS
+
+def load_state(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(path: str, state: dict) -> None:
+    """Атомарная запись смещений"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+def start_offset(path: str, saved: dict) -> int:
+    """
+    Смещение, с которого продолжать файл
+
+    NDJSON продолжается с сохраненного смещения (если файл не стал короче -
+    иначе его перезаписали). Обычный JSON обрабатывается заново, если
+    изменились размер или время изменения.
+    """
+    if not saved:
+        return 0
+    stat = os.stat(path)
+    if path.endswith(NDJSON_EXTENSIONS):
+        return saved["offset"] if stat.st_size >= saved["offset"] else 0
+    if (saved.get("size"), saved.get("mtime")) != (stat.st_size, stat.st_mtime):
+        return 0
+    return saved["offset"]
+
+async def ingest(raw_dir: str, batch_size: int, restart: bool) -> dict:
+    state_path = os.path.join(raw_dir, STATE_FILE)
+    state = {} if restart else load_state(state_path)
+    totals = {"files": 0, "records": 0, "upserted": 0, "skipped": 0, "created": 0, "updated": 0, "unchanged": 0}
+    started = time.perf_counter()
+
+    for name in sorted(os.listdir(raw_dir)):
+        path = os.path.join(raw_dir, name)
+        if not name.endswith(RAW_EXTENSIONS) or name.startswith(".") or not os.path.isfile(path):
+            continue
+        offset = start_offset(path, state.get(name))
+        stat = os.stat(path)
+        if offset >= stat.st_size:
+            continue
+
+        file_records = 0
+        elapsed = 0.0
+        async for progress in ingest_file(AsyncSessionLocal, path, offset, batch_size):
+            for key in ("records", "upserted", "skipped", "created", "updated", "unchanged"):
+                totals[key] += progress[key]
+            file_records += progress["records"]
+            elapsed = progress["elapsed_s"]
+            if progress["offset"]:
+                state[name] = {"offset": progress["offset"], "size": stat.st_size, "mtime": stat.st_mtime}
+                save_state(state_path, state)
+        if not path.endswith(NDJSON_EXTENSIONS):
+            # JSON обработан целиком (в том числе файл без мест)
+            state[name] = {"offset": stat.st_size, "size": stat.st_size, "mtime": stat.st_mtime}
+            save_state(state_path, state)
+        if file_records:
+            totals["files"] += 1
+            logger.info(f"{name}: {file_records} records, {file_records / max(elapsed, 1e-9):.0f} records/s")
+
+    elapsed = time.perf_counter() - started
+    totals["elapsed_s"] = round(elapsed, 3)
+    totals["records_per_sec"] = round(totals["records"] / elapsed, 1) if elapsed else 0.0
+    return totals
+
+def main():
+    """
+    Загрузка мест из data/raw (JSON и NDJSON) в таблицы ресторанов
+
+    Кэш поиска живет в памяти процесса API и отсюда не сбрасывается:
+    загруженные места видны в поиске после истечения SEARCH_CACHE_TTL.
+    """
+    parser = argparse.ArgumentParser(description="Ingest raw Google Places dumps into the database")
+    parser.add_argument("--raw-dir", default=DEFAULT_RAW_DIR)
+    parser.add_argument("--batch-size", type=int, default=500, help="Places per upsert transaction")
+    parser.add_argument("--restart", action="store_true", help="Ignore saved offsets and reprocess all files")
+    args = parser.parse_args()
+
+    init_db()
+    totals = asyncio.run(ingest(args.raw_dir, args.batch_size, args.restart))
+    logger.info(f"Ingestion finished: {totals}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+import logging
+import os
+import sys
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.db.aggregates import rebuild_review_aggregates
+from backend.app.db.init_db import init_db
+from backend.app.db.session import engine
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+def main():
+    """Пересчет агрегатов отзывов ресторанов (исправление расхождений)"""
+    init_db()
+    fixed = rebuild_review_aggregates(engine)
+    logger.info(f"Review aggregates rebuilt, fixed restaurants: {fixed}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dotenv import load_dotenv
+from backend.app.core.config import settings
+from backend.app.db.init_db import init_db
+from backend.app.db.session import AsyncSessionLocal
+from backend.app.services.refresh_service import (
+    REFRESH_FIELDS, refresh_places, remaining_budget, select_refresh_candidates
+)
+from scripts.data_collection.google_maps import AsyncGoogleMapsAPI, DEFAULT_CONCURRENCY, DEFAULT_QPS
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+async def show_candidates(budget: int, min_interval: timedelta) -> None:
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        limit = await remaining_budget(db, budget, now)
+        candidates = await select_refresh_candidates(db, limit, now, min_interval)
+    logger.info(f"Remaining budget today: {limit}, candidates: {len(candidates)}")
+    for candidate in candidates[:20]:
+        logger.info(f"{candidate['place_id']}: priority {candidate['priority']:.3f}")
+
+async def refresh(budget: int, min_interval: timedelta, qps: float, concurrency: int) -> dict:
+    api_key = os.getenv("GOOGLE_MAPS_API_KEY")
+    if not api_key:
+        raise ValueError("GOOGLE_MAPS_API_KEY not found in .env")
+    # Без кэша ответов: обновлению нужны свежие данные
+    async with AsyncGoogleMapsAPI(api_key, qps=qps, max_concurrency=concurrency) as api:
+        return await refresh_places(
+            AsyncSessionLocal,
+            lambda place_ids: api.get_places_details(place_ids, REFRESH_FIELDS),
+            budget,
+            min_interval
+        )
+
+def main():
+    """
+    Обновление деталей мест, которые вероятнее всего изменились, в пределах дневной квоты
+
+    Кэш поиска живет в памяти процесса API и отсюда не сбрасывается:
+    изменения видны в поиске после истечения SEARCH_CACHE_TTL.
+    """
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Refresh stale place details from Google Maps")
+    parser.add_argument("--budget", type=int, default=settings.REFRESH_DAILY_BUDGET, help="Place Details calls per day")
+    parser.add_argument("--min-interval-hours", type=float, default=settings.REFRESH_MIN_INTERVAL_HOURS)
+    parser.add_argument("--qps", type=float, default=DEFAULT_QPS)
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true", help="Only list the places that would be refreshed")
+    args = parser.parse_args()
+
+    init_db()
+    min_interval = timedelta(hours=args.min_interval_hours)
+    if args.dry_run:
+        asyncio.run(show_candidates(args.budget, min_interval))
+        return
+    stats = asyncio.run(refresh(args.budget, min_interval, args.qps, args.concurrency))
+    logger.info(f"Refresh finished: {stats}")
+
+if __name__ == "__main__":
+    main()
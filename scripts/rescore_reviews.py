@@ -0,0 +1,112 @@
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+# Добавляем корень проекта в PYTHONPATH
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.app.core.config import settings
+from backend.app.db.init_db import init_db
+from backend.app.db.session import AsyncSessionLocal
+from backend.app.services.rescore_service import RESCORE_ENGINES, engine_signature, rescore_reviews
+from ml.models.sentiment import shutdown_pool
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "rescore_checkpoint.json"
+)
+# Локальная модель выгоднее на больших кусках (пул процессов), OpenAI - на небольших
+DEFAULT_CHUNK_SIZE = {"local": 50000, "openai": 500}
+
+def load_checkpoint(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_checkpoint(path: str, checkpoint: dict) -> None:
+    """Атомарная запись: прерывание не оставляет поврежденный файл"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+async def rescore(engine: str, checkpoint_path: str, chunk_size: int, workers: int, restart: bool) -> dict:
+    signature = engine_signature(engine)
+    checkpoint = {} if restart else load_checkpoint(checkpoint_path)
+    if checkpoint:
+        saved = {key: checkpoint.get(key) for key in signature}
+        if saved != signature:
+            raise SystemExit(
+                f"Checkpoint {checkpoint_path} belongs to {saved}, current is {signature}; use --restart"
+            )
+        if checkpoint.get("completed"):
+            logger.info(f"Rescore already completed: {checkpoint}")
+            return checkpoint
+        logger.info(f"Resuming after review id {checkpoint['last_id']}")
+    else:
+        checkpoint = {**signature, "last_id": 0, "reviews": 0, "scored": 0, "failed": 0,
+                      "started_at": datetime.utcnow().isoformat()}
+
+    started = time.monotonic()
+    processed = 0
+    async for progress in rescore_reviews(
+        AsyncSessionLocal, engine, checkpoint["last_id"], chunk_size, workers
+    ):
+        checkpoint["last_id"] = progress["last_id"]
+        for key in ("reviews", "scored", "failed"):
+            checkpoint[key] += progress[key]
+        checkpoint["updated_at"] = datetime.utcnow().isoformat()
+        save_checkpoint(checkpoint_path, checkpoint)
+
+        processed += progress["reviews"]
+        rate = processed / max(time.monotonic() - started, 1e-9)
+        logger.info(
+            f"Reviews up to id {progress['last_id']}: total {checkpoint['reviews']}, "
+            f"failed {checkpoint['failed']}, {rate:.0f} reviews/s"
+        )
+
+    checkpoint["completed"] = True
+    save_checkpoint(checkpoint_path, checkpoint)
+    return checkpoint
+
+def main():
+    """Переоценка тональности всех отзывов после смены модели или промпта"""
+    default_engine = settings.SENTIMENT_ENGINE if settings.SENTIMENT_ENGINE in RESCORE_ENGINES else "openai"
+    parser = argparse.ArgumentParser(description="Rescore sentiment of all reviews")
+    parser.add_argument("--engine", choices=RESCORE_ENGINES, default=default_engine)
+    parser.add_argument("--chunk-size", type=int, help="Reviews per chunk (one transaction and checkpoint)")
+    parser.add_argument("--workers", type=int, help="Processes for the local model (default: CPU count)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT, help="Checkpoint file for resuming")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over")
+    args = parser.parse_args()
+
+    init_db()
+    try:
+        checkpoint = asyncio.run(rescore(
+            args.engine,
+            args.checkpoint,
+            args.chunk_size or DEFAULT_CHUNK_SIZE[args.engine],
+            args.workers,
+            args.restart
+        ))
+    finally:
+        shutdown_pool()
+    logger.info(
+        f"Rescore finished: {checkpoint['scored']} reviews rescored, "
+        f"{checkpoint['failed']} failed (kept previous score)"
+    )
+
+if __name__ == "__main__":
+    main()
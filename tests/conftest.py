@@ -1,8 +1,12 @@
 # tests/conftest.py
 import pytest
+from httpx import AsyncClient, ASGITransport
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from backend.app.db.models import Base
+from backend.app.services import review_service
+from backend.app.services.search_cache import search_cache
+from tests import helpers
 
 @pytest.fixture(scope="session")
 def engine():
@@ -17,4 +21,50 @@ def tables(engine):
     """Создаем все таблицы один раз для сессии тестирования"""
     Base.metadata.create_all(engine)
     yield
-    Base.metadata.drop_all(engine)
\ No newline at end of file
+    Base.metadata.drop_all(engine)
+
+@pytest.fixture
+def setup_db():
+    """Пересоздаем таблицы тестовой БД приложения и сбрасываем кэши"""
+    Base.metadata.drop_all(bind=helpers.engine)
+    Base.metadata.create_all(bind=helpers.engine)
+    search_cache.clear()
+    review_service.sentiment_cache.clear_memory()
+
+    # Создаем тестовую сессию
+    db = helpers.TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+        Base.metadata.drop_all(bind=helpers.engine)
+
+@pytest.fixture
+def test_db(setup_db):
+    """Фикстура для доступа к тестовой БД"""
+    db = helpers.TestingSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+@pytest.fixture
+def valid_restaurant_data():
+    """Фикстура с валидными данными ресторана"""
+    return {
+        "place_id": "test123",
+        "name": "Test Restaurant",
+        "address": "Test Address",
+        "rating": 4.5,
+        "price_level": 2,
+        "location": {
+            "latitude": 51.5074,
+            "longitude": -0.1278
+        }
+    }
+
+@pytest.fixture
+async def async_client(setup_db):
+    transport = ASGITransport(app=helpers.app)
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
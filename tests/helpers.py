@@ -0,0 +1,58 @@
+"""
+Общее окружение тестов приложения: тестовая БД, клиент API и фейковый OpenAI
+
+Фикстуры на его основе (setup_db, test_db, async_client) - в conftest.py.
+"""
+import asyncio
+import json
+import os
+import tempfile
+from unittest.mock import MagicMock
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool, NullPool
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from backend.app.db.session import get_db
+from backend.app.main import app
+from backend.app.services import review_service
+from backend.app.services.sentiment_queue import sentiment_queue
+
+
+# Создаем тестовую БД: синхронный движок для схемы, асинхронный для приложения
+TEST_DB_PATH = os.path.join(tempfile.gettempdir(), "goodfood_test_api.db")
+SQLALCHEMY_DATABASE_URL = f"sqlite:///{TEST_DB_PATH}"
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=StaticPool
+)
+TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+async_engine = create_async_engine(
+    f"sqlite+aiosqlite:///{TEST_DB_PATH}",
+    poolclass=NullPool
+)
+AsyncTestingSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False, autoflush=False)
+
+async def get_test_db():
+    """Асинхронная версия get_db для тестов"""
+    async with AsyncTestingSessionLocal() as db:
+        yield db
+
+app.dependency_overrides[get_db] = get_test_db
+review_service.sentiment_cache.session_factory = AsyncTestingSessionLocal
+sentiment_queue.session_factory = AsyncTestingSessionLocal
+client = TestClient(app)
+
+def fake_openai_scores(by_text: dict, delay: float = 0.0):
+    """Асинхронный клиент OpenAI, оценивающий пакет отзывов по словарю текст -> оценка"""
+    async def create(**kwargs):
+        await asyncio.sleep(delay)
+        texts = json.loads(kwargs["messages"][1]["content"])
+        scores = {number: by_text[text] for number, text in texts.items() if text in by_text}
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=json.dumps(scores)))])
+
+    fake = MagicMock()
+    fake.chat.completions.create = create
+    return fake
@@ -1,67 +1,31 @@
+import asyncio
+import csv
+import io
+import json
+import math
 import pytest
 from pytest import fixture
-from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
 import sys
 import os
 from datetime import datetime
-from sqlalchemy.pool import StaticPool
-from unittest.mock import patch, MagicMock
-from httpx import AsyncClient, ASGITransport
+from contextlib import contextmanager
+from sqlalchemy import event
+from unittest.mock import patch
 
 
 # Добавляем путь к корню проекта
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.app.db.models import Base, Restaurant, Location
-from backend.app.db.session import get_db
-from backend.app.main import app
-from backend.app.services.review_service import analyze_sentiment
+from backend.app.core.geo import EARTH_RADIUS_M
+from backend.app.db.models import Restaurant, Location, Review, Category
+from backend.app.db.aggregates import rebuild_review_aggregates
+from backend.app.services import review_service
+from backend.app.services.search_cache import search_cache
+from backend.app.services.sentiment_queue import sentiment_queue
+from tests.helpers import async_engine, client, engine, fake_openai_scores
 
 
-# Создаем тестовую БД
-SQLALCHEMY_DATABASE_URL = "sqlite:///:memory:"
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False},
-    poolclass=StaticPool
-)
-TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-
-def get_test_db():
-    """Синхронная версия get_db для тестов"""
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-app.dependency_overrides[get_db] = get_test_db
-client = TestClient(app)
-
-@pytest.fixture(autouse=True)
-def setup_db():
-    """Создаем таблицы перед каждым тестом"""
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
-    
-    # Создаем тестовую сессию
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-        Base.metadata.drop_all(bind=engine)
-
-@pytest.fixture
-def test_db():
-    """Фикстура для доступа к тестовой БД"""
-    db = TestingSessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+pytestmark = pytest.mark.usefixtures("setup_db")
 
 @pytest.fixture
 def sample_restaurant():
@@ -78,21 +42,6 @@ def sample_restaurant():
         }
     }
 
-@pytest.fixture
-def valid_restaurant_data():
-    """Фикстура с валидными данными ресторана"""
-    return {
-        "place_id": "test123",
-        "name": "Test Restaurant",
-        "address": "Test Address",
-        "rating": 4.5,
-        "price_level": 2,
-        "location": {
-            "latitude": 51.5074,
-            "longitude": -0.1278
-        }
-    }
-
 def test_create_restaurant(valid_restaurant_data):
     """Тест создания ресторана через API"""
     response = client.post("/restaurants/", json=valid_restaurant_data)
@@ -222,12 +171,6 @@ def test_crud_operations(test_db):
     response = client.get("/restaurants/9999")
     assert response.status_code == 404
 
-@pytest.fixture
-async def async_client():
-    transport = ASGITransport(app=app)
-    async with AsyncClient(transport=transport, base_url="http://test") as client:
-        yield client
-
 @pytest.mark.asyncio
 async def test_review_sentiment(async_client):
     """Тест анализа тональности отзыва"""
@@ -262,10 +205,18 @@ async def test_review_sentiment(async_client):
         json=review_data
     )
     
+    # Отзыв сохраняется сразу, тональность оценивает фоновый воркер
     assert response.status_code == 201
     review = response.json()
-    assert "sentiment_score" in review
+    assert review["sentiment_score"] is None
+    assert review["sentiment_status"] == "pending"
+
+    with patch.object(review_service, "_client", fake_openai_scores({"Great place!": 0.95})):
+        assert await sentiment_queue.run_once() == 1
+
+    review = (await async_client.get(f"/restaurants/{restaurant_id}/reviews")).json()[0]
     assert isinstance(review["sentiment_score"], float)
+    assert review["sentiment_status"] == "done"
 
 @pytest.mark.asyncio
 async def test_reviews_api(async_client):
@@ -302,3 +253,559 @@ async def test_reviews_api(async_client):
     )
     assert response.status_code == 201
     assert "sentiment_score" in response.json()
+
+def test_search_cursor_pagination(test_db):
+    """Тест keyset-пагинации поиска: обход всех страниц без пропусков и повторов"""
+    ratings = [4.5, 4.5, 4.0, None, 3.0, 4.5, None]
+    for i, rating in enumerate(ratings):
+        test_db.add(Restaurant(place_id=f"cursor{i}", name=f"Cursor {i}", rating=rating, price_level=1))
+    test_db.commit()
+
+    seen = []
+    params = {"limit": 2}
+    while True:
+        response = client.get("/restaurants/", params=params)
+        assert response.status_code == 200
+        seen.extend(r["id"] for r in response.json())
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            break
+        params = {"limit": 2, "cursor": cursor}
+
+    assert len(seen) == len(ratings)
+    assert len(set(seen)) == len(ratings)
+    # Совпадает с порядком offset-пагинации
+    response = client.get("/restaurants/", params={"limit": 100})
+    assert [r["id"] for r in response.json()] == seen
+
+    # Курсор с фильтром по рейтингу
+    response = client.get("/restaurants/", params={"min_rating": 4.0, "limit": 2})
+    cursor = response.headers["X-Next-Cursor"]
+    response = client.get("/restaurants/", params={"min_rating": 4.0, "limit": 2, "cursor": cursor})
+    assert [r["rating"] for r in response.json()] == [4.5, 4.0]
+
+def test_search_invalid_cursor():
+    """Тест обработки поврежденного курсора"""
+    response = client.get("/restaurants/", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 422
+
+def test_reviews_cursor_pagination(test_db):
+    """Тест keyset-пагинации отзывов"""
+    restaurant = Restaurant(place_id="reviews_cursor", name="Reviews Cursor")
+    test_db.add(restaurant)
+    test_db.commit()
+    for i in range(5):
+        test_db.add(Review(
+            restaurant_id=restaurant.id,
+            author=f"User {i}",
+            text="Text",
+            rating=4.0,
+            created_at=datetime(2024, 1, 1 + i % 3)
+        ))
+    test_db.commit()
+
+    response = client.get(f"/restaurants/{restaurant.id}/reviews", params={"limit": 3})
+    first_page = response.json()
+    assert len(first_page) == 3
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = client.get(f"/restaurants/{restaurant.id}/reviews", params={"limit": 3, "cursor": cursor})
+    second_page = response.json()
+    assert len(second_page) == 2
+    assert "X-Next-Cursor" not in response.headers
+
+    ids = [r["id"] for r in first_page + second_page]
+    assert len(set(ids)) == 5
+    dates = [r["created_at"] for r in first_page + second_page]
+    assert dates == sorted(dates, reverse=True)
+
+def test_nearby_restaurants(test_db):
+    """Тест поиска ближайших ресторанов с фильтрами"""
+    italian = Category(name="Italian")
+    places = [
+        ("near", 51.5080, -0.1280, 4.5, [italian]),
+        ("mid", 51.5110, -0.1278, 4.2, [italian]),
+        ("low_rating", 51.5076, -0.1279, 3.0, [italian]),
+        ("not_italian", 51.5075, -0.1277, 4.8, []),
+        ("far", 51.5500, -0.1278, 4.9, [italian]),
+    ]
+    for place_id, latitude, longitude, rating, categories in places:
+        test_db.add(Restaurant(
+            place_id=place_id,
+            name=place_id,
+            rating=rating,
+            price_level=2,
+            categories=categories,
+            location=Location(latitude=latitude, longitude=longitude)
+        ))
+    test_db.commit()
+
+    response = client.get("/restaurants/nearby", params={"lat": 51.5074, "lng": -0.1278, "radius_m": 1000})
+    assert response.status_code == 200
+    data = response.json()
+    assert [r["place_id"] for r in data] == ["not_italian", "low_rating", "near", "mid"]
+    distances = [r["distance_m"] for r in data]
+    assert distances == sorted(distances)
+    assert all(d <= 1000 for d in distances)
+
+    response = client.get("/restaurants/nearby", params={
+        "lat": 51.5074,
+        "lng": -0.1278,
+        "radius_m": 1000,
+        "cuisine": "Italian",
+        "min_rating": 4.0
+    })
+    assert [r["place_id"] for r in response.json()] == ["near", "mid"]
+
+def test_nearby_includes_place_at_radius_edge(test_db):
+    """Тест границы радиуса: место в 999.5 м к северу не отсекается прямоугольником"""
+    latitude = 51.5074 + math.degrees(999.5 / EARTH_RADIUS_M)
+    test_db.add(Restaurant(
+        place_id="edge",
+        name="edge",
+        rating=4.0,
+        price_level=2,
+        location=Location(latitude=latitude, longitude=-0.1278)
+    ))
+    test_db.commit()
+
+    response = client.get("/restaurants/nearby", params={"lat": 51.5074, "lng": -0.1278, "radius_m": 1000})
+    assert [r["place_id"] for r in response.json()] == ["edge"]
+
+@contextmanager
+def count_queries():
+    """Собирает SQL-запросы, отправленные приложением в тестовую БД"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(async_engine.sync_engine, "before_cursor_execute", before_cursor_execute)
+
+def test_restaurant_list_query_count_is_constant(test_db):
+    """Тест отсутствия N+1: число запросов не зависит от размера страницы"""
+    for i in range(60):
+        test_db.add(Restaurant(
+            place_id=f"n_plus_one_{i}",
+            name=f"Restaurant {i}",
+            rating=4.0,
+            price_level=1,
+            location=Location(latitude=51.5 + i / 1000, longitude=-0.12)
+        ))
+    test_db.commit()
+    client.get("/restaurants/", params={"limit": 1})
+
+    counts = []
+    for limit in (5, 50):
+        with count_queries() as statements:
+            response = client.get("/restaurants/", params={"limit": limit})
+        assert len(response.json()) == limit
+        assert all(r["location"] is not None for r in response.json())
+        counts.append(len(statements))
+
+    assert counts[0] == counts[1] == 2
+
+    restaurant_id = response.json()[0]["id"]
+    with count_queries() as statements:
+        response = client.get(f"/restaurants/{restaurant_id}")
+    assert response.json()["location"] is not None
+    assert len(statements) == 1
+
+def bulk_item(i, **overrides):
+    """Элемент пакетной загрузки"""
+    item = {
+        "place_id": f"bulk{i}",
+        "name": f"Bulk {i}",
+        "address": "Bulk Address",
+        "rating": 4.0,
+        "price_level": 2,
+        "location": {"latitude": 51.5 + i / 1000, "longitude": -0.12},
+        "categories": ["Italian", "Pizza"]
+    }
+    item.update(overrides)
+    return item
+
+def test_bulk_upsert_restaurants():
+    """Тест пакетной загрузки: создание, обновление и статусы элементов"""
+    response = client.post("/restaurants/bulk", json=[bulk_item(i) for i in range(3)])
+    assert response.status_code == 200
+    data = response.json()
+    assert data["created"] == 3
+    assert data["failed"] == 0
+    assert data["rows_per_sec"] > 0
+
+    response = client.post("/restaurants/bulk", json=[
+        bulk_item(0, rating=3.5, categories=["Ramen"], location={"latitude": 10.0, "longitude": 20.0}),
+        bulk_item(3),
+        bulk_item(3),
+        {"place_id": "broken", "name": "Broken", "rating": 9}
+    ])
+    assert response.status_code == 200
+    data = response.json()
+    assert [item["status"] for item in data["items"]] == ["updated", "created", "duplicate", "invalid"]
+    assert (data["created"], data["updated"], data["failed"]) == (1, 1, 2)
+
+    updated_id = data["items"][0]["id"]
+    restaurant = client.get(f"/restaurants/{updated_id}").json()
+    assert restaurant["rating"] == 3.5
+    assert restaurant["location"] == {"latitude": 10.0, "longitude": 20.0}
+
+    response = client.get("/restaurants/", params={"cuisine": "Ramen"})
+    assert [r["place_id"] for r in response.json()] == ["bulk0"]
+    response = client.get("/restaurants/", params={"cuisine": "Pizza"})
+    assert sorted(r["place_id"] for r in response.json()) == ["bulk1", "bulk2", "bulk3"]
+
+    response = client.get("/restaurants/nearby", params={"lat": 10.0, "lng": 20.0, "radius_m": 100})
+    assert [r["place_id"] for r in response.json()] == ["bulk0"]
+
+def test_bulk_upsert_skips_unchanged_rows():
+    """Тест пакетной загрузки: без изменений строка не пишется, ETag и кэш поиска сохраняются"""
+    client.post("/restaurants/bulk", json=[bulk_item(0), bulk_item(1)])
+    restaurant_id = client.get("/restaurants/", params={"q": "Bulk 0"}).json()[0]["id"]
+    etag = client.get(f"/restaurants/{restaurant_id}").headers["ETag"]
+    client.get("/restaurants/", params={"cuisine": "Pizza"})
+    size = client.get("/restaurants/cache/stats").json()["size"]
+
+    # Порядок категорий не важен; отсутствующий rating не затирает сохраненный
+    data = client.post("/restaurants/bulk", json=[
+        bulk_item(0, categories=["Pizza", "Italian"]),
+        bulk_item(1, rating=None)
+    ]).json()
+    assert [item["status"] for item in data["items"]] == ["unchanged", "unchanged"]
+    assert data["unchanged"] == 2
+    response = client.get(f"/restaurants/{restaurant_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert client.get("/restaurants/cache/stats").json()["size"] == size
+
+    data = client.post("/restaurants/bulk", json=[bulk_item(0, location={"latitude": 10.0, "longitude": 20.0})]).json()
+    assert data["items"][0]["status"] == "updated"
+    assert client.get(f"/restaurants/{restaurant_id}", headers={"If-None-Match": etag}).status_code == 200
+    assert client.get("/restaurants/", params={"q": "Bulk 1"}).json()[0]["rating"] == 4.0
+
+def test_bulk_upsert_query_count_is_constant():
+    """Тест пакетной загрузки: число запросов не зависит от размера пакета"""
+    counts = []
+    for offset, size in ((0, 5), (100, 200)):
+        with count_queries() as statements:
+            response = client.post("/restaurants/bulk", json=[bulk_item(offset + i) for i in range(size)])
+        assert response.json()["created"] == size
+        counts.append(len(statements))
+    assert counts[0] == counts[1]
+
+def test_create_restaurant_with_categories(valid_restaurant_data):
+    """Тест создания ресторана с категориями"""
+    response = client.post("/restaurants/", json={**valid_restaurant_data, "categories": ["Italian"]})
+    assert response.status_code == 201
+
+    response = client.get("/restaurants/", params={"cuisine": "Italian"})
+    assert [r["place_id"] for r in response.json()] == [valid_restaurant_data["place_id"]]
+
+def test_search_cache_normalizes_cuisine(valid_restaurant_data):
+    """Тест кэша поиска: кухня с пробелами ищется и кэшируется так же, как без них"""
+    client.post("/restaurants/", json={**valid_restaurant_data, "categories": ["Italian"]})
+
+    response = client.get("/restaurants/", params={"cuisine": " Italian "})
+    assert [r["place_id"] for r in response.json()] == [valid_restaurant_data["place_id"]]
+    hits = client.get("/restaurants/cache/stats").json()["hits"]
+    response = client.get("/restaurants/", params={"cuisine": "Italian"})
+    assert [r["place_id"] for r in response.json()] == [valid_restaurant_data["place_id"]]
+    assert client.get("/restaurants/cache/stats").json()["hits"] == hits + 1
+
+def test_review_invalidates_pages_restaurant_leaves(valid_restaurant_data):
+    """Тест кэша поиска: отзыв, выводящий ресторан из фильтра, сбрасывает следующие страницы"""
+    ids = []
+    for place_id, rating in (("leaving", 4.9), ("staying", 4.5)):
+        response = client.post("/restaurants/", json={**valid_restaurant_data, "place_id": place_id, "rating": rating})
+        ids.append(response.json()["id"])
+        review = {"restaurant_id": ids[-1], "author": "a", "text": "Great", "rating": 5}
+        assert client.post(f"/restaurants/{ids[-1]}/reviews", json=review).status_code == 201
+
+    second_page = {"min_user_rating": 4, "skip": 1, "limit": 1}
+    assert [r["place_id"] for r in client.get("/restaurants/", params=second_page).json()] == ["staying"]
+    # Средняя оценка "leaving" падает до 3: он выпадает из фильтра, "staying" сдвигается на первую страницу
+    review = {"restaurant_id": ids[0], "author": "b", "text": "Bad", "rating": 1}
+    assert client.post(f"/restaurants/{ids[0]}/reviews", json=review).status_code == 201
+    assert client.get("/restaurants/", params=second_page).json() == []
+
+def test_search_cache_hits_and_invalidation(valid_restaurant_data):
+    """Тест кэша поиска: попадания и точечная инвалидация при записи"""
+    client.post("/restaurants/", json={**valid_restaurant_data, "categories": ["Italian"]})
+    stats = client.get("/restaurants/cache/stats").json()
+
+    italian = {"cuisine": "Italian", "limit": 10}
+    cheap_top = {"min_rating": 4.8, "limit": 10}
+    first = client.get("/restaurants/", params=italian).json()
+    with count_queries() as statements:
+        second = client.get("/restaurants/", params=italian).json()
+    assert first == second
+    assert statements == []
+    client.get("/restaurants/", params=cheap_top)
+
+    after = client.get("/restaurants/cache/stats").json()
+    assert after["hits"] - stats["hits"] == 1
+    assert after["misses"] - stats["misses"] == 2
+    assert after["size"] == 2
+
+    # Новый ресторан с рейтингом 4.0 не попадает под min_rating=4.8
+    response = client.post("/restaurants/", json={
+        **valid_restaurant_data,
+        "place_id": "cache_new",
+        "rating": 4.0,
+        "categories": ["Italian"]
+    })
+    assert response.status_code == 201
+    assert client.get("/restaurants/cache/stats").json()["size"] == 1
+
+    data = client.get("/restaurants/", params=italian).json()
+    assert sorted(r["place_id"] for r in data) == ["cache_new", valid_restaurant_data["place_id"]]
+
+    # Обновление через bulk сбрасывает страницы, где ресторан был
+    client.post("/restaurants/bulk", json=[{**valid_restaurant_data, "place_id": "cache_new", "rating": 4.9}])
+    data = client.get("/restaurants/", params=cheap_top).json()
+    assert [r["place_id"] for r in data] == ["cache_new"]
+
+def test_restaurant_etag(valid_restaurant_data, test_db):
+    """Тест ETag и условного GET карточки ресторана и списка отзывов"""
+    restaurant_id = client.post("/restaurants/", json=valid_restaurant_data).json()["id"]
+
+    response = client.get(f"/restaurants/{restaurant_id}")
+    etag = response.headers["ETag"]
+    assert "max-age" in response.headers["Cache-Control"]
+
+    with count_queries() as statements:
+        response = client.get(f"/restaurants/{restaurant_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert len(statements) == 1
+
+    reviews_url = f"/restaurants/{restaurant_id}/reviews"
+    response = client.get(reviews_url)
+    reviews_etag = response.headers["ETag"]
+    assert reviews_etag != etag
+    assert client.get(reviews_url, headers={"If-None-Match": reviews_etag}).status_code == 304
+
+    # Новый отзыв меняет версию обоих представлений
+    test_db.add(Review(restaurant_id=restaurant_id, author="User", text="Text", rating=4.0))
+    test_db.commit()
+    response = client.get(reviews_url, headers={"If-None-Match": reviews_etag})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    assert client.get(f"/restaurants/{restaurant_id}", headers={"If-None-Match": etag}).status_code == 200
+
+    # Обновление ресторана меняет ETag карточки
+    etag = client.get(f"/restaurants/{restaurant_id}").headers["ETag"]
+    client.post("/restaurants/bulk", json=[{**valid_restaurant_data, "rating": 3.0}])
+    response = client.get(f"/restaurants/{restaurant_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["rating"] == 3.0
+
+def test_review_aggregates(valid_restaurant_data, test_db):
+    """Тест агрегатов отзывов: обновление при создании, фильтры, сортировка и пересчет"""
+    restaurant_id = client.post("/restaurants/", json=valid_restaurant_data).json()["id"]
+    other_id = client.post("/restaurants/", json={**valid_restaurant_data, "place_id": "other", "rating": 4.9}).json()["id"]
+
+    for rating, text in ((5.0, "Good"), (3.0, "Meh")):
+        response = client.post(
+            f"/restaurants/{restaurant_id}/reviews",
+            json={"restaurant_id": restaurant_id, "author": "User", "text": text, "rating": rating}
+        )
+        assert response.status_code == 201
+    # Оценен только первый отзыв, второй остается в очереди
+    with patch.object(review_service, "_client", fake_openai_scores({"Good": 0.8})):
+        assert asyncio.run(sentiment_queue.run_once()) == 2
+
+    data = client.get(f"/restaurants/{restaurant_id}").json()
+    assert data["review_count"] == 2
+    assert data["avg_user_rating"] == 4.0
+    assert data["avg_sentiment"] == 0.8
+    assert data["last_review_at"] is not None
+
+    response = client.get("/restaurants/", params={"min_reviews": 1})
+    assert [r["id"] for r in response.json()] == [restaurant_id]
+    response = client.get("/restaurants/", params={"sort": "review_count"})
+    assert [r["id"] for r in response.json()] == [restaurant_id, other_id]
+    response = client.get("/restaurants/", params={"sort": "review_count", "limit": 1})
+    response = client.get("/restaurants/", params={
+        "sort": "review_count",
+        "limit": 1,
+        "cursor": response.headers["X-Next-Cursor"]
+    })
+    assert [r["id"] for r in response.json()] == [other_id]
+    assert client.get("/restaurants/", params={"sort": "unknown"}).status_code == 422
+
+    # Пересчет исправляет расхождение
+    restaurant = test_db.get(Restaurant, restaurant_id)
+    restaurant.review_count = 10
+    test_db.commit()
+    assert rebuild_review_aggregates(engine) == 1
+    assert rebuild_review_aggregates(engine) == 0
+    search_cache.clear()
+    assert client.get(f"/restaurants/{restaurant_id}").json()["review_count"] == 2
+
+def test_fulltext_search(valid_restaurant_data, test_db):
+    """Тест полнотекстового поиска q: название, адрес, отзывы, ранжирование и фильтры"""
+    ramen = client.post("/restaurants/", json={
+        **valid_restaurant_data, "place_id": "ramen", "name": "Ramen House", "address": "Station Square 1", "rating": 4.0
+    }).json()["id"]
+    noodles = client.post("/restaurants/", json={
+        **valid_restaurant_data, "place_id": "noodles", "name": "Noodle Bar", "address": "Main St 2", "rating": 4.8
+    }).json()["id"]
+    client.post("/restaurants/", json={
+        **valid_restaurant_data, "place_id": "pizza", "name": "Pizza Place", "address": "Main St 3"
+    })
+    test_db.add(Review(restaurant_id=noodles, author="User", text="Great ramen near the station", rating=5.0))
+    test_db.commit()
+
+    # Совпадение в названии ранжируется выше совпадения в отзыве
+    response = client.get("/restaurants/", params={"q": "ramen"})
+    assert response.status_code == 200
+    assert [r["id"] for r in response.json()] == [ramen, noodles]
+
+    # Последнее слово - префикс; регистр и пунктуация не важны
+    response = client.get("/restaurants/", params={"q": "RAMEN, stat"})
+    assert [r["id"] for r in response.json()] == [ramen, noodles]
+    assert client.get("/restaurants/", params={"q": "!!!"}).json() == []
+
+    # Запрос на естественном языке: стоп-слова отбрасываются, слова объединяются
+    # через OR; "near" есть только в отзыве, но ресторан без него тоже находится
+    response = client.get("/restaurants/", params={"q": "ramen near the station"})
+    assert sorted(r["id"] for r in response.json()) == sorted([ramen, noodles])
+    # Совпадения в названии и отзыве складываются
+    test_db.add(Review(restaurant_id=noodles, author="User", text="Try the dumplings", rating=5.0))
+    test_db.commit()
+    search_cache.clear()
+    response = client.get("/restaurants/", params={"q": "noodle dumplings"})
+    assert [r["id"] for r in response.json()] == [noodles]
+    response = client.get("/restaurants/", params={"q": 'ramen "pizza'})
+    assert {r["id"] for r in response.json()} >= {ramen, noodles}
+
+    # Комбинация с фильтрами и явной сортировкой
+    response = client.get("/restaurants/", params={"q": "ramen", "min_rating": 4.5})
+    assert [r["id"] for r in response.json()] == [noodles]
+    response = client.get("/restaurants/", params={"q": "ramen", "sort": "rating"})
+    assert [r["id"] for r in response.json()] == [noodles, ramen]
+    assert client.get("/restaurants/", params={"sort": "relevance"}).status_code == 422
+
+    # Курсор по релевантности
+    response = client.get("/restaurants/", params={"q": "ramen", "limit": 1})
+    assert [r["id"] for r in response.json()] == [ramen]
+    response = client.get("/restaurants/", params={"q": "ramen", "limit": 1, "cursor": response.headers["X-Next-Cursor"]})
+    assert [r["id"] for r in response.json()] == [noodles]
+
+    # Индекс следует за изменением названия (bulk upsert)
+    response = client.post("/restaurants/bulk", json=[{
+        **valid_restaurant_data, "place_id": "pizza", "name": "Pizza and Ramen", "address": "Main St 3"
+    }])
+    assert response.status_code == 200
+    response = client.get("/restaurants/", params={"q": "pizza ramen"})
+    assert [r["name"] for r in response.json()][0] == "Pizza and Ramen"
+
+def test_restaurant_facets(valid_restaurant_data):
+    """Тест фасетов: счетчики по категориям, цене и рейтингу одним запросом"""
+    for i, (rating, price, categories) in enumerate([
+        (4.7, 2, ["Italian", "Pizza"]),
+        (4.2, 2, ["Italian"]),
+        (3.4, 1, ["Sushi"]),
+        (None, 3, []),
+    ]):
+        response = client.post("/restaurants/", json={
+            **valid_restaurant_data,
+            "place_id": f"facet_{i}",
+            "rating": rating,
+            "price_level": price,
+            "categories": categories
+        })
+        assert response.status_code == 201
+
+    with count_queries() as statements:
+        response = client.get("/restaurants/facets")
+    assert response.status_code == 200
+    assert len(statements) == 1
+    data = response.json()
+    assert data["total"] == 4
+    assert data["categories"] == [
+        {"value": "Italian", "count": 2},
+        {"value": "Pizza", "count": 1},
+        {"value": "Sushi", "count": 1}
+    ]
+    assert data["price_level"] == [
+        {"value": 1, "count": 1},
+        {"value": 2, "count": 2},
+        {"value": 3, "count": 1}
+    ]
+    assert data["rating"] == [
+        {"value": 4.5, "count": 1},
+        {"value": 4.0, "count": 1},
+        {"value": 3.0, "count": 1}
+    ]
+    assert data["min_rating"] == [
+        {"value": 4.5, "count": 1},
+        {"value": 4.0, "count": 2},
+        {"value": 3.0, "count": 3}
+    ]
+
+    # Фасеты считаются по текущей выдаче
+    data = client.get("/restaurants/facets", params={"cuisine": "Italian", "min_rating": 4.5}).json()
+    assert data["total"] == 1
+    assert data["categories"] == [{"value": "Italian", "count": 1}, {"value": "Pizza", "count": 1}]
+
+    # Повторный запрос из кэша, запись ресторана его инвалидирует
+    with count_queries() as statements:
+        client.get("/restaurants/facets")
+    assert statements == []
+    client.post("/restaurants/", json={**valid_restaurant_data, "place_id": "facet_new", "categories": ["Sushi"]})
+    assert client.get("/restaurants/facets").json()["total"] == 5
+
+def test_export_restaurants_and_reviews(valid_restaurant_data, test_db):
+    """Тест потоковой выгрузки NDJSON/CSV с фильтрами и updated_since"""
+    ids = []
+    for i in range(5):
+        response = client.post("/restaurants/", json={
+            **valid_restaurant_data,
+            "place_id": f"export_{i}",
+            "name": f"Export {i}",
+            "rating": 3.0 + i / 2,
+            "location": {"latitude": 51.5, "longitude": -0.12}
+        })
+        ids.append(response.json()["id"])
+    test_db.add_all([
+        Review(restaurant_id=ids[0], author="A", text="Plain, \"quoted\"\ntext", rating=3.0),
+        Review(restaurant_id=ids[4], author="B", text="Great", rating=5.0),
+    ])
+    test_db.commit()
+
+    # Мелкие пачки серверного курсора не влияют на результат
+    with patch("backend.app.services.export_service.settings.EXPORT_BATCH_SIZE", 2):
+        response = client.get("/export/restaurants")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["id"] for row in rows] == ids
+    assert rows[0]["latitude"] == 51.5
+    assert rows[4]["review_count"] == 0
+
+    response = client.get("/export/restaurants", params={"min_rating": 4.0, "format": "csv"})
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [int(row["id"]) for row in rows] == ids[2:]
+    assert rows[0]["name"] == "Export 2"
+
+    # Инкрементальная выгрузка
+    since = datetime(2000, 1, 1)
+    test_db.query(Restaurant).update({Restaurant.updated_at: since})
+    test_db.query(Restaurant).filter(Restaurant.id == ids[1]).update({Restaurant.updated_at: datetime(2030, 1, 1)})
+    test_db.commit()
+    response = client.get("/export/restaurants", params={"updated_since": "2020-01-01T00:00:00"})
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [ids[1]]
+
+    # Отзывы: фильтры поиска применяются к ресторанам, CSV экранирует текст
+    response = client.get("/export/reviews", params={"format": "csv"})
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [row["text"] for row in rows] == ["Plain, \"quoted\"\ntext", "Great"]
+    response = client.get("/export/reviews", params={"min_rating": 4.5})
+    assert [json.loads(line)["author"] for line in response.text.splitlines()] == ["B"]
+    assert client.get("/export/reviews", params={"format": "xml"}).status_code == 422
@@ -1,6 +1,6 @@
 import pytest
 from backend.app.db.session import get_db # или нужный модуль, где определена get_db
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 @pytest.mark.asyncio
 async def test_get_db_returns_session():
@@ -8,8 +8,8 @@ async def test_get_db_returns_session():
     db_gen = get_db()
     # Получаем первую выдачу из асинхронного генератора
     db = await db_gen.__anext__()
-    # Проверяем, что объект является экземпляром Session
-    assert isinstance(db, Session)
+    # Проверяем, что объект является экземпляром AsyncSession
+    assert isinstance(db, AsyncSession)
     # Завершаем генератор и проверяем, что он больше не выдаёт значений
     with pytest.raises(StopAsyncIteration):
         await db_gen.__anext__()
\ No newline at end of file
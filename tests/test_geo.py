@@ -0,0 +1,70 @@
+import math
+import random
+from backend.app.core.geo import (
+    EARTH_RADIUS_M,
+    bounding_box,
+    covering_geohashes,
+    geohash_encode,
+    geohash_range,
+    haversine_m
+)
+
+def test_geohash_encode():
+    """Тест кодирования geohash на известном значении"""
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    assert geohash_encode(51.5074, -0.1278).startswith("gcpvj")
+
+def test_haversine():
+    """Тест расстояния между двумя точками"""
+    assert haversine_m(51.5074, -0.1278, 51.5074, -0.1278) == 0
+    # Лондон - Париж около 344 км
+    assert 340000 < haversine_m(51.5074, -0.1278, 48.8566, 2.3522) < 348000
+
+def destination(latitude: float, longitude: float, bearing: float, distance_m: float):
+    """Точка на заданном расстоянии и азимуте (на сфере haversine_m)"""
+    angle = distance_m / EARTH_RADIUS_M
+    phi1, theta = math.radians(latitude), math.radians(bearing)
+    phi2 = math.asin(math.sin(phi1) * math.cos(angle) + math.cos(phi1) * math.sin(angle) * math.cos(theta))
+    dlambda = math.atan2(
+        math.sin(theta) * math.sin(angle) * math.cos(phi1),
+        math.cos(angle) - math.sin(phi1) * math.sin(phi2)
+    )
+    return math.degrees(phi2), longitude + math.degrees(dlambda)
+
+def test_bounding_box_contains_circle_edge():
+    """Тест прямоугольника: точки у самой границы радиуса попадают внутрь"""
+    for latitude, longitude in [(51.5074, -0.1278), (0.0, 0.0), (-64.1, 170.0)]:
+        min_lat, max_lat, min_lng, max_lng = bounding_box(latitude, longitude, 1000)
+        for bearing in range(0, 360, 5):
+            lat, lng = destination(latitude, longitude, bearing, 999.5)
+            assert haversine_m(latitude, longitude, lat, lng) < 1000
+            assert min_lat <= lat <= max_lat
+            assert min_lng <= lng <= max_lng
+
+def test_covering_geohashes_contain_points_in_radius():
+    """Тест покрытия: любая точка внутри радиуса попадает в одну из ячеек"""
+    rng = random.Random(42)
+    for latitude, longitude, radius_m in [(51.5074, -0.1278, 1000), (0.0, 0.0, 250), (64.1, 179.99, 5000)]:
+        prefixes = covering_geohashes(latitude, longitude, radius_m)
+        assert len(prefixes) <= 9
+        ranges = [geohash_range(prefix) for prefix in prefixes]
+        for _ in range(500):
+            lat = latitude + rng.uniform(-1, 1) * radius_m / 111320
+            lng = longitude + rng.uniform(-1, 1) * radius_m / 40000
+            lng = (lng + 180) % 360 - 180
+            if haversine_m(latitude, longitude, lat, lng) > radius_m:
+                continue
+            geohash = geohash_encode(lat, lng)
+            assert any(start <= geohash < end for start, end in ranges)
+
+def test_covering_geohashes_near_pole():
+    """Тест покрытия у полюса: круг через полюс покрывают все ячейки полосы широт"""
+    rng = random.Random(7)
+    for radius_m in [5000, 20000]:
+        prefixes = covering_geohashes(89.9, 10.0, radius_m)
+        ranges = [geohash_range(prefix) for prefix in prefixes]
+        for _ in range(500):
+            lat, lng = destination(89.9, 10.0, rng.uniform(0, 360), rng.uniform(0, radius_m * 0.999))
+            geohash = geohash_encode(lat, (lng + 180) % 360 - 180)
+            assert any(start <= geohash < end for start, end in ranges)
+    assert covering_geohashes(89.9, 10.0, 20000) == sorted("bcfguvyz")
@@ -0,0 +1,287 @@
+import asyncio
+import time
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+from backend.app.core.geo import haversine_m
+from scripts.data_collection import google_maps
+from scripts.data_collection.area_crawler import AreaCrawler, SeenSet, Tile
+from scripts.data_collection.google_maps import AsyncGoogleMapsAPI, GoogleMapsAPI, TokenBucket
+from scripts.data_collection.response_cache import CacheMiss, ResponseCache
+
+def make_api(handler, **kwargs) -> AsyncGoogleMapsAPI:
+    """Клиент с подменой транспорта httpx (без сети)"""
+    return AsyncGoogleMapsAPI("test-key", client=httpx.AsyncClient(transport=httpx.MockTransport(handler)), **kwargs)
+
+@pytest.mark.asyncio
+async def test_token_bucket_limits_rate():
+    """Тест token bucket: после исчерпания запаса токены выдаются со скоростью rate"""
+    bucket = TokenBucket(rate=50, capacity=1)
+    started = time.monotonic()
+    for _ in range(11):
+        await bucket.acquire()
+    assert time.monotonic() - started >= 0.19
+
+@pytest.mark.asyncio
+async def test_token_bucket_backs_off_and_recovers():
+    """Тест адаптивной скорости: снижение при превышении квоты, постепенный возврат"""
+    bucket = TokenBucket(rate=10, min_rate=1)
+    bucket.throttle()
+    assert bucket.rate == 5
+    for _ in range(5):
+        bucket.throttle()
+    assert bucket.rate == 1
+    for _ in range(100):
+        bucket.success()
+    assert bucket.rate == 10
+
+@pytest.mark.asyncio
+async def test_over_query_limit_is_retried():
+    """Тест повтора: OVER_QUERY_LIMIT и HTTP 429 снижают скорость, запрос повторяется"""
+    responses = [
+        httpx.Response(429),
+        httpx.Response(200, json={"status": "OVER_QUERY_LIMIT"}),
+        httpx.Response(200, json={"status": "OK", "results": []}),
+    ]
+    seen = []
+
+    def handler(request):
+        seen.append(request.url.params["key"])
+        return responses[len(seen) - 1]
+
+    async with make_api(handler, qps=100) as api:
+        result = await api.search_places("pizza")
+        assert result["status"] == "OK"
+        assert api.limiter.throttled == 2
+        assert api.limiter.rate < 100
+    assert seen == ["test-key"] * 3
+
+@pytest.mark.asyncio
+async def test_retries_are_bounded():
+    """Тест исчерпания повторов: возвращается последний ответ OVER_QUERY_LIMIT"""
+    async with make_api(lambda request: httpx.Response(200, json={"status": "OVER_QUERY_LIMIT"}),
+                        qps=100, max_retries=2) as api:
+        result = await api.geocode("London")
+        assert result["status"] == "OVER_QUERY_LIMIT"
+        assert api.requests == 3
+
+@pytest.mark.asyncio
+async def test_crawl_fetches_details_concurrently():
+    """Тест сбора: детали уникальных мест запрашиваются параллельно в пределах max_concurrency"""
+    in_flight = 0
+    peak = 0
+    details_requested = []
+
+    async def handler(request):
+        nonlocal in_flight, peak
+        if request.url.path.endswith("textsearch/json"):
+            query = request.url.params["query"]
+            return httpx.Response(200, json={"status": "OK", "results": [
+                {"place_id": f"{query}-{i}"} for i in range(3)
+            ] + [{"place_id": "shared"}]})
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.02)
+        in_flight -= 1
+        details_requested.append(request.url.params["place_id"])
+        return httpx.Response(200, json={"status": "OK", "result": {"name": request.url.params["place_id"]}})
+
+    async with make_api(handler, qps=1000, max_concurrency=4) as api:
+        details = await api.crawl(["pizza", "sushi"])
+
+    assert len(details) == 7
+    assert sorted(details_requested) == sorted(details)
+    assert details["shared"]["result"]["name"] == "shared"
+    assert peak == 4
+
+def fake_text_search(places, page_size=20, max_results=60):
+    """
+    Text Search по списку мест: ближайшие к location, страницы по next_page_token
+
+    Как и у Google, radius - только приоритет: сначала места в круге, затем
+    ответ добирается местами за его пределами.
+    """
+    requests = []
+
+    def handler(request):
+        params = request.url.params
+        requests.append(dict(params))
+        if "pagetoken" in params:
+            location, radius, offset = params["pagetoken"].split("|")
+        else:
+            location, radius, offset = params["location"], params["radius"], 0
+        lat, lng = map(float, location.split(","))
+        matching = sorted(
+            (haversine_m(lat, lng, place["lat"], place["lng"]) > float(radius),
+             haversine_m(lat, lng, place["lat"], place["lng"]), place["id"], place)
+            for place in places
+        )[:max_results]
+        offset = int(offset)
+        page = matching[offset:offset + page_size]
+        body = {"status": "OK" if page else "ZERO_RESULTS", "results": [
+            {"place_id": place_id, "geometry": {"location": {"lat": place["lat"], "lng": place["lng"]}}}
+            for _, _, place_id, place in page
+        ]}
+        if offset + page_size < len(matching):
+            body["next_page_token"] = f"{location}|{radius}|{offset + page_size}"
+        return httpx.Response(200, json=body)
+
+    return handler, requests
+
+@pytest.mark.asyncio
+async def test_search_all_pages_follows_next_page_token():
+    """Тест постраничного поиска: страницы по токену, повтор неактивного токена"""
+    responses = iter([
+        httpx.Response(200, json={"status": "OK", "results": [{"place_id": "a"}], "next_page_token": "t1"}),
+        httpx.Response(200, json={"status": "INVALID_REQUEST"}),
+        httpx.Response(200, json={"status": "OK", "results": [{"place_id": "b"}]}),
+    ])
+    async with make_api(lambda request: next(responses), qps=100) as api:
+        with patch.object(google_maps, "NEXT_PAGE_DELAY", 0):
+            result = await api.search_all_pages("pizza")
+    assert [place["place_id"] for place in result["results"]] == ["a", "b"]
+    assert result["pages"] == 2
+    assert result["next_page_token"] is None
+
+@pytest.mark.asyncio
+async def test_search_all_pages_caches_whole_result(tmp_path):
+    """Тест кэша постраничного поиска: все страницы одной записью, без токенов из кэша"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    responses = iter([
+        httpx.Response(200, json={"status": "OK", "results": [{"place_id": "a"}], "next_page_token": "t1"}),
+        httpx.Response(200, json={"status": "OK", "results": [{"place_id": "b"}]}),
+        # Оборванный ошибкой страницы результат не кэшируется
+        httpx.Response(200, json={"status": "OK", "results": [{"place_id": "c"}], "next_page_token": "t2"}),
+        httpx.Response(200, json={"status": "UNKNOWN_ERROR"}),
+    ])
+    async with make_api(lambda request: next(responses), qps=100, cache=cache) as api:
+        with patch.object(google_maps, "NEXT_PAGE_DELAY", 0):
+            first = await api.search_all_pages("pizza", "51.5,-0.1", 500)
+            assert await api.search_all_pages("pizza", "51.5,-0.1", 500) == first
+            assert api.requests == 2
+
+            partial = await api.search_all_pages("sushi")
+            assert partial["next_page_token"] == "t2"
+    assert cache.stats()["size"] == 1
+
+@pytest.mark.asyncio
+async def test_area_crawl_covers_dense_area(tmp_path):
+    """Тест обхода плитками: плитки с лимитом делятся, все места найдены без дубликатов"""
+    # Плотный квартал в углу и редкие места по всей области ~11x11 км
+    places = [
+        {"id": f"dense-{i}-{j}", "lat": 0.001 * i, "lng": 0.001 * j}
+        for i in range(10) for j in range(10)
+    ] + [
+        {"id": f"sparse-{i}-{j}", "lat": 0.02 * i + 0.005, "lng": 0.02 * j + 0.005}
+        for i in range(5) for j in range(5)
+    ]
+    handler, requests = fake_text_search(places)
+    seen_path = tmp_path / "seen.txt"
+    output_path = tmp_path / "places.jsonl"
+
+    async with make_api(handler, qps=10000, max_concurrency=20) as api:
+        with patch.object(google_maps, "NEXT_PAGE_DELAY", 0):
+            crawler = AreaCrawler(api, "restaurants", SeenSet(str(seen_path)), str(output_path))
+            found = await crawler.crawl(Tile(0.0, 0.0, 0.1, 0.1))
+
+    assert sorted(place["place_id"] for place in found) == sorted(place["id"] for place in places)
+    assert crawler.splits > 0
+    # Разреженные плитки (ответ добран местами вне круга) не дробятся:
+    # запросов заметно меньше, чем при равномерной сетке
+    stats = crawler.stats()
+    assert stats["api_requests"] == len(requests) < 200
+    assert stats["padded_tiles"] > 0
+    assert stats["incomplete_tiles"] == 0
+    assert len(output_path.read_text().splitlines()) == len(places)
+
+    # Повторный запуск с сохраненным множеством не дает новых мест
+    async with make_api(handler, qps=10000, max_concurrency=20) as api:
+        with patch.object(google_maps, "NEXT_PAGE_DELAY", 0):
+            crawler = AreaCrawler(api, "restaurants", SeenSet(str(seen_path)), str(output_path))
+            assert await crawler.crawl(Tile(0.0, 0.0, 0.1, 0.1)) == []
+    assert len(output_path.read_text().splitlines()) == len(places)
+
+@pytest.mark.asyncio
+async def test_area_crawl_reports_incomplete_tiles(caplog):
+    """Тест предела деления: насыщенная плитка минимального размера учитывается и логируется"""
+    places = [{"id": f"p-{i}-{j}", "lat": 0.0001 * i, "lng": 0.0001 * j} for i in range(10) for j in range(10)]
+    handler, _ = fake_text_search(places)
+    async with make_api(handler, qps=10000) as api:
+        with patch.object(google_maps, "NEXT_PAGE_DELAY", 0):
+            crawler = AreaCrawler(api, "restaurants", SeenSet(), max_depth=0)
+            found = await crawler.crawl(Tile(0.0, 0.0, 0.001, 0.001))
+    assert len(found) == 60
+    assert crawler.stats()["incomplete_tiles"] == 1
+    assert "results may be incomplete" in caplog.text
+
+@pytest.mark.asyncio
+async def test_area_crawl_records_seen_after_output(tmp_path):
+    """Тест порядка записи: при сбое записи мест их place_id не попадают в seen"""
+    places = [{"id": f"p-{i}", "lat": 0.001 * i, "lng": 0.001 * i} for i in range(5)]
+    handler, _ = fake_text_search(places)
+    seen_path = tmp_path / "seen.txt"
+
+    async with make_api(handler, qps=10000) as api:
+        crawler = AreaCrawler(api, "restaurants", SeenSet(str(seen_path)), str(tmp_path / "places.jsonl"))
+        with patch.object(crawler, "_save", side_effect=OSError("disk full")):
+            with pytest.raises(OSError):
+                await crawler.crawl(Tile(0.0, 0.0, 0.01, 0.01))
+    assert not seen_path.exists()
+    assert len(SeenSet(str(seen_path))) == 0
+
+def test_response_cache_keys_and_ttl(tmp_path):
+    """Тест кэша ответов: ключ без API-ключа и порядка параметров, свой TTL у эндпоинта"""
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl={"geocode/json": 60, "place/details/json": 0})
+    cache.set("geocode/json", {"address": "London", "key": "A"}, {"status": "OK", "results": [1]})
+    cache.set("geocode/json", {"address": "Paris", "key": "A"}, {"status": "OVER_QUERY_LIMIT"})
+    cache.set("place/details/json", {"place_id": "p"}, {"status": "OK"})
+
+    assert cache.get("geocode/json", {"key": "B", "address": "London"}) == {"status": "OK", "results": [1]}
+    # Ошибки не кэшируются, просроченный ответ - промах
+    assert cache.get("geocode/json", {"address": "Paris"}) is None
+    time.sleep(0.01)
+    assert cache.get("place/details/json", {"place_id": "p"}) is None
+    assert cache.purge_expired() == 1
+    assert cache.stats()["size"] == 1
+
+    # Кэш переживает перезапуск; офлайн отдает только сохраненное
+    cache.close()
+    offline = ResponseCache(str(tmp_path / "cache.sqlite"), offline=True)
+    assert offline.get("geocode/json", {"address": "London"})["status"] == "OK"
+    with pytest.raises(CacheMiss):
+        offline.get("geocode/json", {"address": "Paris"})
+
+def test_sync_client_uses_cache(tmp_path):
+    """Тест синхронного клиента: повторный geocode и поиск не обращаются к API"""
+    response = MagicMock(status_code=200)
+    response.json.return_value = {"status": "OK", "results": []}
+    api = GoogleMapsAPI("test-key", cache=ResponseCache(str(tmp_path / "cache.sqlite")))
+    with patch.object(google_maps.requests, "get", return_value=response) as get:
+        for _ in range(2):
+            api.geocode("London")
+            api.search_places("pizza", "51.5,-0.1")
+            api.get_place_details("p1")
+    assert get.call_count == 3
+
+@pytest.mark.asyncio
+async def test_area_crawl_offline_replay(tmp_path):
+    """Тест офлайн-повтора: обход воспроизводится из кэша без запросов к API"""
+    places = [{"id": f"p-{i}-{j}", "lat": 0.001 * i, "lng": 0.001 * j} for i in range(9) for j in range(9)]
+    handler, requests = fake_text_search(places)
+    cache_path = str(tmp_path / "cache.sqlite")
+    tile = Tile(0.0, 0.0, 0.01, 0.01)
+
+    async with make_api(handler, qps=10000, cache=ResponseCache(cache_path)) as api:
+        with patch.object(google_maps, "NEXT_PAGE_DELAY", 0):
+            found = await AreaCrawler(api, "restaurants", SeenSet()).crawl(tile)
+    assert len(found) == len(places)
+
+    def offline_handler(request):
+        raise AssertionError("Network request in offline mode")
+
+    async with make_api(offline_handler, cache=ResponseCache(cache_path, offline=True)) as api:
+        # Страницы из кэша не ждут активации next_page_token
+        with patch.object(google_maps, "NEXT_PAGE_DELAY", 10):
+            replayed = await AreaCrawler(api, "restaurants", SeenSet()).crawl(tile)
+        assert api.requests == 0
+    assert sorted(place["place_id"] for place in replayed) == sorted(place["place_id"] for place in found)
@@ -0,0 +1,77 @@
+import json
+import pytest
+from unittest.mock import patch
+from backend.app.db.models import Restaurant
+from backend.app.services import ingest_service
+from backend.app.services.ingest_service import ingest_file
+from tests.helpers import AsyncTestingSessionLocal, client
+
+def google_place(i, **overrides):
+    """Место в формате ответа Google Places"""
+    return {
+        "place_id": f"g{i}",
+        "name": f"Place {i}",
+        "formatted_address": f"{i} Street",
+        "rating": 4.0,
+        "price_level": 2,
+        "geometry": {"location": {"lat": 51.5 + i / 1000, "lng": -0.12}},
+        "types": ["cafe", "restaurant", "food"],
+        **overrides
+    }
+
+def test_iter_json_places_streams_elements(tmp_path):
+    """Тест потокового разбора JSON: элементы results читаются кусками через границы буфера"""
+    places = [google_place(i, name=f"Кафе «{i}» " + "x" * 50) for i in range(20)]
+    dump = tmp_path / "search.json"
+    dump.write_text(json.dumps(
+        {"html_attributions": [], "next_page_token": "t", "results": places, "status": "OK"},
+        ensure_ascii=False, indent=2
+    ), encoding="utf-8")
+
+    with patch.object(ingest_service, "READ_CHUNK_SIZE", 7):
+        with open(dump, encoding="utf-8") as f:
+            assert list(ingest_service.iter_json_places(f)) == places
+        details = tmp_path / "details.json"
+        details.write_text(json.dumps({"result": places[0], "status": "OK"}), encoding="utf-8")
+        with open(details, encoding="utf-8") as f:
+            assert list(ingest_service.iter_json_places(f)) == [places[0]]
+
+    item = ingest_service.place_to_restaurant(places[1])
+    assert item.location.latitude == pytest.approx(51.501)
+    assert item.categories == ["cafe"]
+
+@pytest.mark.asyncio
+async def test_ingest_ndjson_resumes_from_offset(tmp_path, test_db):
+    """Тест загрузки NDJSON: пакетный upsert по place_id, продолжение с сохраненного смещения"""
+    dump = tmp_path / "places.jsonl"
+    lines = [json.dumps(google_place(i)) for i in range(5)]
+    # Место без price_level загружается; неполное место и испорченная строка пропускаются,
+    # незаконченная строка еще дописывается
+    lines.append(json.dumps({k: v for k, v in google_place(5).items() if k != "price_level"}))
+    lines.append(json.dumps(google_place(7, geometry={"location": {"lat": 51.5}})))
+    lines.append('{"place_id": "broken"')
+    dump.write_text("\n".join(lines) + "\n" + json.dumps(google_place(6))[:20], encoding="utf-8")
+
+    progress = [p async for p in ingest_file(AsyncTestingSessionLocal, str(dump), batch_size=2)]
+    assert sum(p["records"] for p in progress) == 8
+    assert sum(p["created"] for p in progress) == 6
+    assert sum(p["skipped"] for p in progress) == 2
+    offset = progress[-1]["offset"]
+    assert offset == len(("\n".join(lines) + "\n").encode())
+    assert test_db.query(Restaurant).count() == 6
+    assert test_db.query(Restaurant).filter(Restaurant.place_id == "g5").one().price_level is None
+
+    # Дописанные строки: обрабатываются только они, повтор place_id обновляет ресторан
+    dump.write_text(
+        "\n".join(lines) + "\n" + json.dumps(google_place(6)) + "\n"
+        + json.dumps(google_place(0, rating=3.0, price_level=None)) + "\n",
+        encoding="utf-8"
+    )
+    progress = [p async for p in ingest_file(AsyncTestingSessionLocal, str(dump), offset)]
+    assert [(p["records"], p["created"], p["updated"]) for p in progress] == [(2, 1, 1)]
+    test_db.expire_all()
+    assert test_db.query(Restaurant).count() == 7
+    updated = test_db.query(Restaurant).filter(Restaurant.place_id == "g0").one()
+    # Отсутствующий в выгрузке price_level не затирает сохраненный
+    assert (updated.rating, updated.price_level) == (3.0, 2)
+    assert client.get("/restaurants/", params={"cuisine": "cafe"}).json()
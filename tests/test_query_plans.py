@@ -0,0 +1,103 @@
+import pytest
+from itertools import product
+from sqlalchemy import select, tuple_
+from backend.app.db.models import Restaurant, Review, Category, restaurant_categories
+from backend.app.schemas.restaurant import RestaurantFilter
+from backend.app.services.cafe_service import RESTAURANT_ORDER, build_nearby_query, build_restaurants_query
+
+def explain(engine, query):
+    """Возвращает строки EXPLAIN QUERY PLAN для запроса"""
+    sql = str(query.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as conn:
+        return [row[3] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}")]
+
+def assert_no_full_scan(plan):
+    """Ни одна таблица не читается полным сканированием"""
+    scans = [step for step in plan if step.startswith("SCAN")]
+    assert not scans, f"Full scan in plan: {plan}"
+
+# Индексы restaurants, ведущая колонка которых - rating или price_level
+RESTAURANT_FILTER_INDEXES = (
+    "ix_restaurants_rating_price_level",
+    "ix_restaurants_price_level_rating",
+    "ix_restaurants_rating_id",
+)
+
+# Все комбинации фильтров поиска, кроме запроса без фильтров
+FILTER_COMBINATIONS = [
+    combo for combo in product([None, "Italian"], [None, 4.0], [None, 2])
+    if any(value is not None for value in combo)
+]
+
+@pytest.mark.parametrize("cuisine,min_rating,max_price", FILTER_COMBINATIONS)
+def test_search_uses_indexes(engine, tables, cuisine, min_rating, max_price):
+    """Тест использования индексов поиском ресторанов"""
+    filters = RestaurantFilter(cuisine=cuisine, min_rating=min_rating, max_price=max_price)
+    plan = explain(engine, build_restaurants_query(filters))
+
+    assert_no_full_scan(plan)
+    if cuisine:
+        assert any("ix_restaurant_categories_category_restaurant" in step for step in plan)
+    else:
+        assert any(index in step for step in plan for index in RESTAURANT_FILTER_INDEXES)
+
+def test_restaurant_categories_lookup_uses_index(engine, tables):
+    """Тест загрузки категорий ресторана через индекс связующей таблицы"""
+    query = (
+        select(Category)
+        .join(restaurant_categories, restaurant_categories.c.category_id == Category.id)
+        .filter(restaurant_categories.c.restaurant_id == 1)
+    )
+    plan = explain(engine, query)
+
+    assert_no_full_scan(plan)
+    assert any("ix_restaurant_categories_restaurant_category" in step for step in plan)
+
+def test_reviews_by_restaurant_use_index(engine, tables):
+    """Тест выборки отзывов ресторана через (restaurant_id, created_at)"""
+    query = (
+        select(Review)
+        .filter(Review.restaurant_id == 1)
+        .order_by(Review.created_at)
+    )
+    plan = explain(engine, query)
+
+    assert_no_full_scan(plan)
+    assert any("ix_reviews_restaurant_id_created_at" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+def test_search_page_uses_order_index(engine, tables):
+    """Тест keyset-страницы поиска: порядок (rating, id) берется из индекса без сортировки"""
+    query = (
+        build_restaurants_query(RestaurantFilter(min_rating=4.0))
+        .filter(tuple_(Restaurant.rating, Restaurant.id) < (4.5, 100))
+        .order_by(*RESTAURANT_ORDER)
+        .limit(20)
+    )
+    plan = explain(engine, query)
+
+    assert_no_full_scan(plan)
+    assert any("ix_restaurants_rating_id" in step for step in plan)
+    assert not any("TEMP B-TREE" in step for step in plan)
+
+@pytest.mark.parametrize("cuisine,min_rating,max_price", [(None, None, None)] + FILTER_COMBINATIONS)
+def test_nearby_uses_geohash_index(engine, tables, cuisine, min_rating, max_price):
+    """Тест поиска рядом с точкой: кандидаты берутся по индексу geohash"""
+    filters = RestaurantFilter(cuisine=cuisine, min_rating=min_rating, max_price=max_price)
+    plan = explain(engine, build_nearby_query(51.5074, -0.1278, 1000, filters))
+
+    assert_no_full_scan(plan)
+    if not cuisine:
+        assert any("ix_locations_geohash" in step for step in plan)
+
+@pytest.mark.parametrize("min_rating,max_price", [(None, None), (4.0, 2)])
+def test_fulltext_search_uses_fts_index(engine, tables, min_rating, max_price):
+    """Тест полнотекстового поиска: кандидаты из индекса FTS5, рестораны и отзывы по первичному ключу"""
+    filters = RestaurantFilter(q="ramen stat", min_rating=min_rating, max_price=max_price)
+    plan = explain(engine, build_restaurants_query(filters))
+
+    scanned = {step.split()[1] for step in plan if step.startswith("SCAN")}
+    assert not scanned & {"restaurants", "reviews"}, f"Full scan in plan: {plan}"
+    assert any("restaurants_fts VIRTUAL TABLE INDEX" in step for step in plan)
+    assert any("reviews_fts VIRTUAL TABLE INDEX" in step for step in plan)
+    assert any(step.startswith("SEARCH restaurants USING INTEGER PRIMARY KEY") for step in plan)
@@ -0,0 +1,95 @@
+import pytest
+from datetime import datetime, timedelta
+from backend.app.db.models import Location, Restaurant
+from backend.app.services.refresh_service import diff_place, refresh_places
+from tests.helpers import AsyncTestingSessionLocal
+
+def test_diff_place_skips_incomplete_location():
+    """Тест сравнения: координаты без lat или lng не сравниваются"""
+    current = {
+        "name": "Cafe", "address": "Old St", "rating": 4.0, "price_level": 2,
+        "latitude": 51.5, "longitude": -0.12
+    }
+    assert diff_place(current, {"name": "Cafe", "geometry": {"location": {"lat": 52.0}}}) == {}
+    assert diff_place(current, {"rating": 4.5, "geometry": {"location": {"lng": 1.0}}}) == {"rating": 4.5}
+    assert diff_place(current, {"geometry": {"location": {"lat": 52.0, "lng": -0.12}}}) == {
+        "latitude": 52.0, "longitude": -0.12
+    }
+
+@pytest.mark.asyncio
+async def test_refresh_places(test_db):
+    """Тест обновления деталей: приоритет по давности и изменчивости, квота, запись только изменений"""
+    now = datetime(2026, 5, 10, 12, 0)
+    restaurants = {
+        # (дней с добавления, change_rate)
+        "stale": (30, 0.5),
+        "volatile": (10, 1.0),
+        "stable": (10, 0.0),
+        "fresh": (0.5, 1.0),
+        "gone": (9, 1.0),
+        "throttled": (8, 1.0),
+    }
+    for place_id, (days, change_rate) in restaurants.items():
+        test_db.add(Restaurant(
+            place_id=place_id, name=place_id, address="Old St", rating=4.0, price_level=2,
+            # Отзывы меняют updated_at, но не делают данные Google свежими
+            created_at=now - timedelta(days=days), updated_at=now - timedelta(hours=1), change_rate=change_rate,
+            location=Location(latitude=51.5, longitude=-0.12) if place_id == "stale" else None
+        ))
+    test_db.commit()
+    stable_updated_at = test_db.query(Restaurant).filter_by(place_id="stable").one().updated_at
+
+    requested = []
+
+    async def fetch_details(place_ids):
+        requested.append(list(place_ids))
+        return {
+            "stale": {"status": "OK", "result": {
+                "name": "stale", "rating": 4.4, "geometry": {"location": {"lat": 51.6, "lng": -0.12}}
+            }},
+            "volatile": {"status": "OK", "result": {"name": "volatile", "formatted_address": "New St", "price_level": 2}},
+            "stable": {"status": "OK", "result": {"name": "stable", "rating": 4.0}},
+            "gone": {"status": "NOT_FOUND"},
+            "throttled": {"status": "OVER_QUERY_LIMIT"},
+        }
+
+    stats = await refresh_places(
+        AsyncTestingSessionLocal, fetch_details, budget=5, min_interval=timedelta(days=1), now=now
+    )
+    # Свежее место не выбрано; давнее опережает изменчивое, изменчивое - стабильное
+    assert requested == [["stale", "volatile", "gone", "throttled", "stable"]]
+    assert stats == {
+        "selected": 5, "fetched": 4, "changed": 2, "unchanged": 1,
+        "missing": 1, "failed": 1, "columns_written": 4
+    }
+
+    test_db.expire_all()
+    by_place = {restaurant.place_id: restaurant for restaurant in test_db.query(Restaurant)}
+    assert by_place["stale"].rating == 4.4
+    assert by_place["stale"].rating_volatility == pytest.approx(0.3 * 0.4)
+    assert by_place["stale"].location.latitude == 51.6
+    assert by_place["volatile"].address == "New St"
+    assert by_place["stable"].change_rate == 0.0
+    assert by_place["stable"].updated_at == stable_updated_at
+    assert by_place["stable"].refreshed_at == now
+    # Удаленное место ждет интервала, ошибка квоты не отмечает место обновленным
+    assert by_place["gone"].refreshed_at == now
+    assert by_place["throttled"].refreshed_at is None
+
+    # Квота считается по запросам, включая неудачные: при том же бюджете запросов больше нет
+    stats = await refresh_places(
+        AsyncTestingSessionLocal, fetch_details, budget=5, min_interval=timedelta(days=1), now=now
+    )
+    assert stats["selected"] == 0
+    # С большим бюджетом повторяется только неудачное место
+    stats = await refresh_places(
+        AsyncTestingSessionLocal, fetch_details, budget=6, min_interval=timedelta(days=1), now=now
+    )
+    assert requested[1] == ["throttled"]
+    assert (stats["selected"], stats["failed"]) == (1, 1)
+    # Следующие сутки - новая квота
+    stats = await refresh_places(
+        AsyncTestingSessionLocal, fetch_details, budget=1, min_interval=timedelta(days=1),
+        now=now + timedelta(days=1)
+    )
+    assert stats["selected"] == 1
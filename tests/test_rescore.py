@@ -0,0 +1,56 @@
+import pytest
+from unittest.mock import patch
+from backend.app.db.aggregates import rebuild_review_aggregates
+from backend.app.db.models import Restaurant, Review
+from backend.app.services import review_service
+from backend.app.services.rescore_service import rescore_reviews
+from ml.models.sentiment import score as analyze_local
+from tests.helpers import AsyncTestingSessionLocal, engine, fake_openai_scores
+
+@pytest.mark.asyncio
+async def test_rescore_reviews(valid_restaurant_data, test_db):
+    """Тест переоценки: куски по id, поправки агрегатов, продолжение с контрольной точки"""
+    restaurant = Restaurant(**{k: v for k, v in valid_restaurant_data.items() if k != "location"})
+    test_db.add(restaurant)
+    test_db.flush()
+    texts = ["Очень вкусно", "Ужасный сервис", "Nice place", "Awful food"]
+    for i, text in enumerate(texts):
+        test_db.add(Review(
+            restaurant_id=restaurant.id, author="A", text=text, rating=4.0,
+            sentiment_score=None if i == 3 else 0.5,
+            sentiment_status="failed" if i == 3 else "done"
+        ))
+    test_db.add(Review(restaurant_id=restaurant.id, author="B", text="Later", rating=3.0, sentiment_status="pending"))
+    test_db.commit()
+    rebuild_review_aggregates(engine)
+
+    chunks = [
+        progress async for progress in
+        rescore_reviews(AsyncTestingSessionLocal, "local", chunk_size=2, workers=1)
+    ]
+    assert [chunk["reviews"] for chunk in chunks] == [2, 2]
+    assert sum(chunk["scored"] for chunk in chunks) == 4
+
+    test_db.expire_all()
+    scores = {review.text: review.sentiment_score for review in test_db.query(Review)}
+    assert scores == {**{text: pytest.approx(analyze_local(text)) for text in texts}, "Later": None}
+    # Агрегаты поправлены приращениями и совпадают с пересчетом
+    assert rebuild_review_aggregates(engine) == 0
+
+    # Продолжение после последнего обработанного id ничего не переоценивает
+    resumed = [
+        progress async for progress in
+        rescore_reviews(AsyncTestingSessionLocal, "local", after_id=chunks[-1]["last_id"])
+    ]
+    assert resumed == []
+
+    # OpenAI: отзыв без оценки модели сохраняет прежнюю оценку
+    with patch.object(review_service, "_client", fake_openai_scores({text: 0.25 for text in texts[:3]})):
+        chunks = [
+            progress async for progress in
+            rescore_reviews(AsyncTestingSessionLocal, "openai", chunk_size=10)
+        ]
+    assert chunks == [{"last_id": chunks[0]["last_id"], "reviews": 4, "scored": 3, "failed": 1}]
+    test_db.expire_all()
+    assert test_db.query(Review).filter(Review.text == "Awful food").one().sentiment_score == pytest.approx(analyze_local("Awful food"))
+    assert rebuild_review_aggregates(engine) == 0
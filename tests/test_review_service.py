@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from unittest.mock import patch, MagicMock
+from backend.app.services import review_service
+from backend.app.services.review_service import analyze_sentiment
+from backend.app.services.sentiment_queue import sentiment_queue
+from ml.models.sentiment import score as analyze_local
+from tests.helpers import client, fake_openai_scores
+
+pytestmark = pytest.mark.usefixtures("setup_db")
+
+@pytest.mark.asyncio
+async def test_sentiment_concurrency_is_capped():
+    """Тест семафора: одновременно выполняется не больше SENTIMENT_CONCURRENCY запросов"""
+    in_flight = 0
+    peak = 0
+
+    async def create(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return MagicMock(choices=[MagicMock(message=MagicMock(content="0.5"))])
+
+    fake = MagicMock()
+    fake.chat.completions.create = create
+    with patch.object(review_service, "_client", fake), \
+            patch.object(review_service, "_semaphore", asyncio.Semaphore(2)), \
+            patch.object(review_service.sentiment_batcher, "max_batch_size", 1):
+        scores = await asyncio.gather(*(analyze_sentiment(f"text {i}", timeout=5) for i in range(10)))
+    assert scores == [0.5] * 10
+    assert peak == 2
+
+@pytest.mark.asyncio
+async def test_local_sentiment_engine(valid_restaurant_data):
+    """Тест выбора движка: локальная модель основная или запасная при сбое OpenAI"""
+    with patch.object(review_service.settings, "SENTIMENT_ENGINE", "local"), \
+            patch.object(review_service, "_client", None), \
+            patch.object(review_service, "get_client", side_effect=AssertionError("OpenAI called")):
+        assert await analyze_sentiment("Очень вкусно!") > 0.8
+        assert await review_service.analyze_sentiment_batch(["Great", "Awful"]) == [
+            pytest.approx(analyze_local("Great")), pytest.approx(analyze_local("Awful"))
+        ]
+
+    with patch.object(review_service, "_client", fake_openai_scores({})):
+        assert await analyze_sentiment("Terrible service", timeout=5) is None
+        with patch.object(review_service.settings, "SENTIMENT_ENGINE", "fallback"):
+            assert await analyze_sentiment("Terrible service", timeout=5) < 0.2
+
+    # Очередь оценивает пакет локальной моделью без обращения к OpenAI
+    restaurant_id = client.post("/restaurants/", json=valid_restaurant_data).json()["id"]
+    client.post(f"/restaurants/{restaurant_id}/reviews", json={
+        "restaurant_id": restaurant_id, "author": "User", "text": "Отличный сервис", "rating": 5.0
+    })
+    with patch.object(review_service.settings, "SENTIMENT_ENGINE", "local"):
+        assert await sentiment_queue.run_once() == 1
+    assert client.get(f"/restaurants/{restaurant_id}").json()["avg_sentiment"] > 0.8
@@ -0,0 +1,50 @@
+import asyncio
+import json
+import pytest
+from unittest.mock import patch, MagicMock
+from backend.app.services import review_service
+from backend.app.services.review_service import analyze_sentiment
+from tests.helpers import client
+
+pytestmark = pytest.mark.usefixtures("setup_db")
+
+@pytest.mark.asyncio
+async def test_sentiment_micro_batching():
+    """Тест микро-батчинга: одновременные отзывы оцениваются одним запросом"""
+    requests = []
+
+    async def create(**kwargs):
+        texts = json.loads(kwargs["messages"][1]["content"])
+        requests.append(texts)
+        # Оценка "text 2" потеряна, у "text 3" вне диапазона
+        by_text = {"text 0": 0.9, "text 1": 0.1, "text 3": 7, "text 4": 0.5}
+        scores = {number: by_text[text] for number, text in texts.items() if text in by_text}
+        return MagicMock(choices=[MagicMock(message=MagicMock(
+            content="```json\n" + json.dumps(scores) + "\n```"
+        ))])
+
+    fake = MagicMock()
+    fake.chat.completions.create = create
+    batcher = review_service.sentiment_batcher
+    batches_before = batcher.batches
+    with patch.object(review_service, "_client", fake), \
+            patch.object(batcher, "max_batch_size", 5), \
+            patch.object(batcher, "max_wait_ms", 1000):
+        scores = await asyncio.gather(*(analyze_sentiment(f"text {i}", timeout=5) for i in range(5)))
+
+    assert len(requests) == 1
+    assert sorted(requests[0].values()) == [f"text {i}" for i in range(5)]
+    assert scores == [0.9, 0.1, None, None, 0.5]
+    assert batcher.batches == batches_before + 1
+
+    stats = client.get("/restaurants/sentiment/stats").json()
+    assert stats["batches"] >= 1
+    assert stats["failed_items"] >= 2
+    assert stats["latency_ms"]["max"] >= 0
+
+def test_parse_batch_scores():
+    """Тест разбора ответа модели с оценками пакета"""
+    assert review_service.parse_batch_scores('{"1": 0.2, "2": 1}', 2) == [0.2, 1.0]
+    assert review_service.parse_batch_scores("0.7", 1) == [0.7]
+    assert review_service.parse_batch_scores("not json", 2) == [None, None]
+    assert review_service.parse_batch_scores('{"1": true, "2": "0.5"}', 3) == [None, None, None]
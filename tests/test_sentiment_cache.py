@@ -0,0 +1,38 @@
+import pytest
+from unittest.mock import patch, MagicMock
+from backend.app.services import review_service
+from backend.app.services.review_service import analyze_sentiment
+
+pytestmark = pytest.mark.usefixtures("setup_db")
+
+@pytest.mark.asyncio
+async def test_sentiment_cache():
+    """Тест кэша оценок: повтор текста не вызывает модель, смена версии промпта инвалидирует"""
+    calls = []
+
+    async def create(**kwargs):
+        calls.append(kwargs)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content='{"1": 0.8}'))])
+
+    fake = MagicMock()
+    fake.chat.completions.create = create
+    cache = review_service.sentiment_cache
+    with patch.object(review_service, "_client", fake):
+        assert await analyze_sentiment("Great  food!", timeout=5) == 0.8
+        # Тот же текст после нормализации пробелов - из памяти
+        assert await analyze_sentiment(" Great food! ", timeout=5) == 0.8
+        assert len(calls) == 1
+        assert cache.memory_hits == 1
+
+        # Долговременный уровень переживает потерю памяти (перезапуск)
+        cache.clear_memory()
+        assert await analyze_sentiment("Great food!", timeout=5) == 0.8
+        assert len(calls) == 1
+        assert cache.db_hits == 1
+
+        # Новая версия промпта - промах, старые оценки удаляются
+        with patch.object(cache, "prompt_version", "next"):
+            cache.clear_memory()
+            assert await analyze_sentiment("Great food!", timeout=5) == 0.8
+            assert len(calls) == 2
+            assert await cache.purge_stale() == 1
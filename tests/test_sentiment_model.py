@@ -0,0 +1,33 @@
+from unittest.mock import patch
+from ml.models import sentiment
+from ml.models.sentiment import score, score_batch
+
+def test_score_polarity():
+    """Тест полярности: русский и английский, словоформы"""
+    assert score("Очень вкусно, всем рекомендую!") > 0.8
+    assert score("Great food and friendly staff") > 0.8
+    assert score("Ужасное обслуживание, официант хамил") < 0.2
+    assert score("Terrible, overpriced and rude") < 0.2
+    assert score("Мы пришли в семь вечера") == 0.5
+    assert score("") == 0.5
+    assert score(None) == 0.5
+
+def test_score_negation_and_intensifiers():
+    """Тест отрицаний (в пределах фразы) и усилителей"""
+    assert score("The food was not good") < 0.5
+    assert score("Не вкусно") < 0.5
+    assert score("Неплохо") > 0.5
+    assert score("Don't go, worst pizza ever") < 0.2
+    assert score("очень вкусно") > score("вкусно")
+
+def test_score_batch_matches_single_scores():
+    """Тест пакетной оценки: тот же результат в текущем процессе и в пуле процессов"""
+    texts = ["Great place!", "Ужасно", None, "Нормально"] * 50
+    expected = [score(text) for text in texts]
+
+    assert list(score_batch(texts, workers=1)) == expected
+    with patch.object(sentiment, "PROCESS_POOL_THRESHOLD", 10):
+        try:
+            assert list(score_batch(texts, workers=2)) == expected
+        finally:
+            sentiment.shutdown_pool()
@@ -0,0 +1,89 @@
+import asyncio
+import time
+import pytest
+from datetime import datetime
+from unittest.mock import patch, MagicMock
+from backend.app.db.models import Restaurant, Review, SentimentJob
+from backend.app.services import review_service
+from backend.app.services.sentiment_queue import sentiment_queue
+from tests.helpers import fake_openai_scores
+
+pytestmark = pytest.mark.usefixtures("setup_db")
+
+def fake_openai(delay: float, content: str = "0.9"):
+    """Асинхронный клиент OpenAI, отвечающий через delay секунд"""
+    async def create(**kwargs):
+        await asyncio.sleep(delay)
+        return MagicMock(choices=[MagicMock(message=MagicMock(content=content))])
+
+    fake = MagicMock()
+    fake.chat.completions.create = create
+    return fake
+
+@pytest.mark.asyncio
+async def test_sentiment_queue(async_client, valid_restaurant_data, test_db):
+    """Тест очереди: создание отзыва не ждет модель, повтор с задержкой после таймаута, исчерпание попыток"""
+    restaurant_id = (await async_client.post("/restaurants/", json=valid_restaurant_data)).json()["id"]
+    review = {"restaurant_id": restaurant_id, "author": "User", "text": "Nice", "rating": 4.0}
+
+    with patch.object(review_service, "_client", fake_openai(5.0)):
+        started = time.monotonic()
+        response = await async_client.post(f"/restaurants/{restaurant_id}/reviews", json=review)
+        assert time.monotonic() - started < 2
+    assert response.status_code == 201
+    assert response.json()["sentiment_status"] == "pending"
+    etag = (await async_client.get(f"/restaurants/{restaurant_id}")).headers["ETag"]
+
+    # Таймаут: задание откладывается, до срока повтора не берется
+    with patch.object(review_service, "_client", fake_openai(5.0)), \
+            patch.object(review_service.settings, "SENTIMENT_TIMEOUT", 0.1):
+        assert await sentiment_queue.run_once() == 1
+        assert await sentiment_queue.run_once() == 0
+    job = test_db.query(SentimentJob).one()
+    assert job.attempts == 1
+    assert job.run_at > datetime.utcnow()
+
+    status = (await async_client.get("/restaurants/sentiment/queue")).json()
+    assert status["depth"] == 1
+    assert status["due"] == 0
+
+    # Повтор: оценка записывается в отзыв и агрегаты, задание удаляется
+    test_db.query(SentimentJob).update({SentimentJob.run_at: datetime.utcnow()})
+    test_db.commit()
+    with patch.object(review_service, "_client", fake_openai_scores({"Nice": 0.7})):
+        assert await sentiment_queue.run_once() == 1
+    assert test_db.query(SentimentJob).count() == 0
+    response = await async_client.get(f"/restaurants/{restaurant_id}", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.json()["avg_sentiment"] == 0.7
+    reviews = (await async_client.get(f"/restaurants/{restaurant_id}/reviews")).json()
+    assert reviews[0]["sentiment_score"] == 0.7
+
+    # Исчерпание попыток: статус failed меняет ETag списка отзывов
+    await async_client.post(f"/restaurants/{restaurant_id}/reviews", json={**review, "text": "Unscorable"})
+    response = await async_client.get(f"/restaurants/{restaurant_id}/reviews")
+    assert response.json()[0]["sentiment_status"] == "pending"
+    reviews_etag = response.headers["ETag"]
+    with patch.object(review_service, "_client", fake_openai_scores({})), \
+            patch.object(sentiment_queue, "max_attempts", 1):
+        assert await sentiment_queue.run_once() == 1
+    response = await async_client.get(f"/restaurants/{restaurant_id}/reviews", headers={"If-None-Match": reviews_etag})
+    assert response.status_code == 200
+    assert response.json()[0]["sentiment_status"] == "failed"
+
+    status = (await async_client.get("/restaurants/sentiment/queue")).json()
+    assert status["depth"] == 0
+    assert status["jobs_per_minute"] >= 3
+
+@pytest.mark.asyncio
+async def test_sentiment_queue_picks_up_pending_reviews(valid_restaurant_data, test_db):
+    """Тест восстановления: pending-отзывы без задания ставятся в очередь при запуске"""
+    restaurant = Restaurant(**{k: v for k, v in valid_restaurant_data.items() if k != "location"})
+    test_db.add(restaurant)
+    test_db.flush()
+    test_db.add(Review(restaurant_id=restaurant.id, author="A", text="Old", rating=4.0, sentiment_status="pending"))
+    test_db.add(Review(restaurant_id=restaurant.id, author="B", text="Done", rating=4.0, sentiment_status="done"))
+    test_db.commit()
+
+    assert await sentiment_queue.enqueue_pending() == 1
+    assert await sentiment_queue.enqueue_pending() == 0
@@ -0,0 +1,40 @@
+import pytest
+from sqlalchemy import create_engine, text
+from backend.app.core.config import settings
+from backend.app.db.session import configure_sqlite
+from backend.app.db.maintenance import run_maintenance
+from backend.app.db.models import Base
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """Движок на временном файле с профилем SQLite"""
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'tuning.db'}",
+        connect_args={"check_same_thread": False}
+    )
+    configure_sqlite(engine)
+    yield engine
+    engine.dispose()
+
+def test_sqlite_pragmas_applied(file_engine):
+    """Тест применения прагм production-профиля на соединении"""
+    with file_engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        # NORMAL == 1
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -settings.SQLITE_CACHE_SIZE_KB
+        # INCREMENTAL == 2
+        assert conn.execute(text("PRAGMA auto_vacuum")).scalar() == 2
+
+def test_run_maintenance(file_engine):
+    """Тест ANALYZE и incremental vacuum"""
+    Base.metadata.create_all(file_engine)
+    with file_engine.begin() as conn:
+        conn.execute(text("INSERT INTO categories (name) VALUES ('Italian')"))
+
+    run_maintenance(file_engine, vacuum_pages=10)
+
+    with file_engine.connect() as conn:
+        stats = conn.execute(text("SELECT count(*) FROM sqlite_stat1")).scalar()
+        assert stats > 0
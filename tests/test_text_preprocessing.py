@@ -0,0 +1,45 @@
+from ml.utils.text_preprocessing import TextPreprocessor, ngrams, normalize, remove_stopwords, tokenize
+
+def test_normalize():
+    """Тест нормализации: NFKC, регистр, ё и пробелы"""
+    assert normalize("  Ёлки   ПАЛКИ\n\tＦｕｌｌwidth ") == "елки палки fullwidth"
+    assert normalize("Don’t") == "don't"
+
+def test_tokenize_cyrillic_and_latin():
+    """Тест токенизации кириллицы и латиницы с апострофами, дефисами и пунктуацией"""
+    text = "Кое-где ВКУСНО, but don't go! Цена: 500₽"
+    assert tokenize(text) == ["кое-где", "вкусно", "but", "don't", "go", "цена", "500"]
+    assert tokenize(text, keep_punctuation=True) == [
+        "кое-где", "вкусно", ",", "but", "don't", "go", "!", "цена", ":", "500"
+    ]
+
+def test_tokenize_accented_and_other_scripts():
+    """Тест токенизации: буквы с диакритикой и другие алфавиты не режутся на части"""
+    assert tokenize("Café crème brûlée") == ["café", "crème", "brûlée"]
+    # Разложенная форма (e + комбинируемый акцент) собирается NFKC
+    assert tokenize("Cafe\u0301 Ñoquis") == ["café", "ñoquis"]
+    assert tokenize("Gyoza_Bar ラーメン 拉面") == ["gyoza", "bar", "ラーメン", "拉面"]
+
+def test_stopwords_and_ngrams():
+    """Тест удаления стоп-слов и n-грамм"""
+    tokens = tokenize("Это была очень вкусная паста and the best pizza")
+    assert list(remove_stopwords(tokens)) == ["вкусная", "паста", "best", "pizza"]
+    assert list(ngrams(["a", "b", "c"], 2)) == ["a b", "b c"]
+    assert list(ngrams(["a"], 2)) == []
+
+    preprocessor = TextPreprocessor(ngram_range=(1, 2))
+    assert list(preprocessor.process("Вкусная паста и кофе")) == [
+        "вкусная", "паста", "кофе", "вкусная паста", "паста кофе"
+    ]
+    assert list(TextPreprocessor(stopwords=None).process("Это паста")) == ["это", "паста"]
+
+def test_batched_modes_match_per_text():
+    """Тест пакетных режимов: тот же результат, что и по одному тексту"""
+    preprocessor = TextPreprocessor(ngram_range=(1, 2), min_length=2)
+    texts = ["Great pizza, slow service", None, "", "Очень уютно и вкусно"] * 5
+    expected = [list(preprocessor.process(text)) for text in texts]
+
+    assert list(preprocessor.process_many(iter(texts))) == expected
+    chunks = list(preprocessor.process_chunks(iter(texts), chunk_size=3))
+    assert [len(chunk) for chunk in chunks] == [3, 3, 3, 3, 3, 3, 2]
+    assert [features for chunk in chunks for features in chunk] == expected